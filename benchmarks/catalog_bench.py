@@ -0,0 +1,475 @@
+"""
+Benchmark loading and saving synthetic catalogs at multiples of the size of the current catalog
+
+For every scale a data/ and stores/ tree is generated with the average shape of the real catalog (materials per
+brand, filaments per material, variants per filament, sizes per variant, purchase links per size), the number of
+brands and stores is multiplied by the scale. The generated documents conform to the schemas and are validated while
+loading like real ones. Every benchmark runs once per pass and timings are the best of --repeat passes, memory is
+measured in a separate run with tracemalloc.
+
+Results are written as JSON and can be compared against a stored baseline. Figures are compared per entity, so a grown
+catalog doesn't count as a regression. Timings are only compared for runs with at least MIN_COMPARE_REPEAT passes.
+A timing regressed if it grew by more than the threshold plus the spread between the passes of either run, so the
+noise of a shared machine doesn't count as a regression. Usage (from the repository root):
+    python benchmarks/catalog_bench.py --scales 1,10,100 --json results.json
+    python benchmarks/catalog_bench.py --baseline benchmarks/catalog_baseline.json --threshold 0.25
+    python benchmarks/catalog_bench.py --save-baseline benchmarks/catalog_baseline.json
+"""
+import contextlib
+import gc
+import io
+import json
+import os
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from dataclasses import dataclass, asdict
+from pathlib import Path
+from typing import Callable
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import db_serializer  # noqa: E402
+from db_serializer import Brand, FilamentSize, Filament, SizePurchaseLink, data_json_bytes  # noqa: E402
+
+# Bump this if the benchmarks change so old baselines are not compared against new figures
+RESULTS_VERSION = 3
+# Timings of runs with fewer repeats are not compared against the baseline
+MIN_COMPARE_REPEAT = 3
+
+COUNTRIES = ["US", "CN", "DE", "GB", "CA", "DK", "SE", "PL", "CZ", "NL", "FR", "AU"]
+MATERIALS = ["PLA", "PETG", "ABS", "ASA", "TPU", "PA", "PC", "PVA", "HIPS", "PP"]
+COLORS = ["Black", "White", "Grey", "Red", "Blue", "Green", "Yellow", "Orange", "Purple", "Pink", "Brown", "Silver"]
+SLICERS = ["prusaslicer", "bambustudio", "orcaslicer", "cura"]
+# The variant traits the schema allows, variants with any other trait would be dropped while loading
+with open(Path(__file__).resolve().parent.parent.joinpath("schemas", "variant_schema.json"), encoding="utf8") as _f:
+    TRAITS = list(json.load(_f)["properties"]["traits"]["properties"])
+# The entity kinds counted by generate_catalog() and count_entities()
+ENTITY_KINDS = ["brand", "material", "filament", "variant", "size", "purchase_link"]
+
+
+# ---------------------------------
+# Catalog Shape
+# ---------------------------------
+
+@dataclass
+class CatalogShape:
+    """The number of brands and stores, and the average number of children of each entity"""
+    brands: int
+    stores: int
+    materials: float  # per brand
+    filaments: float  # per material
+    variants: float  # per filament
+    sizes: float  # per variant
+    purchase_links: float  # per size
+
+    def scaled(self, factor: float) -> 'CatalogShape':
+        return CatalogShape(max(1, round(self.brands * factor)), max(1, round(self.stores * factor)),
+                            self.materials, self.filaments, self.variants, self.sizes, self.purchase_links)
+
+
+def _sub_folders(path: str) -> list[str]:
+    with os.scandir(path) as it:
+        return [x.path for x in it if x.is_dir()]
+
+
+def measure_shape(data_dir: Path, stores_dir: Path) -> CatalogShape:
+    """Returns the shape of a checkout of the database (material folders only)"""
+    counts = {"materials": 0, "filaments": 0, "variants": 0, "sizes": 0, "purchase_links": 0}
+    brand_folders = _sub_folders(str(data_dir))
+    for brand_folder in brand_folders:
+        for material_folder in _sub_folders(brand_folder):
+            counts["materials"] += 1
+            for filament_folder in _sub_folders(material_folder):
+                counts["filaments"] += 1
+                for variant_folder in _sub_folders(filament_folder):
+                    counts["variants"] += 1
+                    try:
+                        with open(os.path.join(variant_folder, "sizes.json"), encoding="utf8") as f:
+                            sizes = json.load(f)
+                    except (OSError, ValueError):
+                        continue
+                    counts["sizes"] += len(sizes)
+                    counts["purchase_links"] += sum(len(x.get("purchase_links", [])) for x in sizes)
+
+    def ratio(children: str, parents: int) -> float:
+        return round(counts[children] / max(parents, 1), 2)
+
+    return CatalogShape(
+        brands=len(brand_folders),
+        stores=len(_sub_folders(str(stores_dir))),
+        materials=ratio("materials", len(brand_folders)),
+        filaments=ratio("filaments", counts["materials"]),
+        variants=ratio("variants", counts["filaments"]),
+        sizes=ratio("sizes", counts["variants"]),
+        purchase_links=ratio("purchase_links", counts["sizes"])
+    )
+
+
+# ---------------------------------
+# Generation
+# ---------------------------------
+
+def _count(rng: random.Random, average: float, minimum=1) -> int:
+    """A child count with the given average"""
+    count = int(average) + (rng.random() < average % 1)
+    return max(minimum, count)
+
+
+def _ean(number: int) -> str:
+    digits = f"{number:012d}"
+    checksum = sum(int(x) * (3 if i % 2 else 1) for i, x in enumerate(digits))
+    return digits + str(-checksum % 10)
+
+
+def _slicer_settings(rng: random.Random, name: str) -> dict:
+    settings = {x: {"profile_name": f"{name} @{x}"} for x in rng.sample(SLICERS, rng.randint(1, len(SLICERS)))}
+    if rng.random() < 0.5:
+        settings["generic"] = {"nozzle_temp": rng.randrange(190, 280, 5), "bed_temp": rng.randrange(40, 110, 5)}
+    return settings
+
+
+def _write(path: Path, json_data) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(data_json_bytes(json_data))
+
+
+def generate_catalog(root: Path, shape: CatalogShape, seed=0) -> tuple[int, dict[str, int]]:
+    """
+    Write a synthetic data/ and stores/ tree with the given shape to root
+    :returns The number of files written and the number of entities of each kind (see count_entities())
+    """
+    rng = random.Random(seed)
+    files = 0
+    entities = dict.fromkeys(ENTITY_KINDS, 0)
+    ean = 4000000000000 // 10
+
+    store_ids = [f"store{i:05d}" for i in range(shape.stores)]
+    for store_id in store_ids:
+        _write(root.joinpath("stores", store_id, "store.json"), {
+            "id": store_id,
+            "name": f"Store {store_id}",
+            "storefront_url": f"https://{store_id}.example.com/",
+            "logo": f"{store_id}.png",
+            "ships_from": [rng.choice(COUNTRIES)],
+            "ships_to": rng.sample(COUNTRIES, rng.randint(0, 3))
+        })
+        files += 1
+
+    for brand_index in range(shape.brands):
+        brand_name = f"Brand {brand_index:05d}"
+        brand_folder = root.joinpath("data", brand_name)
+        _write(brand_folder.joinpath("brand.json"), {
+            "brand": brand_name,
+            "website": f"https://brand{brand_index:05d}.example.com/",
+            "logo": f"brand{brand_index:05d}.png",
+            "origin": rng.choice(COUNTRIES)
+        })
+        files += 1
+        entities["brand"] += 1
+
+        for material_index in range(_count(rng, shape.materials)):
+            material_name = MATERIALS[material_index % len(MATERIALS)]
+            if material_index >= len(MATERIALS):
+                material_name += f"-{material_index // len(MATERIALS)}"
+            material = {"material": material_name}
+            if rng.random() < 0.3:
+                material["default_max_dry_temperature"] = rng.randrange(40, 90, 5)
+            if rng.random() < 0.3:
+                material["default_slicer_settings"] = _slicer_settings(rng, f"{brand_name} {material_name}")
+            material_folder = brand_folder.joinpath(material_name)
+            _write(material_folder.joinpath("material.json"), material)
+            files += 1
+            entities["material"] += 1
+
+            for filament_index in range(_count(rng, shape.filaments)):
+                filament_name = f"{material_name} Line {filament_index}"
+                filament = {
+                    "name": filament_name,
+                    "diameter_tolerance": rng.choice([0.02, 0.03, 0.05]),
+                    "density": round(rng.uniform(1.0, 1.5), 2)
+                }
+                if rng.random() < 0.3:
+                    filament["max_dry_temperature"] = rng.randrange(40, 90, 5)
+                if rng.random() < 0.2:
+                    filament["data_sheet_url"] = f"https://brand{brand_index:05d}.example.com/{filament_index}.pdf"
+                if rng.random() < 0.3:
+                    filament["slicer_settings"] = _slicer_settings(rng, filament_name)
+                filament_folder = material_folder.joinpath(filament_name)
+                _write(filament_folder.joinpath("filament.json"), filament)
+                files += 1
+                entities["filament"] += 1
+
+                for variant_index in range(_count(rng, shape.variants)):
+                    color_name = COLORS[variant_index % len(COLORS)]
+                    if variant_index >= len(COLORS):
+                        color_name += f" {variant_index // len(COLORS)}"
+                    variant = {"color_name": color_name, "color_hex": f"#{rng.randrange(1 << 24):06X}"}
+                    if rng.random() < 0.2:
+                        variant["traits"] = {rng.choice(TRAITS): True}
+                    if rng.random() < 0.1:
+                        variant["discontinued"] = True
+
+                    sizes = []
+                    for _ in range(_count(rng, shape.sizes)):
+                        ean += 1
+                        size = {
+                            "filament_weight": rng.choice([250, 500, 750, 1000, 1000, 1000, 2000]),
+                            "diameter": rng.choice([1.75, 1.75, 1.75, 2.85]),
+                            "ean": _ean(ean)
+                        }
+                        if rng.random() < 0.5:
+                            size["empty_spool_weight"] = rng.choice([150, 180, 220, 250])
+                        link_count = _count(rng, shape.purchase_links, minimum=0)
+                        size["purchase_links"] = [{
+                            "store_id": store_id,
+                            "url": f"https://{store_id}.example.com/p/{ean}",
+                            "affiliate": rng.random() < 0.3
+                        } for store_id in rng.sample(store_ids, min(link_count, len(store_ids)))]
+                        sizes.append(size)
+
+                    variant_folder = filament_folder.joinpath(color_name)
+                    _write(variant_folder.joinpath("variant.json"), variant)
+                    _write(variant_folder.joinpath("sizes.json"), sizes)
+                    files += 2
+                    entities["variant"] += 1
+                    entities["size"] += len(sizes)
+                    entities["purchase_link"] += sum(len(x["purchase_links"]) for x in sizes)
+    return files, entities
+
+
+# ---------------------------------
+# Benchmarks
+# ---------------------------------
+
+def load_catalog(root: Path) -> list[Brand]:
+    store_map = db_serializer.load_store_folders(root.joinpath("stores"))
+    with contextlib.redirect_stdout(io.StringIO()):
+        brands = [Brand.from_folder(x, None, store_map) for x in sorted(root.joinpath("data").iterdir()) if x.is_dir()]
+    return [x for x in brands if x is not None]
+
+
+def count_entities(brands: list[Brand]) -> dict[str, int]:
+    counts = dict.fromkeys(ENTITY_KINDS, 0)
+    for brand in brands:
+        for node in db_serializer.iter_nodes(brand):
+            counts[node.hash_kind] = counts.get(node.hash_kind, 0) + 1
+    return counts
+
+
+def to_dict_all(brands: list[Brand]) -> int:
+    """Serialize every entity of the catalog, returns the number of entities"""
+    count = 0
+    for brand in brands:
+        for node in db_serializer.iter_nodes(brand):
+            node.to_dict()
+            count += 1
+    return count
+
+
+def resolve_all(brands: list[Brand]) -> int:
+    """Run the resolution helpers that fall back to parent/store values, returns the number of calls"""
+    count = 0
+    for brand in brands:
+        for node in db_serializer.iter_nodes(brand):
+            if isinstance(node, Filament):
+                node.get_resolved_slicer_settings()
+                node.get_max_dry_temperature()
+                count += 2
+            elif isinstance(node, FilamentSize):
+                link: SizePurchaseLink
+                for link in node.purchase_links:
+                    link.get_ships_from()
+                    link.get_ships_to()
+                    count += 2
+    return count
+
+
+def save_catalog(brands: list[Brand], out_dir: Path) -> int:
+    out_dir.mkdir(parents=True, exist_ok=True)
+    return sum(x.to_folder(out_dir) for x in brands)
+
+
+def measure_memory(root: Path) -> dict[str, int]:
+    """The peak memory of loading the catalog and the memory retained by the loaded catalog"""
+    gc.collect()
+    tracemalloc.start()
+    brands = load_catalog(root)
+    gc.collect()
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del brands
+    return {"load_peak_bytes": peak, "retained_bytes": retained}
+
+
+def run_scale(work_dir: Path, shape: CatalogShape, repeat: int, seed=0, trace_memory=True) -> dict:
+    root = work_dir.joinpath("catalog")
+    start = time.perf_counter()
+    files, generated = generate_catalog(root, shape, seed)
+    generate_seconds = time.perf_counter() - start
+
+    # Each pass times every figure once, so the repeats of a figure are spread over the whole run instead of all
+    # landing in the same slow (or fast) phase of a shared machine
+    timings: dict[str, list[float]] = {}
+
+    def timed(name: str, func: Callable[[], object], flush=False):
+        gc.collect()
+        if flush and hasattr(os, "sync"):
+            # Write the dirty pages of earlier saves to disk, so their writeback isn't timed
+            os.sync()
+        start = time.perf_counter()
+        result = func()
+        timings.setdefault(name, []).append(time.perf_counter() - start)
+        return result
+
+    brands = None
+    for i in range(repeat):
+        # Free the catalog of the previous pass before loading the next one
+        brands = None
+        timed("load_stores", lambda: db_serializer.load_store_folders(root.joinpath("stores")))
+        brands = timed("from_folder", lambda: load_catalog(root))
+        # The loader drops entities that fail validation, the timings would be of a smaller catalog than reported
+        loaded = count_entities(brands)
+        if loaded != generated:
+            raise RuntimeError(f"The loaded catalog differs from the generated one, generated: {generated}, loaded: {loaded}")
+        timed("to_dict", lambda: to_dict_all(brands))
+        timed("resolve", lambda: resolve_all(brands))
+        # Every pass saves to a new folder so all files are written, then the unchanged catalog is saved again
+        out_dir = work_dir.joinpath(f"out{i}")
+        written = timed("to_folder", lambda: save_catalog(brands, out_dir), flush=True)
+        unchanged_written = timed("to_folder_unchanged", lambda: save_catalog(brands, out_dir), flush=True)
+
+    result = {
+        "shape": asdict(shape),
+        "files": files,
+        "entities": loaded,
+        "generate_seconds": round(generate_seconds, 3),
+        "files_written": {"to_folder": written, "to_folder_unchanged": unchanged_written},
+        # The best of the repeats, and how much slower the slowest one was
+        "seconds": {k: round(min(v), 4) for k, v in timings.items()},
+        "spread": {k: round(max(v) / min(v) - 1, 3) for k, v in timings.items()}
+    }
+    del brands
+    if trace_memory:
+        result["memory"] = measure_memory(root)
+    return result
+
+
+def run(scales: list[float], repeat: int, seed=0, trace_memory=True, data_dir="data", stores_dir="stores") -> dict:
+    shape = measure_shape(Path(data_dir), Path(stores_dir))
+    results = {}
+    for scale in scales:
+        scaled = shape.scaled(scale)
+        work_dir = Path(tempfile.mkdtemp(prefix="catalog_bench_"))
+        try:
+            results[f"{scale:g}x"] = run_scale(work_dir, scaled, repeat, seed, trace_memory)
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+    return {
+        "version": RESULTS_VERSION,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "repeat": repeat,
+        "seed": seed,
+        "results": results
+    }
+
+
+# ---------------------------------
+# Baseline Comparison
+# ---------------------------------
+
+def compare(results: dict, baseline: dict, threshold: float, min_seconds=0.05) -> list[str]:
+    """
+    Compare the timings and memory figures per entity of the scales present in both results
+    A figure regressed if it grew by more than `threshold` (0.25 = 25%), for timings plus the larger spread between
+    the repeats of the two runs. Timings below min_seconds in both runs are ignored as noise, timings of runs with
+    fewer than MIN_COMPARE_REPEAT repeats are shown but never count as a regression.
+    :returns A description of each regression
+    """
+    if baseline.get("version") != results.get("version"):
+        print(f"The baseline was recorded with results version {baseline.get('version')}, skipping the comparison")
+        return []
+    compare_timings = min(results["repeat"], baseline["repeat"]) >= MIN_COMPARE_REPEAT
+    if not compare_timings:
+        print(f"Timings of runs with less than {MIN_COMPARE_REPEAT} repeats are too noisy to compare, "
+              f"only memory can regress")
+
+    regressions = []
+    for scale, result in results["results"].items():
+        base = baseline["results"].get(scale)
+        if base is None:
+            print(f"{scale}: not in the baseline")
+            continue
+        entities = sum(result["entities"].values())
+        base_entities = sum(base["entities"].values())
+        figures = [("seconds", k, v, base["seconds"].get(k)) for k, v in result["seconds"].items()]
+        figures += [("memory", k, v, base.get("memory", {}).get(k)) for k, v in result.get("memory", {}).items()]
+        for group, name, value, base_value in figures:
+            if not base_value:
+                continue
+            change = (value / entities) / (base_value / base_entities) - 1
+            if group == "seconds":
+                tolerance = threshold + max(result["spread"].get(name, 0), base["spread"].get(name, 0))
+                counts = compare_timings and max(value, base_value) >= min_seconds
+            else:
+                tolerance = threshold
+                counts = True
+            flag = ""
+            if change > tolerance and counts:
+                flag = "  REGRESSION"
+                regressions.append(f"{scale} {name}: {base_value} -> {value} ({change:+.0%} per entity, "
+                                   f"allowed {tolerance:+.0%})")
+            print(f"{scale:>6} {name:<22} {base_value:>14} -> {value:>14} {change:+8.1%} (allowed {tolerance:+.0%}){flag}")
+    return regressions
+
+
+def print_results(results: dict):
+    for scale, result in results["results"].items():
+        entities = ", ".join(f"{v} {k}" for k, v in result["entities"].items())
+        print(f"{scale}: {result['files']} files, {entities}")
+        for name, seconds in result["seconds"].items():
+            print(f"  {name:<22} {seconds:9.4f}s")
+        for name, value in result.get("memory", {}).items():
+            print(f"  {name:<22} {value / 1024 / 1024:9.1f} MiB")
+
+
+if __name__ == "__main__":
+    from argparse import ArgumentParser
+
+    parser = ArgumentParser(description="Benchmark load/save round trips of synthetic catalogs")
+    parser.add_argument("--scales", default="1,10", help="Comma separated multiples of the current catalog size")
+    parser.add_argument("--repeat", type=int, default=3, help="Run each benchmark this many times and keep the best")
+    parser.add_argument("--seed", type=int, default=0, help="The seed of the catalog generator")
+    parser.add_argument("--no-memory", action="store_true", help="Skip the (slow) tracemalloc run")
+    parser.add_argument("--data-dir", default="data", help="The catalog whose shape is scaled")
+    parser.add_argument("--stores-dir", default="stores", help="The stores of the catalog whose shape is scaled")
+    parser.add_argument("--json", dest="json_out", help="Write the results to this JSON file")
+    parser.add_argument("--baseline", help="Compare the results against this results file")
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="The relative growth of a figure that counts as a regression (--baseline)")
+    parser.add_argument("--save-baseline", help="Write the results to this file to be used as the baseline")
+    args = parser.parse_args()
+
+    bench_results = run([float(x) for x in args.scales.split(",")], args.repeat, args.seed, not args.no_memory,
+                        args.data_dir, args.stores_dir)
+    print_results(bench_results)
+
+    for out_path in (args.json_out, args.save_baseline):
+        if out_path:
+            with open(out_path, "w", encoding="utf8") as f:
+                json.dump(bench_results, f, indent=4)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf8") as f:
+            baseline_results = json.load(f)
+        found = compare(bench_results, baseline_results, args.threshold)
+        if found:
+            print(f"{len(found)} regression(s) above {args.threshold:.0%}:")
+            for regression in found:
+                print(f"  {regression}")
+            sys.exit(1)
@@ -0,0 +1,146 @@
+"""
+Compare the backends of json_codec on the real dataset
+
+Every JSON file below the given folders is read into memory once, then each backend parses all documents and
+encodes them in the formats that are written to disk. The encoded bytes of every backend are checked against the
+json module's, any difference is reported and makes the script exit with 1.
+Usage (from the repository root):
+    python benchmarks/json_codec_bench.py --folders data,stores,profiles --repeat 5
+"""
+import gc
+import json
+import os
+import sys
+import time
+from pathlib import Path
+from typing import Callable
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import json_codec  # noqa: E402
+
+# The formats the repository writes, as json_codec.dumps() arguments
+FORMATS = {
+    "data files (indent=2)": {"indent": 2, "ensure_ascii": False},
+    "model/profiles (indent=4)": {"indent": 4},
+    "canonical (hashes)": {"sort_keys": True, "separators": (",", ":"), "ensure_ascii": False},
+}
+
+# Values every backend must encode exactly like the json module, in every format
+EDGE_CASES = {
+    "non-finite floats": {"nan": float("nan"), "inf": float("inf"), "-inf": float("-inf"), "list": [1.5, float("nan")],
+                          "null": None},
+    "non-ASCII": {"name": "Ærø Fïlament 日本 😀", "tags": ["über", "ß"], "ünïcode key": "\u00e9\u0301"},
+    "exponents": [1e-05, 1e+22, 2.5e-310, -0.0],
+    "large integers": [2 ** 63, -2 ** 64, 10 ** 30],
+}
+
+
+def check_edge_cases() -> list[str]:
+    """Returns the edge cases a backend parses or encodes differently than the json module"""
+    mismatches = []
+    for backend in json_codec.available_backends():
+        json_codec.set_backend(backend)
+        for case, value in EDGE_CASES.items():
+            for name, kwargs in FORMATS.items():
+                expected = json.dumps(value, **kwargs)
+                if json_codec.dumps_bytes(value, **kwargs) != expected.encode("utf8"):
+                    mismatches.append(f"{backend} {name}: {case}")
+                # Parsing and encoding again must give the same output (NaN != NaN, so values aren't compared)
+                elif json_codec.dumps(json_codec.loads(expected.encode("utf8")), **kwargs) != expected:
+                    mismatches.append(f"{backend} {name} parse: {case}")
+    return mismatches
+
+
+def read_documents(folders: list[str]) -> list[tuple[str, bytes]]:
+    documents = []
+    for folder in folders:
+        for dir_path, _, file_names in os.walk(folder):
+            for file_name in sorted(file_names):
+                if file_name.endswith(".json"):
+                    path = os.path.join(dir_path, file_name)
+                    with open(path, mode="rb") as f:
+                        documents.append((path, f.read()))
+    return documents
+
+
+def best_of(repeat: int, func: Callable[[], object]) -> tuple[float, object]:
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def parse_all(documents: list[tuple[str, bytes]]) -> list:
+    parsed = []
+    for _, data in documents:
+        try:
+            parsed.append(json_codec.loads(data))
+        except (json_codec.JSONDecodeError, UnicodeDecodeError):
+            parsed.append(None)
+    return parsed
+
+
+def run(documents: list[tuple[str, bytes]], repeat: int) -> tuple[dict[str, dict[str, float]], list[str]]:
+    """
+    Returns the seconds per backend and operation, and the mismatches against the json module
+    """
+    seconds: dict[str, dict[str, float]] = {}
+    mismatches: list[str] = []
+    reference: dict[str, list[bytes]] = {}
+    reference_parsed = None
+    for backend in ["stdlib"] + [x for x in json_codec.available_backends() if x != "stdlib"]:
+        json_codec.set_backend(backend)
+        timings = seconds[backend] = {}
+        timings["parse"], parsed = best_of(repeat, lambda: parse_all(documents))
+        if reference_parsed is None:
+            reference_parsed = parsed
+        elif parsed != reference_parsed:
+            mismatches.extend(f"{backend} parse: {path}" for (path, _), a, b in
+                              zip(documents, parsed, reference_parsed) if a != b)
+
+        for name, kwargs in FORMATS.items():
+            timings[name], encoded = best_of(
+                repeat, lambda: [json_codec.dumps_bytes(x, **kwargs) for x in reference_parsed])
+            expected = reference.setdefault(name, encoded)
+            mismatches.extend(f"{backend} {name}: {path}" for (path, _), a, b in
+                              zip(documents, encoded, expected) if a != b)
+    return seconds, mismatches
+
+
+if __name__ == "__main__":
+    from argparse import ArgumentParser
+
+    parser = ArgumentParser(description="Compare the JSON codec backends on the real dataset")
+    parser.add_argument("--folders", default="data,stores,profiles", help="Comma separated folders to read")
+    parser.add_argument("--repeat", type=int, default=5, help="Run each benchmark this many times and keep the best")
+    parser.add_argument("--json", dest="json_out", help="Also write the results to this JSON file")
+    args = parser.parse_args()
+
+    docs = read_documents(args.folders.split(","))
+    total_bytes = sum(len(x) for _, x in docs)
+    print(f"{len(docs)} documents, {total_bytes / 1024 / 1024:.1f} MiB")
+
+    results, found = run(docs, args.repeat)
+    found += check_edge_cases()
+    backends = list(results)
+    print(f"{'':<28}" + "".join(f"{x:>12}" for x in backends))
+    for operation in results["stdlib"]:
+        row = "".join(f"{results[x][operation]:11.3f}s" for x in backends)
+        speedups = "".join(f"  x{results['stdlib'][operation] / results[x][operation]:.2f}" for x in backends[1:])
+        print(f"{operation:<28}{row}{speedups}")
+
+    if args.json_out:
+        with open(args.json_out, "w", encoding="utf8") as f:
+            json.dump({"documents": len(docs), "bytes": total_bytes, "seconds": results, "mismatches": found}, f,
+                      indent=4)
+
+    if found:
+        print(f"{len(found)} outputs differ from the json module:")
+        for mismatch in found[:50]:
+            print(f"  {mismatch}")
+        sys.exit(1)
@@ -0,0 +1,61 @@
+"""
+Report the memory retained by a fully loaded catalog
+
+Usage (from the repository root):
+    python benchmarks/memory_report.py
+"""
+import contextlib
+import gc
+import io
+import json
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import db_serializer  # noqa: E402
+
+
+def measure(data_dir: Path) -> dict:
+    gc.collect()
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        brands = db_serializer.load_brands(data_dir)
+    seconds = time.perf_counter() - start
+    gc.collect()
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    variant_count = sum(len(filament.variants) for brand in brands for material in brand.materials
+                        for filament in material.filaments)
+    return {
+        "retained_bytes": retained,
+        "peak_bytes": peak,
+        "load_seconds": round(seconds, 3),
+        "variants": variant_count
+    }
+
+
+if __name__ == "__main__":
+    from argparse import ArgumentParser
+
+    parser = ArgumentParser(description="Measure the memory retained by a loaded catalog")
+    parser.add_argument("--data-dir", default="data", help="The folder containing the brand folders")
+    parser.add_argument("--json", dest="json_out", help="Also write the result to this JSON file")
+    args = parser.parse_args()
+
+    # Warm up so compiled schemas and imports are not counted
+    with contextlib.redirect_stdout(io.StringIO()):
+        db_serializer.load_brands(args.data_dir)
+
+    result = measure(Path(args.data_dir))
+    print(f"retained={result['retained_bytes'] / 1e6:7.2f} MB  peak={result['peak_bytes'] / 1e6:7.2f} MB  "
+          f"load={result['load_seconds']:.3f}s  ({result['variants']} variants)")
+
+    if args.json_out:
+        with open(args.json_out, "w", encoding="utf8") as f:
+            json.dump(result, f, indent=4)
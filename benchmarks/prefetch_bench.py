@@ -0,0 +1,61 @@
+"""
+Benchmark the read-ahead stage of db_serializer.load_brands() against a simulated high-latency filesystem
+
+Every file read is delayed by --latency-ms to mimic a network filesystem, then the catalog is loaded with
+different numbers of prefetch threads. Usage (from the repository root):
+    python benchmarks/prefetch_bench.py --latency-ms 2 --workers 0,4,16,32
+"""
+import contextlib
+import io
+import json
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import db_serializer  # noqa: E402
+
+
+def simulate_latency(latency_s: float):
+    """Wrap db_serializer.read_file_bytes so every read takes at least latency_s"""
+    read = db_serializer.read_file_bytes
+
+    def slow_read(path):
+        time.sleep(latency_s)
+        return read(path)
+
+    db_serializer.read_file_bytes = slow_read
+
+
+def time_load(data_dir: Path, workers: int) -> tuple[float, int]:
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        brands = db_serializer.load_brands(data_dir, prefetch_workers=workers)
+    return time.perf_counter() - start, len(brands)
+
+
+if __name__ == "__main__":
+    from argparse import ArgumentParser
+
+    parser = ArgumentParser(description="Benchmark loading with read-ahead on a simulated slow filesystem")
+    parser.add_argument("--data-dir", default="data", help="The folder containing the brand folders")
+    parser.add_argument("--latency-ms", type=float, default=2.0, help="Simulated latency of every file read")
+    parser.add_argument("--workers", default="0,4,16,32", help="Comma separated prefetch thread counts (0 = no prefetch)")
+    parser.add_argument("--json", dest="json_out", help="Also write the results to this JSON file")
+    args = parser.parse_args()
+
+    simulate_latency(args.latency_ms / 1000)
+    results = []
+    for workers in (int(x) for x in args.workers.split(",")):
+        seconds, brand_count = time_load(Path(args.data_dir), workers)
+        results.append({"prefetch_workers": workers, "seconds": round(seconds, 3), "brands": brand_count})
+        print(f"prefetch_workers={workers:<3} {seconds:8.3f}s  ({brand_count} brands)")
+
+    baseline = results[0]["seconds"]
+    for result in results[1:]:
+        print(f"prefetch_workers={result['prefetch_workers']:<3} speedup x{baseline / result['seconds']:.2f}")
+
+    if args.json_out:
+        with open(args.json_out, "w", encoding="utf8") as f:
+            json.dump({"latency_ms": args.latency_ms, "results": results}, f, indent=4)
@@ -0,0 +1,113 @@
+"""
+Benchmark the startup of data_validator and check it stays within a time budget
+
+Measures the import of data_validator with `python -X importtime` and times a trivial run (--folder-names
+--store-ids) on a tiny tree made of the first --brands brand folders, the first --stores store folders and the
+schemas. Pillow, jsonschema and the process pool are only imported by the checks using them, the trivial run
+must not import them. Exits with 1 if a budget is exceeded or a heavy module was imported.
+Usage (from the repository root):
+    python benchmarks/startup_bench.py --repeat 5
+"""
+import json
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+VALIDATOR = ROOT / "data_validator.py"
+
+# Milliseconds, the best of --repeat runs must be within these
+IMPORT_BUDGET_MS = 150
+TINY_RUN_BUDGET_MS = 500
+# Modules a run with --folder-names --store-ids must not import
+HEAVY_MODULES = ("PIL", "jsonschema", "concurrent.futures.process", "fs_watch")
+TINY_RUN_ARGS = ["--folder-names", "--store-ids", "--no-cache"]
+
+
+def parse_importtime(stderr: str) -> dict[str, int]:
+    """Returns the cumulative microseconds of every module imported, by name"""
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if cumulative.strip().isdigit():
+            modules[name.strip()] = int(cumulative)
+    return modules
+
+
+def time_import(repeat: int) -> float:
+    """Returns the best milliseconds of importing data_validator"""
+    best = float("inf")
+    for _ in range(repeat):
+        process = subprocess.run([sys.executable, "-X", "importtime", "-c", "import data_validator"],
+                                 cwd=ROOT, capture_output=True, text=True, check=True)
+        best = min(best, parse_importtime(process.stderr)["data_validator"] / 1000)
+    return best
+
+
+def create_tiny_tree(target: Path, brands: int, stores: int):
+    """Copy the first brand and store folders and the schemas to target"""
+    for folder, count in (("data", brands), ("stores", stores)):
+        for source in sorted((ROOT / folder).iterdir())[:count]:
+            shutil.copytree(source, target / folder / source.name)
+    shutil.copytree(ROOT / "schemas", target / "schemas")
+
+
+def time_tiny_run(tree: Path, repeat: int) -> tuple[float, list[str]]:
+    """Returns the best milliseconds of a trivial run and the heavy modules it imported"""
+    best = float("inf")
+    imported = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        process = subprocess.run([sys.executable, "-X", "importtime", str(VALIDATOR), *TINY_RUN_ARGS],
+                                 cwd=tree, capture_output=True, text=True)
+        best = min(best, (time.perf_counter() - start) * 1000)
+        if "Traceback" in process.stderr:
+            # Errors found in the tiny tree are fine, a crash would make the run look fast
+            raise RuntimeError(f"data_validator failed:\n{process.stderr[process.stderr.index('Traceback'):]}")
+        modules = parse_importtime(process.stderr)
+        imported = [x for x in HEAVY_MODULES if x in modules]
+    return best, imported
+
+
+if __name__ == "__main__":
+    from argparse import ArgumentParser
+
+    parser = ArgumentParser(description="Benchmark the startup of data_validator against a time budget")
+    parser.add_argument("--repeat", type=int, default=5, help="Run each benchmark this many times and keep the best")
+    parser.add_argument("--brands", type=int, default=2, help="Brand folders in the tiny tree")
+    parser.add_argument("--stores", type=int, default=2, help="Store folders in the tiny tree")
+    parser.add_argument("--json", dest="json_out", help="Also write the results to this JSON file")
+    args = parser.parse_args()
+
+    import_ms = time_import(args.repeat)
+    with tempfile.TemporaryDirectory() as tmp:
+        create_tiny_tree(Path(tmp), args.brands, args.stores)
+        # The first run compiles data_validator, the timed ones reuse its __pycache__
+        run_ms, heavy = time_tiny_run(Path(tmp), args.repeat)
+
+    failures = []
+    if import_ms > IMPORT_BUDGET_MS:
+        failures.append(f"importing data_validator took {import_ms:.0f} ms (budget {IMPORT_BUDGET_MS} ms)")
+    if run_ms > TINY_RUN_BUDGET_MS:
+        failures.append(f"the tiny run took {run_ms:.0f} ms (budget {TINY_RUN_BUDGET_MS} ms)")
+    if heavy:
+        failures.append(f"{' '.join(TINY_RUN_ARGS)} imported {', '.join(heavy)}")
+
+    print(f"import data_validator  {import_ms:8.1f} ms   (budget {IMPORT_BUDGET_MS} ms)")
+    print(f"tiny run               {run_ms:8.1f} ms   (budget {TINY_RUN_BUDGET_MS} ms)")
+    print(f"heavy modules imported {', '.join(heavy) or 'none'}")
+
+    if args.json_out:
+        with open(args.json_out, "w", encoding="utf8") as f:
+            json.dump({"import_ms": import_ms, "tiny_run_ms": run_ms, "heavy_modules": heavy,
+                       "budgets": {"import_ms": IMPORT_BUDGET_MS, "tiny_run_ms": TINY_RUN_BUDGET_MS},
+                       "failures": failures}, f, indent=4)
+
+    if failures:
+        print("Over budget: " + "; ".join(failures))
+        sys.exit(1)
@@ -0,0 +1,83 @@
+"""
+Benchmark the process pool of data_validator at several worker counts
+
+The JSON and folder name tasks of the real dataset are collected once, then run through
+ValidationOrchestrator.run_tasks_parallel() with one task per work unit (what the pool used to submit) and with the
+default chunking. Every run must report the same errors, otherwise the script exits with 1.
+Usage (from the repository root):
+    python benchmarks/validator_bench.py --workers 1,2,4 --repeat 3
+"""
+import contextlib
+import gc
+import io
+import json
+import os
+import sys
+import time
+from pathlib import Path
+from typing import Optional
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from data_validator import (ValidationOrchestrator, collect_json_validation_tasks,  # noqa: E402
+                            collect_folder_validation_tasks)
+
+# Tasks per work unit, None is the default chunking
+CHUNK_SIZES = {"per task": 1, "chunked": None}
+
+
+def run(orchestrator: ValidationOrchestrator, tasks: list, workers: int, chunk_size: Optional[int],
+        repeat: int) -> tuple[float, list[str]]:
+    """Returns the best seconds of repeat runs and the sorted errors"""
+    orchestrator.max_workers = workers
+    orchestrator.chunk_size = chunk_size
+    best = float("inf")
+    errors = []
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        result = orchestrator.run_tasks_parallel(tasks)
+        best = min(best, time.perf_counter() - start)
+        errors = sorted(str(x) for x in result.errors)
+    return best, errors
+
+
+if __name__ == "__main__":
+    from argparse import ArgumentParser
+
+    parser = ArgumentParser(description="Benchmark the validation process pool at several worker counts")
+    parser.add_argument("--workers", default=f"1,2,{os.cpu_count()}", help="Comma separated worker counts")
+    parser.add_argument("--repeat", type=int, default=3, help="Run each benchmark this many times and keep the best")
+    parser.add_argument("--json", dest="json_out", help="Also write the results to this JSON file")
+    args = parser.parse_args()
+
+    bench_orchestrator = ValidationOrchestrator()
+    with contextlib.redirect_stdout(io.StringIO()):
+        bench_tasks = (collect_json_validation_tasks(bench_orchestrator.manifest) +
+                       collect_folder_validation_tasks(bench_orchestrator.manifest))
+    print(f"{len(bench_tasks)} tasks, {os.cpu_count()} CPUs")
+
+    results: dict[str, dict[str, float]] = {}
+    reference = None
+    mismatches = []
+    worker_counts = sorted({int(x) for x in args.workers.split(",")})
+    print(f"{'workers':<10}" + "".join(f"{x:>12}" for x in CHUNK_SIZES) + "   speedup")
+    for worker_count in worker_counts:
+        timings = results[str(worker_count)] = {}
+        for name, size in CHUNK_SIZES.items():
+            timings[name], found = run(bench_orchestrator, bench_tasks, worker_count, size, args.repeat)
+            if reference is None:
+                reference = found
+            elif found != reference:
+                mismatches.append(f"{worker_count} workers, {name}")
+        print(f"{worker_count:<10}" + "".join(f"{timings[x]:11.3f}s" for x in CHUNK_SIZES) +
+              f"   x{timings['per task'] / timings['chunked']:.2f}")
+
+    if args.json_out:
+        with open(args.json_out, "w", encoding="utf8") as f:
+            json.dump({"tasks": len(bench_tasks), "cpus": os.cpu_count(), "seconds": results,
+                       "mismatches": mismatches}, f, indent=4)
+
+    if mismatches:
+        print(f"Different errors than the first run: {', '.join(mismatches)}")
+        sys.exit(1)
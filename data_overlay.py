@@ -0,0 +1,387 @@
+import hashlib
+import os
+from dataclasses import dataclass
+from typing import Optional, Any, Union, Iterator
+
+import db_serializer
+from db_serializer import Brand, Material, Filament, FilamentVariant, FilamentSize, Store, get_json_from_file, \
+    validate_json, canonical_json, profile_span, aio_data_to_folder_files, size_key, purchase_link_key, AIO_FILE_SUFFIX, LOAD_ORDER, \
+    STORE_SCHEMA, SIZE_SCHEMA, MATERIAL_AIO_SCHEMA
+
+PathLike = Union[str, os.PathLike[str]]
+
+# Layered catalog data
+# A private overlay tree is laid over the base data/ and stores/ folders at load time, nothing is copied.
+# An overlay root mirrors the base layout:
+#   overlay/data/[brand]/...      New brands/materials/filaments/variants, or additions to existing ones
+#   overlay/stores/[store]/...    New stores, or changes to existing ones
+# Documents that exist in several layers are merged, later layers win:
+#   - brand/material/filament/variant/store.json: keys replace the keys of lower layers, a null value removes the key
+#   - sizes.json: sizes are matched by weight and diameter and merged like the other documents, except that
+#     purchase_links are matched by store id. Unmatched sizes and links are appended.
+# A folder only needs the files it adds or changes, e.g. a variant folder with just a sizes.json adds store links.
+# AIO material files count as the material folder they would convert to (see db_serializer.aio_data_to_folder_files()).
+
+DATA_DIR = "data"
+STORES_DIR = "stores"
+DICT_DOCUMENTS = ("brand.json", "material.json", "filament.json", "variant.json", "store.json")
+
+
+@dataclass(frozen=True, slots=True)
+class LayerSource:
+    layer: int  # Index of the layer, 0 is the base
+    path: str  # The file on disk
+    signature: tuple[int, int]  # (mtime_ns, size) of the file, used to invalidate cached documents
+    aio_path: Optional[str] = None  # For documents of AIO materials, their path inside the AIO file's material folder
+
+
+# ---------------------------------
+# Merging
+# ---------------------------------
+
+def merge_dict(base: dict[str, Any], overlay: dict[str, Any]) -> dict[str, Any]:
+    merged = dict(base)
+    for k, v in overlay.items():
+        if v is None:
+            merged.pop(k, None)
+        else:
+            merged[k] = v
+    return merged
+
+
+def merge_sizes(base: list[dict[str, Any]], overlay: list[dict[str, Any]]) -> list[dict[str, Any]]:
+    merged = [dict(x) for x in base]
+    used: set[str] = set()
+    by_key = {size_key(x, used): i for i, x in enumerate(merged)}
+    used = set()
+    for size in overlay:
+        i = by_key.get(size_key(size, used))
+        if i is None:
+            merged.append(size)
+            continue
+        links = merge_purchase_links(merged[i].get("purchase_links", []), size.get("purchase_links", []))
+        merged[i] = merge_dict(merged[i], {k: v for k, v in size.items() if k != "purchase_links"})
+        if links:
+            merged[i]["purchase_links"] = links
+    return merged
+
+
+def merge_purchase_links(base: list[dict[str, Any]], overlay: list[dict[str, Any]]) -> list[dict[str, Any]]:
+    merged = list(base)
+    used: set[str] = set()
+    by_key = {purchase_link_key(x, used): i for i, x in enumerate(merged)}
+    used = set()
+    for link in overlay:
+        i = by_key.get(purchase_link_key(link, used))
+        if i is None:
+            merged.append(link)
+        else:
+            merged[i] = merge_dict(merged[i], link)
+    return merged
+
+
+def merge_documents(file_name: str, documents: list[Any]) -> Any:
+    """Merge the versions of one document from the lowest to the highest layer"""
+    merged = documents[0]
+    for document in documents[1:]:
+        if file_name == "sizes.json" and isinstance(merged, list) and isinstance(document, list):
+            merged = merge_sizes(merged, document)
+        elif file_name in DICT_DOCUMENTS and isinstance(merged, dict) and isinstance(document, dict):
+            merged = merge_dict(merged, document)
+        else:
+            # Not mergeable (e.g. invalid), the higher layer replaces the document and validation reports it
+            merged = document
+    return merged
+
+
+# ---------------------------------
+# Layered View
+# ---------------------------------
+
+class LayeredData:
+    """
+    A merged, read-only view of a base checkout and overlay roots
+    The view is cached: merged documents are kept until one of the files they were merged from changes,
+    and load() only rebuilds the brands whose files (in any layer) changed since the previous load.
+    :param base_root: The folder containing the base "data" and "stores" folders
+    :param overlay_roots: The overlay folders, applied in order
+    """
+
+    def __init__(self, base_root: PathLike = ".", overlay_roots: Optional[list[PathLike]] = None):
+        if overlay_roots is None:
+            overlay_roots = ["overlay"]
+        self.roots = [os.path.abspath(base_root)] + [os.path.abspath(x) for x in overlay_roots]
+        # Relative path (with "/" separators, e.g. "data/Polymaker/brand.json") -> the layers that have it
+        self._sources: dict[str, list[LayerSource]] = {}
+        # Relative folder -> sorted names of the sub folders in any layer
+        self._folders: dict[str, list[str]] = {}
+        # Merged documents and the source signatures they were merged from
+        self._documents: dict[str, tuple[tuple, Any]] = {}
+        # Expanded AIO files keyed by path, with the signature of the file they were read from
+        self._aio_files: dict[str, tuple[tuple[int, int], dict[str, Any]]] = {}
+        # Loaded brands keyed by brand folder name, with the signature of all the files they were built from
+        self._brands: dict[str, tuple[str, Optional[Brand]]] = {}
+        self._stores: Optional[tuple[str, dict[str, Store]]] = None
+
+    # Index
+
+    def refresh(self):
+        """Scan all layers for added, removed and changed files"""
+        sources: dict[str, list[LayerSource]] = {}
+        folders: dict[str, set[str]] = {}
+        for layer, root in enumerate(self.roots):
+            for top in (DATA_DIR, STORES_DIR):
+                self._scan(layer, os.path.join(root, top), top, sources, folders)
+        self._sources = sources
+        self._folders = {k: sorted(v) for k, v in folders.items()}
+
+    def _scan(self, layer: int, folder: str, rel: str, sources: dict[str, list[LayerSource]],
+              folders: dict[str, set[str]]):
+        try:
+            with os.scandir(folder) as it:
+                entries = list(it)
+        except OSError:
+            return
+        folders.setdefault(rel, set())
+        for entry in entries:
+            entry_rel = f"{rel}/{entry.name}"
+            if entry.is_dir():
+                folders[rel].add(entry.name)
+                self._scan(layer, entry.path, entry_rel, sources, folders)
+                continue
+            stat = entry.stat()
+            signature = (stat.st_mtime_ns, stat.st_size)
+            if rel.count("/") == 1 and rel.startswith(DATA_DIR) and entry.name.endswith(AIO_FILE_SUFFIX):
+                self._index_aio(layer, entry.path, signature, rel, sources, folders)
+            else:
+                sources.setdefault(entry_rel, []).append(LayerSource(layer, entry.path, signature))
+
+    def _index_aio(self, layer: int, path: str, signature: tuple[int, int], brand_rel: str,
+                   sources: dict[str, list[LayerSource]], folders: dict[str, set[str]]):
+        material_folder = os.path.basename(path)[:-len(AIO_FILE_SUFFIX)]
+        for aio_path in self._read_aio(path, signature):
+            parts = aio_path.split("/")
+            rel = brand_rel
+            for name in [material_folder] + parts[1:-1]:
+                folders.setdefault(rel, set()).add(name)
+                rel = f"{rel}/{name}"
+            folders.setdefault(rel, set())
+            sources.setdefault(f"{rel}/{parts[-1]}", []).append(LayerSource(layer, path, signature, aio_path))
+
+    def _read_aio(self, path: str, signature: tuple[int, int]) -> dict[str, Any]:
+        """Returns the documents of an AIO file keyed by their path inside the material folder"""
+        cached = self._aio_files.get(path)
+        if cached is not None and cached[0] == signature:
+            return cached[1]
+        documents = {}
+        aio_data = get_json_from_file(path)
+        if validate_json(aio_data, MATERIAL_AIO_SCHEMA):
+            files = aio_data_to_folder_files(aio_data)
+            documents = {x.as_posix(): y for x, y in files} if files is not None else {}
+        self._aio_files[path] = (signature, documents)
+        return documents
+
+    # Documents
+
+    def sources(self, rel_path: str) -> list[LayerSource]:
+        return self._sources.get(rel_path, [])
+
+    def exists(self, rel_path: str) -> bool:
+        return rel_path in self._sources
+
+    def sub_folders(self, rel_folder: str) -> list[str]:
+        """Returns the names of the sub folders of a folder in any layer, sorted"""
+        return self._folders.get(rel_folder, [])
+
+    def resolve_file(self, rel_path: str) -> Optional[str]:
+        """Returns the path of the highest layer's version of a (non-merged) file, e.g. a logo"""
+        sources = [x for x in self.sources(rel_path) if x.aio_path is None]
+        return sources[-1].path if sources else None
+
+    def document(self, rel_path: str) -> Any:
+        """
+        Returns the merged JSON document at rel_path, or None if no layer has it or it can't be read
+        The result is cached and shared, it must not be modified
+        """
+        sources = self.sources(rel_path)
+        if not sources:
+            return None
+        key = tuple((x.path, x.signature) for x in sources)
+        cached = self._documents.get(rel_path)
+        if cached is not None and cached[0] == key:
+            return cached[1]
+
+        documents = []
+        for source in sources:
+            if source.aio_path is not None:
+                documents.append(self._read_aio(source.path, source.signature).get(source.aio_path))
+            else:
+                documents.append(get_json_from_file(source.path))
+        merged = merge_documents(rel_path.rsplit("/", 1)[-1], documents)
+        self._documents[rel_path] = (key, merged)
+        return merged
+
+    def folder_signatures(self, top: str) -> dict[str, str]:
+        """
+        Returns a hash of the sources of every file below each folder within top ("data" or "stores") in any layer
+        The hash changes whenever a file below the folder is added, removed or changed in any layer
+        """
+        digests: dict[str, Any] = {}
+        prefix = top + "/"
+        for rel_path in sorted(self._sources):
+            if not rel_path.startswith(prefix):
+                continue
+            folder = rel_path[len(prefix):].split("/", 1)[0]
+            digest = digests.get(folder)
+            if digest is None:
+                digest = digests[folder] = hashlib.sha256()
+            for source in self._sources[rel_path]:
+                digest.update(f"{rel_path}\0{source.path}\0{source.signature}\n".encode("utf8"))
+        return {k: v.hexdigest() for k, v in digests.items()}
+
+    # Loading
+
+    def load_stores(self) -> dict[str, Store]:
+        """Returns the merged stores keyed by store id"""
+        signature = hashlib.sha256(canonical_json(self.folder_signatures(STORES_DIR)).encode("utf8")).hexdigest()
+        if self._stores is not None and self._stores[0] == signature:
+            return self._stores[1]
+        stores: dict[str, Store] = {}
+        for store_folder in self.sub_folders(STORES_DIR):
+            json_data = self.document(f"{STORES_DIR}/{store_folder}/store.json")
+            if json_data is None:
+                continue
+            if not validate_json(json_data, STORE_SCHEMA):
+                # An error msg will be emitted by the validate function if there is an error
+                continue
+            store = Store.from_json_data(json_data)
+            if store.store_id in stores:
+                print(f"There were multiple stores with the same store ID: {store.store_id}")
+                continue
+            stores[store.store_id] = store
+        self._stores = (signature, stores)
+        return stores
+
+    def load(self) -> tuple[list[Brand], dict[str, Store]]:
+        """
+        Load the merged brands and stores
+        Brands are cached, only the brands with changed files in any layer are rebuilt. A change to
+        the stores rebuilds all brands because purchase links reference the store objects.
+        Purchase links are resolved against the merged stores, the module's `stores` are left as they are.
+        """
+        with profile_span("refresh"):
+            self.refresh()
+        with profile_span("load_stores"):
+            stores = self.load_stores()
+        stores_signature = self._stores[0]
+
+        brands: list[Brand] = []
+        cache: dict[str, tuple[str, Optional[Brand]]] = {}
+        brand_signatures = self.folder_signatures(DATA_DIR)
+        for brand_folder in self.sub_folders(DATA_DIR):
+            rel = f"{DATA_DIR}/{brand_folder}"
+            signature = f"{stores_signature}:{brand_signatures.get(brand_folder)}"
+            cached = self._brands.get(brand_folder)
+            if cached is not None and cached[0] == signature:
+                brand = cached[1]
+            else:
+                try:
+                    with profile_span(brand_folder, "brand"):
+                        brand = self._load_brand(rel, stores)
+                except Exception as e:
+                    print(f"Failed to import brand {rel}: {e}")
+                    brand = None
+            cache[brand_folder] = (signature, brand)
+            if brand is not None:
+                brands.append(brand)
+        self._brands = cache
+        return brands, stores
+
+    def _require(self, rel_folder: str, file_name: str) -> Any:
+        rel_path = f"{rel_folder}/{file_name}"
+        if not self.exists(rel_path):
+            print(f"Failed to init from provided folder. No layer has a {file_name} file: {rel_folder}")
+            return None
+        return self.document(rel_path)
+
+    def _load_brand(self, rel: str, stores: dict[str, Store]) -> Optional[Brand]:
+        json_data = self._require(rel, LOAD_ORDER[0][0])
+        brand = Brand.from_json_data(json_data) if json_data is not None else None
+        if brand is None:
+            return None
+        for material_folder in self.sub_folders(rel):
+            material = self._load_material(f"{rel}/{material_folder}", stores)
+            if material is not None:
+                brand.materials.append(material)
+        return brand
+
+    def _load_material(self, rel: str, stores: dict[str, Store]) -> Optional[Material]:
+        json_data = self._require(rel, LOAD_ORDER[1][0])
+        material = Material.from_json_data(json_data) if json_data is not None else None
+        if material is None:
+            return None
+        for filament_folder in self.sub_folders(rel):
+            filament = self._load_filament(f"{rel}/{filament_folder}", material, stores)
+            if filament is not None:
+                material.filaments.append(filament)
+        return material
+
+    def _load_filament(self, rel: str, material: Material, stores: dict[str, Store]) -> Optional[Filament]:
+        json_data = self._require(rel, LOAD_ORDER[2][0])
+        filament = Filament.from_json_data(json_data, material) if json_data is not None else None
+        if filament is None:
+            return None
+        for variant_folder in self.sub_folders(rel):
+            variant = self._load_variant(f"{rel}/{variant_folder}", filament, stores)
+            if variant is not None:
+                filament.variants.append(variant)
+        return filament
+
+    def _load_variant(self, rel: str, filament: Filament, stores: dict[str, Store]) -> Optional[FilamentVariant]:
+        json_data = self._require(rel, LOAD_ORDER[3][0])
+        variant = FilamentVariant.from_json_data(json_data, filament) if json_data is not None else None
+        if variant is None:
+            return None
+        sizes_data = self._require(rel, LOAD_ORDER[3][1])
+        if sizes_data is None or not validate_json(sizes_data, SIZE_SCHEMA):
+            # An error msg will be emitted by the validate function if there is an error
+            return None
+        variant.sizes = [FilamentSize.from_json_data(x, store_map=stores) for x in sizes_data]
+        if not variant.sizes:
+            return None
+        return variant
+
+    def overlay_files(self) -> Iterator[tuple[str, LayerSource]]:
+        """Yields (relative path, source) for every file contributed by an overlay layer"""
+        for rel_path in sorted(self._sources):
+            for source in self._sources[rel_path]:
+                if source.layer > 0:
+                    yield rel_path, source
+
+
+def load_layered(base_root: PathLike = ".", overlay_roots: Optional[list[PathLike]] = None) -> tuple[list[Brand], dict[str, Store]]:
+    """Load the brands and stores of a base checkout with the overlays laid over it"""
+    return LayeredData(base_root, overlay_roots).load()
+
+
+# If running from the command line, provide argument parsing
+if __name__ == "__main__":
+    from argparse import ArgumentParser
+
+    parser = ArgumentParser(description="Load the database with private overlays laid over it")
+    parser.add_argument("--base", default=".", help="The folder containing the base 'data' and 'stores' folders")
+    parser.add_argument("--overlay", action="append",
+                        help="An overlay folder containing 'data' and/or 'stores' folders, can be repeated (default: ./overlay)")
+    parser.add_argument("--list", action="store_true", help="List the files contributed by the overlays")
+    parser.add_argument("--hash-manifest", help="Write the content hash manifest of the merged data to this file")
+    args = parser.parse_args()
+
+    view = LayeredData(args.base, args.overlay)
+    loaded_brands, loaded_stores = view.load()
+    if args.list:
+        for overlay_rel, overlay_source in view.overlay_files():
+            print(f"{overlay_rel} <- {overlay_source.path}")
+    if args.hash_manifest:
+        db_serializer.save_hash_manifest(db_serializer.build_hash_manifest(loaded_brands, loaded_stores),
+                                         args.hash_manifest)
+    print(f"Loaded {len(loaded_brands)} brands and {len(loaded_stores)} stores from {len(view.roots)} layers")
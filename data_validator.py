@@ -1,14 +1,24 @@
-import json
+import hashlib
+import math
 import re
 import os
-from concurrent.futures import ProcessPoolExecutor, as_completed
+import threading
+import time
+from collections import Counter
 from dataclasses import dataclass, field
 from enum import Enum
 from pathlib import Path
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Iterator, Tuple, Iterable, Callable, Set, TYPE_CHECKING
 
-from PIL import Image
-from jsonschema import validate, ValidationError as JsonSchemaValidationError
+import gtin
+import image_size
+import json_codec
+
+# Pillow, jsonschema, the executors, subprocess (git) and fs_watch are imported by the code using them,
+# so runs that don't need them (e.g. --folder-names or --store-ids) don't pay for importing them
+if TYPE_CHECKING:
+    from concurrent.futures import Executor
+    from fs_watch import FileChange
 
 
 # -------------------------
@@ -25,10 +35,41 @@ ILLEGAL_CHARACTERS = [
     "/", "$", "!", "'", '"', ":", "@", "+", "`", "|", "="
 ]
 
+# Validation tasks are sent to the worker processes in chunks, about this many chunks per worker
+# so the workers stay evenly busy, but never more tasks per chunk than the maximum
+CHUNKS_PER_WORKER = 4
+MAX_CHUNK_SIZE = 256
+
+# How validation tasks are run, "auto" picks one of the others per task type
+EXECUTORS = ("auto", "inline", "threads", "processes")
+# auto: The first tasks of each type are run inline to measure their cost. If the remaining tasks are estimated to
+# take less than INLINE_MAX_SECONDS they are run inline as well, since a pool would cost about as much to start.
+# Otherwise task types that mostly wait on the file system run on threads, the others on processes.
+AUTO_SAMPLE_SIZE = 16
+INLINE_MAX_SECONDS = 0.25
+IO_BOUND_TASK_TYPES = {'logo'}
+
 LOGO_MIN_SIZE = 100
 LOGO_MAX_SIZE = 400
+# Relative difference of width and height still considered square (rounding of SVG lengths)
+LOGO_SQUARE_TOLERANCE = 1e-6
 SNAKE_CASE_PATTERN = re.compile(r'^[a-z0-9]+(?:_[a-z0-9]+)*$')
 
+# All-in-one material files, stored in the brand folder instead of a material folder
+AIO_FILE_SUFFIX = ".material.json"
+
+# Results of earlier runs, see ValidationCache. Bump the version when the format of the cache file changes,
+# changes to the checks are noticed by hashing the validator modules (see validator_hash()).
+VALIDATION_CACHE_FILE = ".validation-cache"
+VALIDATOR_VERSION = 3
+# The hash of a file is reused while its size and modification time are unchanged, unless it was modified this
+# many seconds before the cache was written (it may change again within the file system's time resolution)
+RACY_FILE_SECONDS = 2
+
+# The modules the checks are implemented in, if one of them changes everything is validated (see changed_scope())
+# and no cached result is reused (see validator_hash())
+VALIDATOR_MODULES = ("data_validator.py", "gtin.py", "image_size.py", "json_codec.py")
+
 
 # -------------------------
 # Data Classes
@@ -78,9 +119,8 @@ class ValidationResult:
 def load_json(path: Path) -> Optional[Dict[str, Any]]:
     """Load JSON from file with error handling."""
     try:
-        with open(path, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    except (json.JSONDecodeError, OSError) as e:
+        return json_codec.load_file(path)
+    except (json_codec.JSONDecodeError, OSError) as e:
         return None
 
 
@@ -89,6 +129,206 @@ def cleanse_folder_name(name: str) -> str:
     return name.replace("/", " ").strip()
 
 
+def document_name(data: Any, key: str) -> Optional[str]:
+    """
+    Returns the cleansed name at data[key] ("" if missing), None if data isn't an object or the name isn't a
+    string. The schema validation reports such documents, the name checks skip them.
+    """
+    if not isinstance(data, dict):
+        return None
+    name = data.get(key, "")
+    return cleanse_folder_name(name) if isinstance(name, str) else None
+
+
+def document_list(data: dict, key: str) -> list:
+    """Returns the list at data[key], an empty list if missing or not a list"""
+    items = data.get(key)
+    return items if isinstance(items, list) else []
+
+
+def iter_aio_files(manifest: 'TreeManifest') -> Iterator[Path]:
+    """Yield all AIO material files within the brand folders."""
+    for brand in manifest.brands:
+        yield from brand.aio_files()
+
+
+def extract_sizes_facts(path: Path, data: Any) -> List[List[Any]]:
+    """
+    Extract what the cross-file checks need from a sizes.json or AIO material file, per sizes list:
+    [JSON path, [[size index, gtin, ean, [[purchase link index, store_id], ...]], ...]]
+    Malformed documents are reported by the schema validation, the parts that can't be read are left out.
+    """
+    if path.name.endswith(AIO_FILE_SUFFIX):
+        sizes_lists = []
+        filaments = data.get("filaments", []) if isinstance(data, dict) else []
+        for filament_idx, filament in enumerate(filaments):
+            if not isinstance(filament, dict):
+                continue
+            for variant_idx, variant in enumerate(filament.get("variants", [])):
+                if not isinstance(variant, dict):
+                    continue
+                sizes_lists.append((f"$.filaments[{filament_idx}].variants[{variant_idx}].sizes", variant.get("sizes")))
+    else:
+        sizes_lists = [("$", data)]
+
+    facts = []
+    for json_path, sizes in sizes_lists:
+        if not isinstance(sizes, list):
+            continue
+        entries = []
+        for size_idx, size in enumerate(sizes):
+            if not isinstance(size, dict):
+                continue
+            links = size.get("purchase_links", [])
+            store_ids = [[idx, link.get("store_id")] for idx, link in enumerate(links if isinstance(links, list) else [])
+                         if isinstance(link, dict)]
+            entries.append([size_idx, size.get("gtin"), size.get("ean"), store_ids])
+        facts.append([json_path, entries])
+    return facts
+
+
+def extract_store_id(path: Path, data: Any) -> Optional[str]:
+    """Extract the id of a store.json file."""
+    return data.get("id") if isinstance(data, dict) else None
+
+
+def iter_sizes_facts(manifest: 'TreeManifest', cache: 'ValidationCache',
+                     files: Optional[List[Path]] = None) -> Iterator[Tuple[Path, str, List[Any]]]:
+    """
+    Yield (file, JSON path, sizes facts) for every sizes list in the data folder (in files if given),
+    both sizes.json files and the sizes embedded in AIO material files, see extract_sizes_facts().
+    """
+    for path in manifest.sizes_files() if files is None else files:
+        for json_path, sizes in cache.facts(path, extract_sizes_facts):
+            yield path, json_path, sizes
+
+
+# -------------------------
+# Tree Manifest
+# -------------------------
+
+# The folder levels of the data folder, variant folders only contain files
+DATA_LEVELS = ("brand", "material", "filament", "variant")
+
+
+@dataclass
+class ManifestDir:
+    """A folder of the data or stores tree with the files and folders directly within it."""
+    kind: str
+    path: Path
+    files: List[str] = field(default_factory=list)
+    children: List['ManifestDir'] = field(default_factory=list)
+    _file_paths: Dict[str, Path] = field(default_factory=dict, repr=False)
+
+    @property
+    def name(self) -> str:
+        return self.path.name
+
+    def has_file(self, name: str) -> bool:
+        return name in self.files
+
+    def file_path(self, name: str) -> Path:
+        """The path of a file in this folder, the same Path object every time."""
+        if name not in self._file_paths:
+            self._file_paths[name] = self.path / name
+        return self._file_paths[name]
+
+    def has_child(self, name: str) -> bool:
+        return any(x.name == name for x in self.children)
+
+    def aio_files(self) -> List[Path]:
+        return [self.file_path(x) for x in self.files if x.endswith(AIO_FILE_SUFFIX)]
+
+    def iter_tree(self) -> Iterator['ManifestDir']:
+        """Yield this folder and all folders below it, depth first."""
+        yield self
+        for child in self.children:
+            yield from child.iter_tree()
+
+
+@dataclass
+class TreeManifest:
+    """Every brand/material/filament/variant and store folder, see scan_tree()."""
+    data_dir: Path
+    stores_dir: Path
+    brands: List[ManifestDir] = field(default_factory=list)
+    stores: List[ManifestDir] = field(default_factory=list)
+    _sizes_files: Optional[List[Path]] = field(default=None, repr=False)
+
+    def sizes_files(self) -> List[Path]:
+        """The sizes.json files, then the AIO material files of the data folder (see iter_sizes_facts())."""
+        if self._sizes_files is None:
+            self._sizes_files = [x.file_path("sizes.json") for x in self.iter_data_dirs() if x.has_file("sizes.json")]
+            self._sizes_files += iter_aio_files(self)
+        return self._sizes_files
+
+    def iter_data_dirs(self) -> Iterator[ManifestDir]:
+        for brand in self.brands:
+            yield from brand.iter_tree()
+
+    def iter_dirs(self, scope: Optional['ValidationScope'] = None, recursive: bool = True) -> Iterator[ManifestDir]:
+        """
+        Yield the data folders depth first, then the store folders.
+        With a scope only the folders containing changed paths are visited, unless a schema changed.
+        recursive: Only yield the brand and store folders if False
+        """
+        prune = scope is not None and not scope.schemas
+
+        def walk(directories: List[ManifestDir]) -> Iterator[ManifestDir]:
+            for directory in directories:
+                if prune and not scope.includes_path(directory.path):
+                    continue
+                yield directory
+                if recursive:
+                    yield from walk(directory.children)
+
+        yield from walk(self.brands)
+        yield from walk(self.stores)
+
+    def rescan(self, paths: Iterable[Path]) -> None:
+        """Scan the brand and store folders containing paths again, e.g. after files within them changed."""
+        paths = [os.path.abspath(x) for x in paths]
+        self._sizes_files = None
+        for root, top_level, kinds in ((self.data_dir, self.brands, DATA_LEVELS),
+                                       (self.stores_dir, self.stores, ("store",))):
+            prefix = os.path.abspath(root) + os.sep
+            names = {x[len(prefix):].split(os.sep)[0] for x in paths if x.startswith(prefix)}
+            for name in sorted(names):
+                index = next((i for i, x in enumerate(top_level) if x.name == name), len(top_level))
+                try:
+                    scanned = [_scan_dir(root / name, kinds[0], kinds[1:])]
+                except OSError:
+                    # Deleted (or not a folder)
+                    scanned = []
+                top_level[index:index + 1] = scanned
+
+
+def _scan_dir(path: Path, kind: str, child_kinds: Tuple[str, ...]) -> ManifestDir:
+    directory = ManifestDir(kind, path)
+    with os.scandir(path) as entries:
+        for entry in entries:
+            if entry.is_dir():
+                if child_kinds:
+                    directory.children.append(_scan_dir(Path(entry.path), child_kinds[0], child_kinds[1:]))
+            elif entry.is_file():
+                directory.files.append(entry.name)
+    return directory
+
+
+def scan_tree(data_dir: Path, stores_dir: Path) -> TreeManifest:
+    """
+    Scan the data and stores folders in one pass.
+    os.scandir() returns the type of each entry with the listing, so every entry is visited once
+    and the validators check for files in the manifest instead of asking the file system again.
+    """
+    return TreeManifest(
+        data_dir=data_dir,
+        stores_dir=stores_dir,
+        brands=_scan_dir(data_dir, "data", DATA_LEVELS).children,
+        stores=_scan_dir(stores_dir, "stores", ("store",)).children
+    )
+
+
 # -------------------------
 # Schema Cache
 # -------------------------
@@ -98,6 +338,8 @@ class SchemaCache:
 
     def __init__(self):
         self._schemas: Dict[str, Dict] = {}
+        self._validators: Dict[str, Any] = {}
+        self._digests: Dict[str, Optional[str]] = {}
         self._schema_paths = {
             'store':    'schemas/store_schema.json',
             'brand':    'schemas/brand_schema.json',
@@ -105,6 +347,7 @@ class SchemaCache:
             'filament': 'schemas/filament_schema.json',
             'variant':  'schemas/variant_schema.json',
             'sizes':    'schemas/sizes_schema.json',
+            'material_aio': 'schemas/material_aio_schema.json',
         }
 
     def get(self, schema_name: str) -> Optional[Dict]:
@@ -115,6 +358,407 @@ class SchemaCache:
                 self._schemas[schema_name] = load_json(path)
         return self._schemas.get(schema_name)
 
+    def schema_name_of(self, path: Path) -> Optional[str]:
+        """Get the name of the schema stored at path, None if it isn't a schema file."""
+        path = os.path.abspath(path)
+        return next((name for name, x in self._schema_paths.items() if os.path.abspath(x) == path), None)
+
+    def digest(self, schema_name: str) -> Optional[str]:
+        """Get the hash of the schema file, None if it doesn't exist."""
+        if schema_name not in self._digests:
+            try:
+                data = Path(self._schema_paths.get(schema_name, '')).read_bytes()
+                self._digests[schema_name] = hashlib.blake2b(data, digest_size=16).hexdigest()
+            except OSError:
+                self._digests[schema_name] = None
+        return self._digests[schema_name]
+
+    def get_validator(self, schema_name: str) -> Optional[Any]:
+        """Get the jsonschema validator of a schema, the schema itself is only checked once."""
+        if schema_name not in self._validators:
+            schema = self.get(schema_name)
+            if schema is None:
+                return None
+            from jsonschema.validators import validator_for
+            cls = validator_for(schema)
+            cls.check_schema(schema)
+            self._validators[schema_name] = cls(schema)
+        return self._validators[schema_name]
+
+    def invalidate(self, schema_name: str) -> None:
+        """Forget a schema, e.g. after its file changed."""
+        for cached in (self._schemas, self._validators, self._digests):
+            cached.pop(schema_name, None)
+
+
+# -------------------------
+# Document Cache
+# -------------------------
+
+class DocumentCache:
+    """
+    Parsed JSON documents by path, so every file is read and decoded once per run.
+    Files that fail to load are cached as None, the same as load_json() returns.
+    The orchestrator's cache is filled in the main process; tasks carry the documents
+    they need to the worker processes (see ValidationTask.documents).
+    """
+
+    def __init__(self, documents: Optional[Dict[Path, Any]] = None):
+        self._documents: Dict[Path, Any] = dict(documents or {})
+        self._digests: Dict[Path, Optional[str]] = {}
+        # (size, mtime_ns, digest) of the files that were read, by path
+        self.file_digests: Dict[str, Tuple[int, int, str]] = {}
+        # file_digests of an earlier run, see digest()
+        self.known_digests: Dict[str, Tuple[int, int, str]] = {}
+
+    def _read(self, path: Path) -> Optional[bytes]:
+        try:
+            with open(path, mode="rb") as f:
+                stat = os.fstat(f.fileno())
+                data = f.read()
+        except OSError:
+            return None
+        self.file_digests[str(path)] = (stat.st_size, stat.st_mtime_ns,
+                                        hashlib.blake2b(data, digest_size=16).hexdigest())
+        return data
+
+    def _set_digest(self, path: Path, data: Optional[bytes]) -> None:
+        self._digests[path] = None if data is None else self.file_digests[str(path)][2]
+
+    def get(self, path: Path) -> Any:
+        """Get the document at path, loading it if necessary."""
+        if path not in self._documents:
+            data = self._read(path)
+            if path not in self._digests:
+                self._set_digest(path, data)
+            try:
+                self._documents[path] = None if data is None else json_codec.loads(data)
+            except (json_codec.JSONDecodeError, UnicodeDecodeError):
+                self._documents[path] = None
+        return self._documents[path]
+
+    def digest(self, path: Path) -> Optional[str]:
+        """
+        Get the hash of the content of the file at path (any file, not only JSON), None if it can't be read.
+        The hash of known_digests is used without reading the file if its size and modification time match.
+        """
+        if path not in self._digests:
+            known = self.known_digests.get(str(path))
+            if known is not None:
+                try:
+                    stat = os.stat(path)
+                    if (stat.st_size, stat.st_mtime_ns) == (known[0], known[1]):
+                        self.file_digests[str(path)] = known
+                        self._digests[path] = known[2]
+                        return known[2]
+                except OSError:
+                    pass
+            self._set_digest(path, self._read(path))
+        return self._digests[path]
+
+    def subset(self, *paths: Path) -> Dict[Path, Any]:
+        """The documents at paths, to send them along with a task."""
+        return {x: self.get(x) for x in paths}
+
+    def invalidate(self, path: Path) -> None:
+        """Forget the document and hash of the file at path, e.g. after it changed."""
+        self._documents.pop(path, None)
+        self._digests.pop(path, None)
+        self.file_digests.pop(str(path), None)
+        self.known_digests.pop(str(path), None)
+
+    def overlay(self, documents: Dict[Path, Any]) -> 'DocumentCache':
+        """A copy that returns the given documents instead of reading the files at their paths (e.g. unsaved edits)."""
+        copy = DocumentCache({**self._documents, **documents})
+        copy._digests = {k: v for k, v in self._digests.items() if k not in documents}
+        copy.known_digests = self.known_digests
+        return copy
+
+    def clear(self) -> None:
+        """Forget every document and hash, e.g. after changes were missed."""
+        self._documents.clear()
+        self._digests.clear()
+
+
+# -------------------------
+# Validation Cache
+# -------------------------
+
+# The hash of the contents of VALIDATOR_MODULES, see validator_hash()
+_validator_hash: Optional[str] = None
+
+
+def validator_hash() -> str:
+    """The hash of the validator modules, results cached by a different version of the checks aren't reused."""
+    global _validator_hash
+    if _validator_hash is None:
+        validator_dir = os.path.dirname(os.path.abspath(__file__))
+        digest = hashlib.blake2b(digest_size=16)
+        for module in VALIDATOR_MODULES:
+            with open(os.path.join(validator_dir, module), mode="rb") as f:
+                digest.update(hashlib.blake2b(f.read(), digest_size=16).digest())
+        _validator_hash = digest.hexdigest()
+    return _validator_hash
+
+
+class ValidationCache:
+    """
+    Results of earlier runs, stored as JSON in the cache file (VALIDATION_CACHE_FILE by default).
+    The result of a task is reused if the validator's code (see validator_hash()), its options, the content
+    of every file it reads and the schema it validates against are unchanged. The cross-file checks (store IDs, GTIN/EAN)
+    work on facts extracted from each file, which are reused as long as the file's content is unchanged.
+    Without a path nothing is reused or stored, facts are only kept for the current run.
+    """
+
+    def __init__(self, path: Optional[Path], documents: DocumentCache, schema_cache: SchemaCache):
+        self.path = path
+        self.documents = documents
+        self.schema_cache = schema_cache
+        self.hits = 0
+        # Task results by task id: {"key": cache key, "errors": [[level, category, message, path], ...]}
+        self._results: Dict[str, Dict[str, Any]] = {}
+        # Facts by file path: {"hash": content hash, "kind": extract function, "facts": ...}
+        self._facts: Dict[str, Dict[str, Any]] = {}
+        self._seen_tasks = set()
+        self._seen_files = set()
+        self._keys: Dict[str, str] = {}
+        # Whether anything was added that isn't in the cache file yet
+        self._changed = False
+
+        # Results and facts of other validator code are not reused, the hashes of the files still are
+        self.validator_hash = validator_hash() if path is not None else None
+        stored = load_json(path) if path is not None else None
+        if isinstance(stored, dict) and stored.get("version") == VALIDATOR_VERSION:
+            if stored.get("validator") == self.validator_hash:
+                self._results = stored.get("results", {})
+                self._facts = stored.get("facts", {})
+            documents.known_digests = stored.get("digests", {})
+
+    @staticmethod
+    def task_id(task: 'ValidationTask') -> str:
+        return f"{task.task_type}:{task.path}"
+
+    def task_key(self, task: 'ValidationTask') -> str:
+        """Hash of everything the result of a task depends on."""
+        parts = [VALIDATOR_VERSION, self.validator_hash, task.path, sorted((task.extra_data or {}).items()),
+                 *(self.documents.digest(x) for x in task.inputs)]
+        if task.task_type == 'json':
+            parts.append(self.schema_cache.digest(task.extra_data['schema_name']))
+        return hashlib.blake2b("\0".join(map(str, parts)).encode("utf8"), digest_size=16).hexdigest()
+
+    def get_result(self, task: 'ValidationTask') -> Optional[ValidationResult]:
+        """Get the cached result of a task, None if it has to be run."""
+        task_id = self.task_id(task)
+        self._seen_tasks.add(task_id)
+        if self.path is None:
+            return None
+
+        key = self._keys[task_id] = self.task_key(task)
+        entry = self._results.get(task_id)
+        if entry is None or entry.get("key") != key:
+            return None
+        self.hits += 1
+        return ValidationResult([ValidationError(ValidationLevel(level), category, message,
+                                                 Path(path) if path else None)
+                                 for level, category, message, path in entry["errors"]])
+
+    def put_result(self, task: 'ValidationTask', result: ValidationResult) -> None:
+        """
+        Store the result of a task, unless the task failed to run or hit a failure that doesn't depend on its
+        inputs (errors of the "System" category), those results would be replayed after the cause is fixed.
+        """
+        task_id = self.task_id(task)
+        if self.path is None or any(x.category == "System" for x in result.errors):
+            return
+        key = self._keys.get(task_id) or self.task_key(task)
+        self._changed = True
+        self._results[task_id] = {
+            "key": key,
+            "errors": [[x.level.value, x.category, x.message, str(x.path) if x.path else None] for x in result.errors]
+        }
+
+    def facts(self, path: Path, extract) -> Any:
+        """Get extract(path, document) for the file at path, extracting it again only if the file changed."""
+        path_id = str(path)
+        self._seen_files.add(path_id)
+        entry = self._facts.get(path_id)
+        digest = self.documents.digest(path)
+        if entry is not None and entry.get("hash") == digest and entry.get("kind") == extract.__name__:
+            return entry["facts"]
+        facts = extract(path, self.documents.get(path))
+        self._changed = True
+        self._facts[path_id] = {"hash": digest, "kind": extract.__name__, "facts": facts}
+        return facts
+
+    def previous_facts(self, path: Path, extract) -> Any:
+        """
+        Get the facts stored for the file at path, even if the file changed since. Usable as the old_facts of
+        changed_scope(). extract(path, None) is returned if none are stored (e.g. a new file).
+        """
+        entry = self._facts.get(str(path))
+        if entry is not None and entry.get("kind") == extract.__name__:
+            return entry["facts"]
+        return extract(path, None)
+
+    def save(self, prune: bool = False) -> None:
+        """
+        Write the cache file.
+        prune: Drop the entries of tasks and files that weren't used in this run (e.g. deleted files),
+               only when all checks were run.
+        """
+        if self.path is None:
+            return
+        if prune:
+            self._changed |= not (self._seen_tasks.issuperset(self._results) and
+                                  self._seen_files.issuperset(self._facts))
+        # Files that were read (new, changed or racy ones) have new digests
+        known = self.documents.known_digests
+        if not self._changed and all(tuple(known.get(k, ())) == tuple(v)
+                                     for k, v in self.documents.file_digests.items()):
+            return
+        results, facts = self._results, self._facts
+        digests = {**self.documents.known_digests, **self.documents.file_digests}
+        if prune:
+            results = {k: v for k, v in results.items() if k in self._seen_tasks}
+            facts = {k: v for k, v in facts.items() if k in self._seen_files}
+            digests = self.documents.file_digests
+        racy_ns = time.time_ns() - RACY_FILE_SECONDS * 1_000_000_000
+        digests = {k: v for k, v in digests.items() if v[1] < racy_ns}
+        data = json_codec.dumps_bytes({"version": VALIDATOR_VERSION, "validator": self.validator_hash,
+                                       "results": results, "facts": facts, "digests": digests},
+                                      separators=(",", ":"))
+        # The CLI, --watch and the daemon share the cache file, it's replaced in one step so none of them
+        # reads a partly written file. The temp file is created like open() would (mode 0666 minus the umask).
+        tmp_path = self.path.with_name(f".{self.path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o666)
+        try:
+            with os.fdopen(fd, mode="wb") as f:
+                f.write(data)
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+
+# -------------------------
+# Validation Scope
+# -------------------------
+
+@dataclass
+class ValidationScope:
+    """
+    The part of the tree a run validates when only some files changed, see changed_scope().
+    Tasks and errors outside of the scope are skipped, the ones within it are the same as in a full run.
+    """
+    # Absolute paths of the changed files and the folders containing them
+    paths: Set[str] = field(default_factory=set)
+    # Changed schemas, all files validated against them are in scope
+    schemas: Set[str] = field(default_factory=set)
+    # Old and new ids of changed stores, all purchase links to them are in scope
+    store_ids: Set[str] = field(default_factory=set)
+    # Old and new GTIN/EAN codes (normalized) of changed sizes, all sizes with these codes are in scope
+    codes: Set[str] = field(default_factory=set)
+
+    def includes_path(self, path: Path) -> bool:
+        return os.path.abspath(path) in self.paths
+
+    def includes_task(self, task: 'ValidationTask') -> bool:
+        if task.task_type == 'json' and task.extra_data['schema_name'] in self.schemas:
+            return True
+        # Logos and AIO file names depend on their folder's brand.json/store.json or material folders
+        if task.task_type in ('logo', 'aio_names') and self.includes_path(task.path.parent):
+            return True
+        return self.includes_path(task.path)
+
+
+def _codes(*values: Any) -> Iterator[str]:
+    """The normalized GTIN/EAN codes among values, malformed ones are left out."""
+    for code in values:
+        if isinstance(code, str) and gtin.ANY_GTIN_PATTERN.fullmatch(code):
+            yield gtin.normalize_gtin(code)
+
+
+def _sizes_codes(facts: Optional[List[List[Any]]]) -> Iterator[str]:
+    """The normalized GTIN/EAN codes of extract_sizes_facts()."""
+    for _, sizes in facts or []:
+        for _, size_gtin, size_ean, _ in sizes:
+            yield from _codes(size_gtin, size_ean)
+
+
+def changed_scope(changed: Iterable[Path], manifest: TreeManifest, cache: ValidationCache,
+                  old_facts: Callable[[Path, Callable], Any]) -> Optional[ValidationScope]:
+    """
+    Build the scope of the changed files and the files depending on them.
+    Returns None if a validator module changed and everything has to be validated.
+    changed: The added, modified and deleted files
+    old_facts: Returns extract(path, document) for the previous version of a changed file,
+               the document is None if the file didn't exist. It's called before the current facts are extracted.
+    """
+    validator_dir = os.path.dirname(os.path.abspath(__file__))
+    roots = [os.path.abspath(manifest.data_dir), os.path.abspath(manifest.stores_dir)]
+    scope = ValidationScope()
+
+    for path in changed:
+        absolute = os.path.abspath(path)
+        if os.path.dirname(absolute) == validator_dir and os.path.basename(absolute) in VALIDATOR_MODULES:
+            return None
+
+        schema_name = cache.schema_cache.schema_name_of(path)
+        if schema_name is not None:
+            scope.schemas.add(schema_name)
+            continue
+
+        root = next((x for x in roots if absolute.startswith(x + os.sep)), None)
+        if root is None:
+            continue
+        scope.paths.add(absolute)
+        parent = os.path.dirname(absolute)
+        while parent != root:
+            scope.paths.add(parent)
+            parent = os.path.dirname(parent)
+
+        if root == roots[1] and path.name == "store.json":
+            for store_id in (old_facts(path, extract_store_id), cache.facts(path, extract_store_id)):
+                if store_id is not None:
+                    scope.store_ids.add(store_id)
+        elif root == roots[0] and (path.name == "sizes.json" or path.name.endswith(AIO_FILE_SUFFIX)):
+            scope.codes.update(_sizes_codes(old_facts(path, extract_sizes_facts)))
+            scope.codes.update(_sizes_codes(cache.facts(path, extract_sizes_facts)))
+
+    return scope
+
+
+def git_changed_paths(rev: str) -> List[Path]:
+    """
+    The files that differ between rev and the working tree, including untracked files.
+    :raises subprocess.CalledProcessError: If git fails, e.g. rev doesn't exist
+    """
+    import subprocess
+
+    def git(*args: str) -> List[str]:
+        return subprocess.run(["git", *args], check=True, capture_output=True, text=True).stdout.splitlines()
+
+    top_level = Path(git("rev-parse", "--show-toplevel")[0])
+    names = git("diff", "--name-only", "--no-renames", rev, "--")
+    names += git("ls-files", "--others", "--exclude-standard", "--full-name")
+    return [Path(os.path.relpath(top_level / x)) for x in dict.fromkeys(names)]
+
+
+def git_old_facts(rev: str) -> Callable[[Path, Callable], Any]:
+    """old_facts for changed_scope(), reading the previous versions with git show."""
+    import subprocess
+
+    def old_facts(path: Path, extract: Callable) -> Any:
+        spec = f"{rev}:./{path.as_posix()}"
+        process = subprocess.run(["git", "show", spec], capture_output=True)
+        try:
+            data = json_codec.loads(process.stdout) if process.returncode == 0 else None
+        except (json_codec.JSONDecodeError, UnicodeDecodeError):
+            data = None
+        return extract(path, data)
+
+    return old_facts
+
 
 # -------------------------
 # Validators
@@ -123,8 +767,11 @@ class SchemaCache:
 class BaseValidator:
     """Base class for all validators."""
 
-    def __init__(self, schema_cache: Optional[SchemaCache] = None):
+    def __init__(self, schema_cache: Optional[SchemaCache] = None, documents: Optional[DocumentCache] = None,
+                 cache: Optional[ValidationCache] = None):
         self.schema_cache = schema_cache or SchemaCache()
+        self.documents = documents or DocumentCache()
+        self.cache = cache or ValidationCache(None, self.documents, self.schema_cache)
 
     def validate(self, *args, **kwargs) -> ValidationResult:
         """Override in subclasses."""
@@ -138,7 +785,7 @@ class JsonValidator(BaseValidator):
         """Validate a single JSON file against a schema."""
         result = ValidationResult()
 
-        data = load_json(json_path)
+        data = self.documents.get(json_path)
         if data is None:
             result.add_error(ValidationError(
                 level=ValidationLevel.ERROR,
@@ -148,8 +795,8 @@ class JsonValidator(BaseValidator):
             ))
             return result
 
-        schema = self.schema_cache.get(schema_name)
-        if schema is None:
+        schema_validator = self.schema_cache.get_validator(schema_name)
+        if schema_validator is None:
             result.add_error(ValidationError(
                 level=ValidationLevel.ERROR,
                 category="JSON",
@@ -158,9 +805,10 @@ class JsonValidator(BaseValidator):
             ))
             return result
 
-        try:
-            validate(data, schema)
-        except JsonSchemaValidationError as e:
+        # The same error jsonschema.validate() would raise
+        from jsonschema.exceptions import best_match
+        e = best_match(schema_validator.iter_errors(data))
+        if e is not None:
             result.add_error(ValidationError(
                 level=ValidationLevel.ERROR,
                 category="JSON",
@@ -171,12 +819,50 @@ class JsonValidator(BaseValidator):
         return result
 
 
+# Logo sizes by (content hash, is SVG), see LogoValidator.logo_size()
+_logo_sizes: Dict[Tuple[Optional[str], bool], Tuple[float, float]] = {}
+
+
 class LogoValidator(BaseValidator):
     """Validates logo files (dimensions and naming)."""
 
+    def logo_size(self, logo_path: Path, is_svg: bool) -> Tuple[float, float]:
+        """
+        Get the (width, height) of a logo from its header (see image_size), or from Pillow for other formats.
+        Sizes are kept by content hash, copies of a logo (e.g. of a brand and its store) are only read once.
+        :raises ValueError: If the content of the logo can't be read as an image
+        """
+        key = (self.documents.digest(logo_path), is_svg)
+        size = _logo_sizes.get(key)
+        if size is not None:
+            return size
+
+        with open(logo_path, mode="rb") as f:
+            if is_svg:
+                size = image_size.read_svg_size(f)
+            else:
+                try:
+                    size = image_size.read_image_size(f)
+                except ValueError:
+                    # Formats without a header reader (e.g. AVIF or GIF)
+                    from PIL import Image, UnidentifiedImageError
+
+                    f.seek(0)
+                    try:
+                        with Image.open(f) as img:
+                            size = img.size
+                    except UnidentifiedImageError as e:
+                        raise ValueError(str(e)) from None
+        if key[0] is not None:
+            _logo_sizes[key] = size
+        return size
+
     def validate_logo_file(self, logo_path: Path,
-                           logo_name: str = None) -> ValidationResult:
-        """Validate logo dimensions and naming convention."""
+                           logo_name: str = None, exists: Optional[bool] = None) -> ValidationResult:
+        """
+        Validate logo dimensions and naming convention.
+        exists: Whether the logo file exists if already known (e.g. from the tree manifest).
+        """
         result = ValidationResult()
 
         # Check if logo name contains "/" (should be just filename)
@@ -188,7 +874,7 @@ class LogoValidator(BaseValidator):
                 path=logo_path.parent
             ))
 
-        if not logo_path.exists():
+        if not (logo_path.exists() if exists is None else exists):
             result.add_error(ValidationError(
                 level=ValidationLevel.ERROR,
                 category="Logo",
@@ -209,42 +895,57 @@ class LogoValidator(BaseValidator):
                     path=logo_path
                 ))
 
-        # Validate dimensions for non-SVG files
-        if not name.endswith('.svg'):
-            try:
-                with Image.open(logo_path) as img:
-                    width, height = img.size
+        # Validate dimensions, SVG logos are scalable so they only have to be square
+        is_svg = name.endswith('.svg')
+        try:
+            width, height = self.logo_size(logo_path, is_svg)
+        except ValueError as e:
+            result.add_error(ValidationError(
+                level=ValidationLevel.ERROR,
+                category="Logo",
+                message=f"Failed to read {'SVG' if is_svg else 'image'}: {str(e)}",
+                path=logo_path
+            ))
+            return result
+        except Exception as e:
+            # Not caused by the logo itself (e.g. Pillow missing or the file unreadable), so the result
+            # isn't cached (see ValidationCache.put_result())
+            result.add_error(ValidationError(
+                level=ValidationLevel.ERROR,
+                category="System",
+                message=f"Failed to read {'SVG' if is_svg else 'image'}: {str(e)}",
+                path=logo_path
+            ))
+            return result
 
-                    if width != height:
-                        result.add_error(ValidationError(
-                            level=ValidationLevel.ERROR,
-                            category="Logo",
-                            message=f"Logo must be square (width={width}, height={height})",
-                            path=logo_path
-                        ))
+        # SVG sizes are floats, scaled by the aspect ratio of the viewBox if only one length is given.
+        # SVG logos weren't checked before, so a non-square one is only a warning
+        if not math.isclose(width, height, rel_tol=LOGO_SQUARE_TOLERANCE):
+            result.add_error(ValidationError(
+                level=ValidationLevel.WARNING if is_svg else ValidationLevel.ERROR,
+                category="Logo",
+                message=f"Logo must be square (width={width:g}, height={height:g})",
+                path=logo_path
+            ))
 
-                    if width < LOGO_MIN_SIZE or height < LOGO_MIN_SIZE:
-                        result.add_error(ValidationError(
-                            level=ValidationLevel.ERROR,
-                            category="Logo",
-                            message=f"Logo dimensions too small (minimum {LOGO_MIN_SIZE}x{LOGO_MIN_SIZE})",
-                            path=logo_path
-                        ))
+        if is_svg:
+            return result
 
-                    if width > LOGO_MAX_SIZE or height > LOGO_MAX_SIZE:
-                        result.add_error(ValidationError(
-                            level=ValidationLevel.ERROR,
-                            category="Logo",
-                            message=f"Logo dimensions too large (maximum {LOGO_MAX_SIZE}x{LOGO_MAX_SIZE})",
-                            path=logo_path
-                        ))
-            except Exception as e:
-                result.add_error(ValidationError(
-                    level=ValidationLevel.ERROR,
-                    category="Logo",
-                    message=f"Failed to read image: {str(e)}",
-                    path=logo_path
-                ))
+        if width < LOGO_MIN_SIZE or height < LOGO_MIN_SIZE:
+            result.add_error(ValidationError(
+                level=ValidationLevel.ERROR,
+                category="Logo",
+                message=f"Logo dimensions too small (minimum {LOGO_MIN_SIZE}x{LOGO_MIN_SIZE})",
+                path=logo_path
+            ))
+
+        if width > LOGO_MAX_SIZE or height > LOGO_MAX_SIZE:
+            result.add_error(ValidationError(
+                level=ValidationLevel.ERROR,
+                category="Logo",
+                message=f"Logo dimensions too large (maximum {LOGO_MAX_SIZE}x{LOGO_MAX_SIZE})",
+                path=logo_path
+            ))
 
         return result
 
@@ -253,12 +954,15 @@ class FolderNameValidator(BaseValidator):
     """Validates that folder names match JSON content."""
 
     def validate_folder_name(self, folder_path: Path, json_file: str,
-                             json_key: str) -> ValidationResult:
-        """Validate that folder name matches the value in the JSON file."""
+                             json_key: str, json_exists: Optional[bool] = None) -> ValidationResult:
+        """
+        Validate that folder name matches the value in the JSON file.
+        json_exists: Whether the JSON file exists if already known (e.g. from the tree manifest).
+        """
         result = ValidationResult()
 
         json_path = folder_path / json_file
-        if not json_path.exists():
+        if not (json_path.exists() if json_exists is None else json_exists):
             result.add_error(ValidationError(
                 level=ValidationLevel.ERROR,
                 category="Folder",
@@ -267,11 +971,9 @@ class FolderNameValidator(BaseValidator):
             ))
             return result
 
-        data = load_json(json_path)
-        if data is None:
+        expected_name = document_name(self.documents.get(json_path), json_key)
+        if expected_name is None:
             return result
-
-        expected_name = cleanse_folder_name(data.get(json_key, ""))
         actual_name = folder_path.name
 
         if actual_name != expected_name:
@@ -289,35 +991,102 @@ class FolderNameValidator(BaseValidator):
 
         return result
 
+    def validate_aio_names(self, aio_path: Path, folder_exists: Optional[bool] = None) -> ValidationResult:
+        """
+        Validate the names within an AIO material file.
+        The file name must match the material and filament/variant names must be unique,
+        the same as if the material was stored as folders.
+        folder_exists: Whether a material folder of the same name exists if already known.
+        """
+        result = ValidationResult()
+
+        data = self.documents.get(aio_path)
+        if not isinstance(data, dict):
+            return result
+
+        expected_name = document_name(data, "material")
+        actual_name = aio_path.name[:-len(AIO_FILE_SUFFIX)]
+        if expected_name is not None and actual_name != expected_name and not any(char in expected_name for char in ILLEGAL_CHARACTERS):
+            result.add_error(ValidationError(
+                level=ValidationLevel.ERROR,
+                category="Folder",
+                message=f"AIO file name '{actual_name}' does not match 'material' value '{expected_name}'",
+                path=aio_path
+            ))
+
+        if folder_exists is None:
+            folder_exists = aio_path.with_name(actual_name).is_dir()
+        if folder_exists:
+            result.add_error(ValidationError(
+                level=ValidationLevel.ERROR,
+                category="Folder",
+                message=f"Material '{actual_name}' is stored both as a folder and as an AIO file",
+                path=aio_path
+            ))
+
+        filament_names = set()
+        for filament_idx, filament in enumerate(document_list(data, "filaments")):
+            filament_name = document_name(filament, "name")
+            if filament_name is None:
+                continue
+            if filament_name in filament_names:
+                result.add_error(ValidationError(
+                    level=ValidationLevel.ERROR,
+                    category="Folder",
+                    message=f"Duplicate filament name '{filament_name}' at $.filaments[{filament_idx}]",
+                    path=aio_path
+                ))
+            filament_names.add(filament_name)
+
+            variant_names = set()
+            for variant_idx, variant in enumerate(document_list(filament, "variants")):
+                variant_name = document_name(variant, "color_name")
+                if variant_name is None:
+                    continue
+                if variant_name in variant_names:
+                    result.add_error(ValidationError(
+                        level=ValidationLevel.ERROR,
+                        category="Folder",
+                        message=f"Duplicate variant name '{variant_name}' at $.filaments[{filament_idx}].variants[{variant_idx}]",
+                        path=aio_path
+                    ))
+                variant_names.add(variant_name)
+
+        return result
+
 
 class StoreIdValidator(BaseValidator):
     """Validates that store IDs in purchase links are valid."""
 
-    def validate_store_ids(self, data_dir: Path, stores_dir: Path) -> ValidationResult:
-        """Validate all store IDs referenced in sizes.json files."""
+    def validate_store_ids(self, manifest: TreeManifest, scope: Optional[ValidationScope] = None,
+                           files: Optional[List[Path]] = None) -> ValidationResult:
+        """
+        Validate all store IDs referenced in sizes.json files (within scope if given).
+        files: Only read these sizes files
+        """
         result = ValidationResult()
 
         # Collect valid store IDs
         valid_store_ids = set()
-        for store_file in stores_dir.glob("*/store.json"):
-            data = load_json(store_file)
-            if data and "id" in data:
-                valid_store_ids.add(data["id"])
-
-        # Validate references in sizes.json files
-        for sizes_file in data_dir.glob("**/sizes.json"):
-            sizes_data = load_json(sizes_file)
-            if not sizes_data:
+        for store_dir in manifest.stores:
+            if not store_dir.has_file("store.json"):
                 continue
-
-            for size_idx, size in enumerate(sizes_data):
-                for link_idx, link in enumerate(size.get("purchase_links", [])):
-                    store_id = link.get("store_id")
+            store_id = self.cache.facts(store_dir.file_path("store.json"), extract_store_id)
+            if store_id is not None:
+                valid_store_ids.add(store_id)
+
+        # Validate references in sizes.json files and AIO material files
+        for sizes_file, json_path, sizes in iter_sizes_facts(manifest, self.cache, files):
+            file_in_scope = scope is None or scope.includes_path(sizes_file)
+            for size_idx, _, _, store_ids in sizes:
+                for link_idx, store_id in store_ids:
+                    if not (file_in_scope or store_id in scope.store_ids):
+                        continue
                     if store_id and store_id not in valid_store_ids:
                         result.add_error(ValidationError(
                             level=ValidationLevel.ERROR,
                             category="StoreID",
-                            message=f"Invalid store_id '{store_id}' at $[{size_idx}].purchase_links[{link_idx}]",
+                            message=f"Invalid store_id '{store_id}' at {json_path}[{size_idx}].purchase_links[{link_idx}]",
                             path=sizes_file
                         ))
 
@@ -327,49 +1096,54 @@ class StoreIdValidator(BaseValidator):
 class GTINValidator(BaseValidator):
     """Validates GTIN/EAN fields across data (server-side rules)."""
 
-    GTIN_RE = re.compile(r"^[0-9]{12,13}$")
-    EAN_RE = re.compile(r"^[0-9]{13}$")
-
-    def validate_gtin_ean(self, data_dir: Path) -> ValidationResult:
+    # Schema rule violations are errors, check digit failures and duplicates are likely typos
+    ISSUE_LEVELS = {
+        gtin.FORMAT: ValidationLevel.ERROR,
+        gtin.MISMATCH: ValidationLevel.ERROR,
+        gtin.CHECK_DIGIT: ValidationLevel.WARNING,
+        gtin.DUPLICATE: ValidationLevel.WARNING,
+    }
+    ISSUE_LABELS = {
+        gtin.FORMAT: "Invalid {field}",
+        gtin.MISMATCH: "Mismatch",
+        gtin.CHECK_DIGIT: "Invalid check digit",
+        gtin.DUPLICATE: "Duplicate",
+    }
+
+    def validate_gtin_ean(self, manifest: TreeManifest, scope: Optional[ValidationScope] = None,
+                          files: Optional[List[Path]] = None) -> ValidationResult:
+        """
+        Check the identifiers of all sizes in one batch, so duplicates across variants are found.
+        With a scope only the issues of sizes in changed files or with changed codes are reported.
+        files: Only read these sizes files, they must include every file sharing a code with the reported sizes
+        """
         result = ValidationResult()
 
-        for sizes_file in data_dir.glob("**/sizes.json"):
-            sizes_data = load_json(sizes_file)
-            if not sizes_data:
+        entries = []
+        locations = []
+        for sizes_file, json_path, sizes in iter_sizes_facts(manifest, self.cache, files):
+            # The variant the sizes belong to
+            owner = str(sizes_file.parent) if json_path == "$" else f"{sizes_file} {json_path}"
+            for idx, size_gtin, size_ean, _ in sizes:
+                entries.append((size_gtin, size_ean, owner))
+                locations.append((sizes_file, json_path, idx))
+
+        for issue in gtin.validate_identifiers(entries):
+            sizes_file, json_path, idx = locations[issue.index]
+            size_gtin, size_ean, _ = entries[issue.index]
+            if scope is not None and not scope.includes_path(sizes_file) and \
+                    scope.codes.isdisjoint(_codes(size_gtin, size_ean)):
                 continue
-
-            for idx, size in enumerate(sizes_data):
-                gtin = size.get("gtin")
-                ean = size.get("ean")
-
-                # Optional fields, but if present must match regex
-                if gtin is not None:
-                    if not isinstance(gtin, str) or not self.GTIN_RE.fullmatch(gtin):
-                        result.add_error(ValidationError(
-                            level=ValidationLevel.ERROR,
-                            category="GTIN",
-                            message=f"Invalid gtin at $[{idx}]: must be 12 or 13 digits",
-                            path=sizes_file
-                        ))
-
-                if ean is not None:
-                    if not isinstance(ean, str) or not self.EAN_RE.fullmatch(ean):
-                        result.add_error(ValidationError(
-                            level=ValidationLevel.ERROR,
-                            category="EAN",
-                            message=f"Invalid ean at $[{idx}]: must be exactly 13 digits",
-                            path=sizes_file
-                        ))
-
-                # When both present: if both 13 digits, must match. If gtin is 12, allow ean empty/different.
-                if isinstance(gtin, str) and isinstance(ean, str):
-                    if len(gtin) == 13 and len(ean) == 13 and gtin != ean:
-                        result.add_error(ValidationError(
-                            level=ValidationLevel.ERROR,
-                            category="GTIN/EAN",
-                            message=f"Mismatch at $[{idx}]: gtin and ean are both 13 digits but not equal",
-                            path=sizes_file
-                        ))
+            label = self.ISSUE_LABELS[issue.kind].format(field=issue.field)
+            message = f"{label} at {json_path}[{idx}]: {issue.message}"
+            if issue.others:
+                message += f" ({', '.join(issue.others)})"
+            result.add_error(ValidationError(
+                level=self.ISSUE_LEVELS[issue.kind],
+                category=issue.field.upper(),
+                message=message,
+                path=sizes_file
+            ))
 
         return result
 
@@ -377,90 +1151,32 @@ class GTINValidator(BaseValidator):
 class MissingFileValidator(BaseValidator):
     """Validates that required JSON files exist."""
 
-    def validate_required_files(self, data_dir: Path,
-                                stores_dir: Path) -> ValidationResult:
-        """Check for missing required JSON files."""
+    # The files each kind of folder must contain
+    REQUIRED_FILES = {
+        "brand": ("brand.json",),
+        "material": ("material.json",),
+        "filament": ("filament.json",),
+        "variant": ("variant.json", "sizes.json"),
+        "store": ("store.json",),
+    }
+
+    def validate_required_files(self, manifest: TreeManifest,
+                                scope: Optional[ValidationScope] = None) -> ValidationResult:
+        """Check for missing required JSON files (within scope if given)."""
         result = ValidationResult()
 
-        # Check brand directories
-        for brand_dir in data_dir.iterdir():
-            if not brand_dir.is_dir():
+        for directory in manifest.iter_dirs(scope):
+            if scope is not None and not scope.includes_path(directory.path):
                 continue
-
-            brand_file = brand_dir / "brand.json"
-            if not brand_file.exists():
-                result.add_error(ValidationError(
-                    level=ValidationLevel.ERROR,
-                    category="Missing File",
-                    message="Missing brand.json",
-                    path=brand_dir
-                ))
-
-            # Check material directories
-            for material_dir in brand_dir.iterdir():
-                if not material_dir.is_dir():
-                    continue
-
-                material_file = material_dir / "material.json"
-                if not material_file.exists():
+            for file_name in self.REQUIRED_FILES[directory.kind]:
+                if not directory.has_file(file_name):
                     result.add_error(ValidationError(
                         level=ValidationLevel.ERROR,
                         category="Missing File",
-                        message="Missing material.json",
-                        path=material_dir
+                        message=f"Missing {file_name}",
+                        path=directory.path
                     ))
 
-                # Check filament directories
-                for filament_dir in material_dir.iterdir():
-                    if not filament_dir.is_dir():
-                        continue
-
-                    filament_file = filament_dir / "filament.json"
-                    if not filament_file.exists():
-                        result.add_error(ValidationError(
-                            level=ValidationLevel.ERROR,
-                            category="Missing File",
-                            message="Missing filament.json",
-                            path=filament_dir
-                        ))
-
-                    # Check variant directories
-                    for variant_dir in filament_dir.iterdir():
-                        if not variant_dir.is_dir():
-                            continue
-
-                        variant_file = variant_dir / "variant.json"
-                        if not variant_file.exists():
-                            result.add_error(ValidationError(
-                                level=ValidationLevel.ERROR,
-                                category="Missing File",
-                                message="Missing variant.json",
-                                path=variant_dir
-                            ))
-
-                        sizes_file = variant_dir / "sizes.json"
-                        if not sizes_file.exists():
-                            result.add_error(ValidationError(
-                                level=ValidationLevel.ERROR,
-                                category="Missing File",
-                                message="Missing sizes.json",
-                                path=variant_dir
-                            ))
-
-        # Check store directories
-        for store_dir in stores_dir.iterdir():
-            if not store_dir.is_dir():
-                continue
-
-            store_file = store_dir / "store.json"
-            if not store_file.exists():
-                result.add_error(ValidationError(
-                    level=ValidationLevel.ERROR,
-                    category="Missing File",
-                    message="Missing store.json",
-                    path=store_dir
-                ))
-
         return result
 
 
@@ -475,31 +1191,53 @@ class ValidationTask:
     name: str
     path: Path
     extra_data: Optional[Dict[str, Any]] = None
+    # The files the result depends on: the JSON documents the task reads and the logo image
+    inputs: List[Path] = field(default_factory=list)
+    # The parsed JSON documents the task reads, so the worker doesn't decode them again
+    documents: Optional[Dict[Path, Any]] = None
+
+
+# The schema cache of a worker process, see _init_worker()
+_worker_schema_cache: Optional[SchemaCache] = None
+
 
+def _init_worker(schema_names: List[str]) -> None:
+    """Process pool initializer, loads and compiles the schemas once per worker."""
+    global _worker_schema_cache
+    _worker_schema_cache = SchemaCache()
+    for schema_name in schema_names:
+        _worker_schema_cache.get_validator(schema_name)
 
-def _execute_validation_task(task: ValidationTask) -> ValidationResult:
+
+def _execute_validation_task(task: ValidationTask, schema_cache: Optional[SchemaCache] = None,
+                             documents: Optional[DocumentCache] = None) -> ValidationResult:
     """
     Worker function to execute a validation task.
     This is a module-level function so it can be pickled for multiprocessing.
     """
-    schema_cache = SchemaCache()
+    schema_cache = schema_cache or _worker_schema_cache or SchemaCache()
+    documents = documents or DocumentCache(task.documents)
     extra = task.extra_data or {}
 
     if task.task_type == 'json':
-        validator = JsonValidator(schema_cache)
+        validator = JsonValidator(schema_cache, documents)
         schema_name = extra.get('schema_name', '')
         return validator.validate_json_file(task.path, schema_name)
 
     elif task.task_type == 'logo':
-        validator = LogoValidator(schema_cache)
+        validator = LogoValidator(schema_cache, documents)
         logo_name = extra.get('logo_name')
-        return validator.validate_logo_file(task.path, logo_name)
+        return validator.validate_logo_file(task.path, logo_name, extra.get('exists'))
 
     elif task.task_type == 'folder':
-        validator = FolderNameValidator(schema_cache)
+        validator = FolderNameValidator(schema_cache, documents)
         json_file = extra.get('json_file', '')
         json_key = extra.get('json_key', '')
-        return validator.validate_folder_name(task.path, json_file, json_key)
+        return validator.validate_folder_name(task.path, json_file, json_key, extra.get('json_exists'))
+
+    elif task.task_type == 'aio_names':
+        validator = FolderNameValidator(schema_cache, documents)
+        return validator.validate_aio_names(task.path, extra.get('folder_exists'))
 
     else:
         result = ValidationResult()
@@ -511,203 +1249,182 @@ def _execute_validation_task(task: ValidationTask) -> ValidationResult:
         return result
 
 
-def collect_json_validation_tasks(data_dir: Path, stores_dir: Path) -> List[
-    ValidationTask]:
-    """Collect all JSON validation tasks."""
-    tasks = []
+# The JSON file of each kind of folder, its schema, the task name and the key the folder name must match
+FOLDER_JSON_FILES = {
+    "brand": ("brand.json", "brand", "Brand", "brand"),
+    "material": ("material.json", "material", "Material", "material"),
+    "filament": ("filament.json", "filament", "Filament", "name"),
+    "variant": ("variant.json", "variant", "Variant", "color_name"),
+    "store": ("store.json", "store", "Store", "id"),
+}
 
-    # Brand validation tasks
-    for brand_dir in data_dir.iterdir():
-        if not brand_dir.is_dir():
-            continue
 
-        brand_file = brand_dir / "brand.json"
-        if brand_file.exists():
-            tasks.append(ValidationTask(
-                task_type='json',
-                name=f"Brand JSON: {brand_dir.name}",
-                path=brand_file,
-                extra_data={'schema_name': 'brand'}
-            ))
+def _schema_names(tasks: List[ValidationTask]) -> List[str]:
+    """The schemas the JSON tasks validate against."""
+    return sorted({x.extra_data['schema_name'] for x in tasks if x.task_type == 'json'})
 
-        # Material validation tasks
-        for material_dir in brand_dir.iterdir():
-            if not material_dir.is_dir():
-                continue
 
-            material_file = material_dir / "material.json"
-            if material_file.exists():
-                tasks.append(ValidationTask(
-                    task_type='json',
-                    name=f"Material JSON: {material_dir.name}",
-                    path=material_file,
-                    extra_data={'schema_name': 'material'}
-                ))
+def _execute_validation_chunk(tasks: List[ValidationTask], schema_cache: Optional[SchemaCache] = None,
+                              documents: Optional[DocumentCache] = None) -> List[ValidationResult]:
+    """
+    Worker function to execute a chunk of validation tasks, a failing task doesn't stop the others.
+    Returns the result of each task.
+    """
+    results = []
+    for task in tasks:
+        try:
+            results.append(_execute_validation_task(task, schema_cache, documents))
+        except Exception as e:
+            result = ValidationResult()
+            result.add_error(ValidationError(
+                level=ValidationLevel.ERROR,
+                category="System",
+                message=f"Task '{task.name}' failed with exception: {str(e)}"
+            ))
+            results.append(result)
+    return results
 
-            # Filament validation tasks
-            for filament_dir in material_dir.iterdir():
-                if not filament_dir.is_dir():
-                    continue
 
-                filament_file = filament_dir / "filament.json"
-                if filament_file.exists():
-                    tasks.append(ValidationTask(
-                        task_type='json',
-                        name=f"Filament JSON: {filament_dir.name}",
-                        path=filament_file,
-                        extra_data={'schema_name': 'filament'}
-                    ))
+def chunk_tasks(tasks: List[ValidationTask], workers: int,
+                chunk_size: Optional[int] = None) -> List[List[ValidationTask]]:
+    """
+    Split tasks into chunks of consecutive tasks.
+    The collectors emit tasks brand by brand, so a chunk mostly covers one brand.
+    chunk_size: Tasks per chunk, by default CHUNKS_PER_WORKER chunks per worker (at most MAX_CHUNK_SIZE tasks).
+    """
+    if chunk_size is None:
+        chunk_size = -(-len(tasks) // (max(1, workers) * CHUNKS_PER_WORKER))
+        chunk_size = max(1, min(chunk_size, MAX_CHUNK_SIZE))
+    return [tasks[i:i + chunk_size] for i in range(0, len(tasks), chunk_size)]
 
-                # Variant validation tasks
-                for variant_dir in filament_dir.iterdir():
-                    if not variant_dir.is_dir():
-                        continue
 
-                    variant_file = variant_dir / "variant.json"
-                    if variant_file.exists():
-                        tasks.append(ValidationTask(
-                            task_type='json',
-                            name=f"Variant JSON: {variant_dir.name}",
-                            path=variant_file,
-                            extra_data={'schema_name': 'variant'}
-                        ))
+def collect_json_validation_tasks(manifest: TreeManifest,
+                                  scope: Optional[ValidationScope] = None) -> List[ValidationTask]:
+    """Collect all JSON validation tasks (of the folders within scope if given)."""
+    tasks = []
 
-                    sizes_file = variant_dir / "sizes.json"
-                    if sizes_file.exists():
-                        tasks.append(ValidationTask(
-                            task_type='json',
-                            name=f"Sizes JSON: {variant_dir.name}",
-                            path=sizes_file,
-                            extra_data={'schema_name': 'sizes'}
-                        ))
+    for directory in manifest.iter_dirs(scope):
+        json_file, schema_name, label, _ = FOLDER_JSON_FILES[directory.kind]
+        if directory.has_file(json_file):
+            tasks.append(ValidationTask(
+                task_type='json',
+                name=f"{label} JSON: {directory.name}",
+                path=directory.file_path(json_file),
+                extra_data={'schema_name': schema_name},
+                inputs=[directory.file_path(json_file)]
+            ))
 
-    # Store validation tasks
-    for store_dir in stores_dir.iterdir():
-        if not store_dir.is_dir():
-            continue
+        if directory.kind == "brand":
+            for aio_file in directory.aio_files():
+                tasks.append(ValidationTask(
+                    task_type='json',
+                    name=f"AIO Material JSON: {aio_file.name}",
+                    path=aio_file,
+                    extra_data={'schema_name': 'material_aio'},
+                    inputs=[aio_file]
+                ))
 
-        store_file = store_dir / "store.json"
-        if store_file.exists():
+        if directory.kind == "variant" and directory.has_file("sizes.json"):
             tasks.append(ValidationTask(
                 task_type='json',
-                name=f"Store JSON: {store_dir.name}",
-                path=store_file,
-                extra_data={'schema_name': 'store'}
+                name=f"Sizes JSON: {directory.name}",
+                path=directory.file_path("sizes.json"),
+                extra_data={'schema_name': 'sizes'},
+                inputs=[directory.file_path("sizes.json")]
             ))
 
     return tasks
 
 
-def collect_logo_validation_tasks(data_dir: Path, stores_dir: Path) -> List[
-    ValidationTask]:
-    """Collect all logo validation tasks."""
+def collect_logo_validation_tasks(manifest: TreeManifest, documents: DocumentCache,
+                                  scope: Optional[ValidationScope] = None) -> List[ValidationTask]:
+    """Collect all logo validation tasks (of the folders within scope if given)."""
     tasks = []
 
-    # Brand logos
-    for brand_dir in data_dir.iterdir():
-        if not brand_dir.is_dir():
-            continue
-
-        brand_file = brand_dir / "brand.json"
-        if brand_file.exists():
-            data = load_json(brand_file)
-            if data and "logo" in data:
-                logo_name = data["logo"]
-                logo_path = brand_dir / logo_name
-                tasks.append(ValidationTask(
-                    task_type='logo',
-                    name=f"Brand Logo: {brand_dir.name}",
-                    path=logo_path,
-                    extra_data={'logo_name': logo_name}
-                ))
-
-    # Store logos
-    for store_dir in stores_dir.iterdir():
-        if not store_dir.is_dir():
+    for directory in manifest.iter_dirs(scope, recursive=False):
+        json_file, _, label, _ = FOLDER_JSON_FILES[directory.kind]
+        if not directory.has_file(json_file):
             continue
 
-        store_file = store_dir / "store.json"
-        if store_file.exists():
-            data = load_json(store_file)
-            if data and "logo" in data:
-                logo_name = data["logo"]
-                logo_path = store_dir / logo_name
-                tasks.append(ValidationTask(
-                    task_type='logo',
-                    name=f"Store Logo: {store_dir.name}",
-                    path=logo_path,
-                    extra_data={'logo_name': logo_name}
-                ))
+        data = documents.get(directory.file_path(json_file))
+        if data and "logo" in data:
+            logo_name = data["logo"]
+            tasks.append(ValidationTask(
+                task_type='logo',
+                name=f"{label} Logo: {directory.name}",
+                path=directory.file_path(logo_name),
+                # Logo names with a "/" point outside of the folder, they aren't in the manifest
+                extra_data={'logo_name': logo_name,
+                            'exists': directory.has_file(logo_name) if "/" not in logo_name else None},
+                inputs=[directory.file_path(logo_name)]
+            ))
 
     return tasks
 
 
-def collect_folder_validation_tasks(data_dir: Path, stores_dir: Path) -> List[
-    ValidationTask]:
-    """Collect all folder name validation tasks."""
+def collect_folder_validation_tasks(manifest: TreeManifest,
+                                    scope: Optional[ValidationScope] = None) -> List[ValidationTask]:
+    """Collect all folder name validation tasks (of the folders within scope if given)."""
     tasks = []
 
-    # Brand folders
-    for brand_dir in data_dir.iterdir():
-        if not brand_dir.is_dir():
-            continue
-
+    for directory in manifest.iter_dirs(scope):
+        json_file, _, label, json_key = FOLDER_JSON_FILES[directory.kind]
         tasks.append(ValidationTask(
             task_type='folder',
-            name=f"Brand Folder: {brand_dir.name}",
-            path=brand_dir,
-            extra_data={'json_file': 'brand.json', 'json_key': 'brand'}
+            name=f"{label} Folder: {directory.name}",
+            path=directory.path,
+            extra_data={'json_file': json_file, 'json_key': json_key,
+                        'json_exists': directory.has_file(json_file)},
+            inputs=[directory.file_path(json_file)] if directory.has_file(json_file) else []
         ))
 
-        # Material folders
-        for material_dir in brand_dir.iterdir():
-            if not material_dir.is_dir():
-                continue
-
-            tasks.append(ValidationTask(
-                task_type='folder',
-                name=f"Material Folder: {material_dir.name}",
-                path=material_dir,
-                extra_data={'json_file': 'material.json', 'json_key': 'material'}
-            ))
-
-            # Filament folders
-            for filament_dir in material_dir.iterdir():
-                if not filament_dir.is_dir():
-                    continue
-
+        if directory.kind == "brand":
+            for aio_file in directory.aio_files():
                 tasks.append(ValidationTask(
-                    task_type='folder',
-                    name=f"Filament Folder: {filament_dir.name}",
-                    path=filament_dir,
-                    extra_data={'json_file': 'filament.json', 'json_key': 'name'}
+                    task_type='aio_names',
+                    name=f"AIO Material Names: {aio_file.name}",
+                    path=aio_file,
+                    extra_data={'folder_exists': directory.has_child(aio_file.name[:-len(AIO_FILE_SUFFIX)])},
+                    inputs=[aio_file]
                 ))
 
-                # Variant folders
-                for variant_dir in filament_dir.iterdir():
-                    if not variant_dir.is_dir():
-                        continue
-
-                    tasks.append(ValidationTask(
-                        task_type='folder',
-                        name=f"Variant Folder: {variant_dir.name}",
-                        path=variant_dir,
-                        extra_data={'json_file': 'variant.json',
-                                    'json_key':  'color_name'}
-                    ))
+    return tasks
 
-    # Store folders
-    for store_dir in stores_dir.iterdir():
-        if not store_dir.is_dir():
-            continue
 
-        tasks.append(ValidationTask(
-            task_type='folder',
-            name=f"Store Folder: {store_dir.name}",
-            path=store_dir,
-            extra_data={'json_file': 'store.json', 'json_key': 'id'}
-        ))
+def collect_document_tasks(manifest: TreeManifest, path: Path, document: Any) -> List[ValidationTask]:
+    """
+    Collect the tasks checking the JSON file at path and its folder, the same as the other collectors would
+    if document was saved there. The folder may not exist yet.
+    :raises ValueError: If path isn't a JSON file of the data or stores folder that is validated
+    """
+    kind = None
+    for root, kinds in ((manifest.data_dir, DATA_LEVELS), (manifest.stores_dir, ("store",))):
+        parts = os.path.relpath(os.path.abspath(path), os.path.abspath(root)).split(os.sep)
+        if parts[0] != os.pardir and 2 <= len(parts) <= len(kinds) + 1:
+            kind = kinds[len(parts) - 2]
+    json_file, schema_name, label, json_key = FOLDER_JSON_FILES.get(kind, (None,) * 4)
+    folder = path.parent
+    tasks = []
 
+    if path.name == json_file:
+        tasks.append(ValidationTask('json', f"{label} JSON: {folder.name}", path, {'schema_name': schema_name}, [path]))
+        tasks.append(ValidationTask('folder', f"{label} Folder: {folder.name}", folder,
+                                    {'json_file': json_file, 'json_key': json_key, 'json_exists': True}, [path]))
+        if kind in ("brand", "store") and isinstance(document, dict) and "logo" in document:
+            logo_name = document["logo"]
+            # Logo names with a "/" point outside of the folder
+            logo_exists = None if not isinstance(logo_name, str) or "/" in logo_name else (folder / logo_name).is_file()
+            tasks.append(ValidationTask('logo', f"{label} Logo: {folder.name}", folder / str(logo_name),
+                                        {'logo_name': logo_name, 'exists': logo_exists}, [folder / str(logo_name)]))
+    elif kind == "variant" and path.name == "sizes.json":
+        tasks.append(ValidationTask('json', f"Sizes JSON: {folder.name}", path, {'schema_name': 'sizes'}, [path]))
+    elif kind == "brand" and path.name.endswith(AIO_FILE_SUFFIX):
+        tasks.append(ValidationTask('json', f"AIO Material JSON: {path.name}", path,
+                                    {'schema_name': 'material_aio'}, [path]))
+        tasks.append(ValidationTask('aio_names', f"AIO Material Names: {path.name}", path,
+                                    {'folder_exists': (folder / path.name[:-len(AIO_FILE_SUFFIX)]).is_dir()}, [path]))
+    else:
+        raise ValueError(f"{path} is not a file the validator checks")
     return tasks
 
 
@@ -720,33 +1437,161 @@ class ValidationOrchestrator:
 
     def __init__(self, data_dir: Path = Path("./data"),
                  stores_dir: Path = Path("./stores"),
-                 max_workers: Optional[int] = None):
+                 max_workers: Optional[int] = None,
+                 chunk_size: Optional[int] = None,
+                 executor: str = "auto",
+                 cache_path: Optional[Path] = None,
+                 scope: Optional[ValidationScope] = None):
+        if executor not in EXECUTORS:
+            raise ValueError(f"Unknown executor '{executor}', expected one of: {', '.join(EXECUTORS)}")
         self.data_dir = data_dir
         self.stores_dir = stores_dir
         self.max_workers = max_workers
+        self.chunk_size = chunk_size
+        self.executor = executor
         self.schema_cache = SchemaCache()
+        self.documents = DocumentCache()
+        self.cache = ValidationCache(cache_path, self.documents, self.schema_cache)
+        # Only validate this part of the tree, None validates everything
+        self.scope = scope
+        # The result of every task that was run or taken from the cache, by task id (only kept if not None)
+        self.task_results: Optional[Dict[str, ValidationResult]] = None
+        # Print the progress of run_tasks()
+        self.verbose = True
+        self._manifest: Optional[TreeManifest] = None
+
+    @property
+    def manifest(self) -> TreeManifest:
+        """The data and stores tree, scanned once on first use and shared by all validations."""
+        if self._manifest is None:
+            print("Scanning data and stores folders...")
+            self._manifest = scan_tree(self.data_dir, self.stores_dir)
+        return self._manifest
+
+    @property
+    def workers(self) -> int:
+        return self.max_workers or os.cpu_count() or 1
+
+    def _log(self, message: str) -> None:
+        if self.verbose:
+            print(message)
+
+    def _record(self, task: ValidationTask, task_result: ValidationResult) -> None:
+        if self.task_results is not None:
+            self.task_results[ValidationCache.task_id(task)] = task_result
+
+    def run_tasks(self, tasks: List[ValidationTask]) -> ValidationResult:
+        """Run the validation tasks in scope that have no cached result with the configured executor."""
+        result = ValidationResult()
+        if self.scope is not None:
+            in_scope = [x for x in tasks if self.scope.includes_task(x)]
+            self._log(f"  {len(in_scope)} of {len(tasks)} tasks affected by the changes")
+            tasks = in_scope
+        pending = []
+        for task in tasks:
+            cached = self.cache.get_result(task)
+            if cached is None:
+                pending.append(task)
+            else:
+                self._record(task, cached)
+                result.merge(cached)
+        if len(pending) < len(tasks):
+            self._log(f"  {len(tasks) - len(pending)} cached results, {len(pending)} tasks to run")
+
+        if pending:
+            result.merge(self._run_with_executor(pending))
+        return result
+
+    def _run_with_executor(self, tasks: List[ValidationTask]) -> ValidationResult:
+        """Run validation tasks with the configured executor, "auto" decides per task type."""
+        if self.executor == "inline":
+            return self.run_tasks_inline(tasks)
+        if self.executor == "threads":
+            return self.run_tasks_threaded(tasks)
+        if self.executor == "processes":
+            return self.run_tasks_parallel(tasks)
+
+        result = ValidationResult()
+        tasks_by_type: Dict[str, List[ValidationTask]] = {}
+        for task in tasks:
+            tasks_by_type.setdefault(task.task_type, []).append(task)
+
+        # Compile the schemas first so the sample only measures the validation
+        for schema_name in _schema_names(tasks):
+            self.schema_cache.get_validator(schema_name)
+
+        for task_type, typed_tasks in tasks_by_type.items():
+            sample, remaining = typed_tasks[:AUTO_SAMPLE_SIZE], typed_tasks[AUTO_SAMPLE_SIZE:]
+            start = time.perf_counter()
+            result.merge(self.run_tasks_inline(sample))
+            estimate = (time.perf_counter() - start) / len(sample) * len(remaining)
+
+            if estimate < INLINE_MAX_SECONDS or self.workers == 1:
+                executor = "inline"
+                result.merge(self.run_tasks_inline(remaining))
+            elif task_type in IO_BOUND_TASK_TYPES:
+                executor = "threads"
+                result.merge(self.run_tasks_threaded(remaining))
+            else:
+                executor = "processes"
+                result.merge(self.run_tasks_parallel(remaining))
+            self._log(f"  {len(typed_tasks)} '{task_type}' tasks: {executor} (estimated {estimate:.2f}s inline)")
+
+        return result
+
+    def _merge_results(self, result: ValidationResult, tasks: List[ValidationTask],
+                       task_results: List[ValidationResult]) -> None:
+        for task, task_result in zip(tasks, task_results):
+            self.cache.put_result(task, task_result)
+            self._record(task, task_result)
+            result.merge(task_result)
+
+    def run_tasks_inline(self, tasks: List[ValidationTask]) -> ValidationResult:
+        """Run validation tasks one after another in this process."""
+        result = ValidationResult()
+        self._merge_results(result, tasks, _execute_validation_chunk(tasks, self.schema_cache, self.documents))
+        return result
+
+    def run_tasks_threaded(self, tasks: List[ValidationTask]) -> ValidationResult:
+        """Run validation tasks on a thread pool, for tasks that mostly wait on the file system."""
+        from concurrent.futures import ThreadPoolExecutor
+        return self._run_chunks(ThreadPoolExecutor(max_workers=self.workers), tasks,
+                                lambda chunk: _execute_validation_chunk(chunk, self.schema_cache, self.documents))
 
     def run_tasks_parallel(self, tasks: List[ValidationTask]) -> ValidationResult:
         """Run validation tasks in parallel using process pool."""
+        for task in tasks:
+            task.documents = self.documents.subset(*(x for x in task.inputs if x.suffix == ".json"))
+        from concurrent.futures import ProcessPoolExecutor
+        return self._run_chunks(ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                                    initargs=(_schema_names(tasks),)), tasks, _execute_validation_chunk)
+
+    def _run_chunks(self, pool: 'Executor', tasks: List[ValidationTask], func) -> ValidationResult:
+        """
+        Submit the tasks to pool in chunks and merge the results as each chunk completes.
+        The pool is shut down afterwards.
+        """
+        from concurrent.futures import as_completed
         result = ValidationResult()
 
         if not tasks:
+            pool.shutdown()
             return result
 
-        with ProcessPoolExecutor(max_workers=self.max_workers) as executor:
-            future_to_task = {executor.submit(_execute_validation_task, task): task for
-                              task in tasks}
+        with pool as executor:
+            future_to_chunk = {executor.submit(func, chunk): chunk for
+                               chunk in chunk_tasks(tasks, self.workers, self.chunk_size)}
 
-            for future in as_completed(future_to_task):
-                task = future_to_task[future]
+            for future in as_completed(future_to_chunk):
+                chunk = future_to_chunk[future]
                 try:
-                    task_result = future.result()
-                    result.merge(task_result)
+                    self._merge_results(result, chunk, future.result())
                 except Exception as e:
+                    # The worker process died or the chunk couldn't be sent
                     result.add_error(ValidationError(
                         level=ValidationLevel.ERROR,
                         category="System",
-                        message=f"Task '{task.name}' failed with exception: {str(e)}"
+                        message=f"Chunk of {len(chunk)} tasks starting with '{chunk[0].name}' failed with exception: {str(e)}"
                     ))
 
         return result
@@ -754,35 +1599,35 @@ class ValidationOrchestrator:
     def validate_json_files(self) -> ValidationResult:
         """Validate all JSON files against schemas."""
         print("Collecting JSON validation tasks...")
-        tasks = collect_json_validation_tasks(self.data_dir, self.stores_dir)
+        tasks = collect_json_validation_tasks(self.manifest, self.scope)
         print(f"Running {len(tasks)} JSON validation tasks...")
-        return self.run_tasks_parallel(tasks)
+        return self.run_tasks(tasks)
 
     def validate_logo_files(self) -> ValidationResult:
         """Validate all logo files."""
         print("Collecting logo validation tasks...")
-        tasks = collect_logo_validation_tasks(self.data_dir, self.stores_dir)
+        tasks = collect_logo_validation_tasks(self.manifest, self.documents, self.scope)
         print(f"Running {len(tasks)} logo validation tasks...")
-        return self.run_tasks_parallel(tasks)
+        return self.run_tasks(tasks)
 
     def validate_folder_names(self) -> ValidationResult:
         """Validate all folder names."""
         print("Collecting folder name validation tasks...")
-        tasks = collect_folder_validation_tasks(self.data_dir, self.stores_dir)
+        tasks = collect_folder_validation_tasks(self.manifest, self.scope)
         print(f"Running {len(tasks)} folder name validation tasks...")
-        return self.run_tasks_parallel(tasks)
+        return self.run_tasks(tasks)
 
     def validate_store_ids(self) -> ValidationResult:
         """Validate store IDs."""
         print("Validating store IDs...")
-        validator = StoreIdValidator(self.schema_cache)
-        return validator.validate_store_ids(self.data_dir, self.stores_dir)
+        validator = StoreIdValidator(self.schema_cache, self.documents, self.cache)
+        return validator.validate_store_ids(self.manifest, self.scope)
 
     def validate_gtin(self) -> ValidationResult:
         """Validate GTIN/EAN rules."""
         print("Validating GTIN/EAN...")
-        validator = GTINValidator(self.schema_cache)
-        return validator.validate_gtin_ean(self.data_dir)
+        validator = GTINValidator(self.schema_cache, self.documents, self.cache)
+        return validator.validate_gtin_ean(self.manifest, self.scope)
 
     def validate_all(self) -> ValidationResult:
         """Run all validations."""
@@ -790,8 +1635,8 @@ class ValidationOrchestrator:
 
         # Check for missing files first
         print("Checking for missing required files...")
-        validator = MissingFileValidator(self.schema_cache)
-        result.merge(validator.validate_required_files(self.data_dir, self.stores_dir))
+        validator = MissingFileValidator(self.schema_cache, self.documents, self.cache)
+        result.merge(validator.validate_required_files(self.manifest, self.scope))
 
         result.merge(self.validate_json_files())
         result.merge(self.validate_logo_files())
@@ -802,10 +1647,275 @@ class ValidationOrchestrator:
         return result
 
 
+# -------------------------
+# Watch Mode
+# -------------------------
+
+# The folder of the schema files (see SchemaCache), watched along with the data and stores folders
+SCHEMAS_DIR = Path("./schemas")
+
+
+class WatchSession:
+    """
+    Validates everything once, then keeps the manifest, documents and compiled schemas in memory
+    and revalidates only what each batch of file changes affects (see changed_scope()).
+    The result of every task is kept, so a batch only replaces the results of the tasks in its scope.
+    The errors of the cross-file checks are kept per sizes file. A batch checks the changed files and the files
+    using the changed store ids and codes again, found through an index of the ids and codes each file uses.
+    """
+
+    def __init__(self, orchestrator: ValidationOrchestrator):
+        self.orchestrator = orchestrator
+        orchestrator.task_results = {}
+        # The tasks of the kept results by task id, and the task ids by the absolute path of the task and its folder
+        self._tasks: Dict[str, ValidationTask] = {}
+        self._task_ids: Dict[str, Set[str]] = {}
+        self._missing = ValidationResult()
+        # The errors of the cross-file checks by sizes file
+        self._cross_file: Dict[Path, List[ValidationError]] = {}
+        # ("store", store id) and ("code", normalized code) keys by sizes file, and the sizes files by key
+        self._file_keys: Dict[Path, Set[Tuple[str, str]]] = {}
+        self._files_by_key: Dict[Tuple[str, str], Set[Path]] = {}
+        self.result = ValidationResult()
+
+    def validate(self, scope: Optional[ValidationScope] = None, changed: Iterable[Path] = ()) -> ValidationResult:
+        """
+        Validate the scope (everything if None) and update the result.
+        changed: The changed paths the scope was built from
+        """
+        orchestrator = self.orchestrator
+        task_results = orchestrator.task_results
+        if scope is None:
+            task_results.clear()
+            self._tasks.clear()
+            self._task_ids.clear()
+        else:
+            # Tasks in scope are run again, the ones that aren't collected anymore (e.g. deleted files) are dropped
+            candidates = set().union(*(self._task_ids.get(x, ()) for x in scope.paths))
+            for task_id in candidates:
+                if task_id in self._tasks and scope.includes_task(self._tasks[task_id]):
+                    del self._tasks[task_id]
+                    task_results.pop(task_id, None)
+
+        manifest = orchestrator.manifest
+        orchestrator.scope = scope
+        tasks = [*collect_json_validation_tasks(manifest, scope),
+                 *collect_logo_validation_tasks(manifest, orchestrator.documents, scope),
+                 *collect_folder_validation_tasks(manifest, scope)]
+        try:
+            orchestrator.run_tasks(tasks)
+        finally:
+            orchestrator.scope = None
+        for task in tasks:
+            task_id = ValidationCache.task_id(task)
+            if task_id in task_results and task_id not in self._tasks:
+                self._tasks[task_id] = task
+                for path in (os.path.abspath(task.path), os.path.dirname(os.path.abspath(task.path))):
+                    self._task_ids.setdefault(path, set()).add(task_id)
+
+        # Folders are only missing files in scope, the others are kept
+        args = (orchestrator.schema_cache, orchestrator.documents, orchestrator.cache)
+        missing = MissingFileValidator(*args).validate_required_files(manifest, scope)
+        if scope is not None:
+            missing.errors += [x for x in self._missing.errors if not scope.includes_path(x.path)]
+        self._missing = missing
+
+        self._check_cross_file(scope, list(changed))
+
+        result = ValidationResult()
+        result.merge(missing)
+        for task_result in task_results.values():
+            result.merge(task_result)
+        for errors in self._cross_file.values():
+            result.errors.extend(errors)
+        self.result = result
+        return result
+
+    def _index(self, path: Path, sizes_files: Set[Path]) -> None:
+        """Index the store ids and codes the sizes file at path uses again, a deleted file is only removed."""
+        for key in self._file_keys.pop(path, ()):
+            self._files_by_key[key].discard(path)
+        if path not in sizes_files:
+            return
+        keys = self._file_keys[path] = set()
+        for _, sizes in self.orchestrator.cache.facts(path, extract_sizes_facts):
+            for _, size_gtin, size_ean, store_ids in sizes:
+                keys.update(("code", x) for x in _codes(size_gtin, size_ean))
+                keys.update(("store", x) for _, x in store_ids if isinstance(x, str))
+        for key in keys:
+            self._files_by_key.setdefault(key, set()).add(path)
+
+    def _check_cross_file(self, scope: Optional[ValidationScope], changed: List[Path]) -> None:
+        """Run the store id and GTIN/EAN checks for the sizes files the scope affects (all if None)."""
+        orchestrator = self.orchestrator
+        manifest = orchestrator.manifest
+        sizes_files = set(manifest.sizes_files())
+        if scope is None:
+            self._cross_file.clear()
+            self._file_keys.clear()
+            self._files_by_key.clear()
+            for path in manifest.sizes_files():
+                self._index(path, sizes_files)
+            check_scope = read_files = affected_files = None
+        else:
+            for path in changed:
+                self._index(path, sizes_files)
+            keys = {("code", x) for x in scope.codes} | {("store", x) for x in scope.store_ids}
+            affected = {x for x in changed if x in sizes_files}
+            affected.update(*(self._files_by_key.get(x, ()) for x in keys))
+            # The duplicates of the codes used by the affected files are found among these
+            read = affected.union(*(self._files_by_key[key] for path in affected for key in self._file_keys[path]
+                                    if key[0] == "code"))
+            for path in [*changed, *affected]:
+                self._cross_file.pop(path, None)
+            # All errors of the affected files are reported
+            check_scope = ValidationScope(paths={os.path.abspath(x) for x in affected})
+            # In the order of a full run, which is the order of the duplicates' owners
+            read_files = [x for x in manifest.sizes_files() if x in read]
+            affected_files = [x for x in read_files if x in affected]
+
+        args = (orchestrator.schema_cache, orchestrator.documents, orchestrator.cache)
+        result = StoreIdValidator(*args).validate_store_ids(manifest, check_scope, affected_files)
+        result.merge(GTINValidator(*args).validate_gtin_ean(manifest, check_scope, read_files))
+        for error in result.errors:
+            self._cross_file.setdefault(error.path, []).append(error)
+
+    def apply(self, changes: List['FileChange']) -> None:
+        """Revalidate what the changes affect and print the errors that were added and resolved."""
+        from fs_watch import DELETED, RESCAN
+        start = time.perf_counter()
+        orchestrator = self.orchestrator
+        previous = Counter(str(x) for x in self.result.errors)
+
+        if any(x.change == RESCAN for x in changes):
+            # Changes were missed, start over
+            orchestrator._manifest = None
+            orchestrator.documents.clear()
+            for schema_name in _schema_names(list(self._tasks.values())):
+                orchestrator.schema_cache.invalidate(schema_name)
+            changed = []
+            self.validate()
+        else:
+            changed = dict.fromkeys(os.path.relpath(x.path) for x in changes)
+            # The files of moved away folders aren't reported one by one
+            for change in changes:
+                if change.is_dir and change.change == DELETED:
+                    prefix = change.path + os.sep
+                    changed.update(dict.fromkeys(os.path.relpath(x) for x in self._task_ids if x.startswith(prefix)))
+            changed = [Path(x) for x in changed]
+
+            for path in changed:
+                orchestrator.documents.invalidate(path)
+                schema_name = orchestrator.schema_cache.schema_name_of(path)
+                if schema_name is not None:
+                    orchestrator.schema_cache.invalidate(schema_name)
+            orchestrator.manifest.rescan(changed)
+            self.validate(changed_scope(changed, orchestrator.manifest, orchestrator.cache,
+                                        orchestrator.cache.previous_facts), changed)
+
+        current = Counter(str(x) for x in self.result.errors)
+        for error in sorted(previous - current):
+            print(f"  - {error}")
+        for error in sorted(current - previous):
+            print(f"  + {error}")
+        print(f"{time.strftime('%H:%M:%S')} {len(changed)} paths changed: {self.result.error_count} errors, "
+              f"{self.result.warning_count} warnings ({(time.perf_counter() - start) * 1000:.0f} ms)")
+
+    def validate_document(self, path: Path, document: Any) -> ValidationResult:
+        """
+        Validate a document as if it was saved at path (e.g. an unsaved edit), the kept results aren't changed.
+        The file and its folder are checked, sizes are also checked against the store ids and the codes of the
+        other files.
+        :raises ValueError: If path isn't a JSON file of the data or stores folder that is validated
+        """
+        orchestrator = self.orchestrator
+        manifest = orchestrator.manifest
+        tasks = collect_document_tasks(manifest, path, document)
+        documents = orchestrator.documents.overlay({path: document})
+        result = ValidationResult()
+        for task_result in _execute_validation_chunk(tasks, orchestrator.schema_cache, documents):
+            result.merge(task_result)
+
+        if path.name == "sizes.json" or path.name.endswith(AIO_FILE_SUFFIX):
+            cache = ValidationCache(None, documents, orchestrator.schema_cache)
+            keys = {("code", x) for x in _sizes_codes(cache.facts(path, extract_sizes_facts))}
+            sharing = set().union(*(self._files_by_key.get(x, ()) for x in keys))
+            read_files = [x for x in manifest.sizes_files() if x in sharing or x == path]
+            if path not in read_files:
+                read_files.append(path)
+            scope = ValidationScope(paths={os.path.abspath(path)})
+            args = (orchestrator.schema_cache, documents, cache)
+            result.merge(StoreIdValidator(*args).validate_store_ids(manifest, scope, [path]))
+            result.merge(GTINValidator(*args).validate_gtin_ean(manifest, scope, read_files))
+        return result
+
+    def create_watcher(self, use_inotify: Optional[bool] = None, poll_interval: float = 1.0):
+        """
+        Returns a watcher of the data, stores and schemas folders for apply().
+        :param use_inotify: True to require inotify, False to poll, None to use inotify if available
+        :param poll_interval: Seconds between polls of the polling watcher
+        """
+        orchestrator = self.orchestrator
+        roots = [x for x in (orchestrator.data_dir, orchestrator.stores_dir, SCHEMAS_DIR) if os.path.isdir(x)]
+        print(f"Watching {', '.join(map(str, roots))} for changes")
+        from fs_watch import create_watcher
+        return create_watcher(roots, use_inotify, poll_interval)
+
+    def watch(self, use_inotify: Optional[bool] = None, poll_interval: float = 1.0) -> None:
+        """
+        Validate everything, then apply changes until interrupted (Ctrl+C).
+        :param use_inotify: True to require inotify, False to poll, None to use inotify if available
+        :param poll_interval: Seconds between polls of the polling watcher
+        """
+        orchestrator = self.orchestrator
+        print_result(self.validate())
+        orchestrator.verbose = False
+
+        try:
+            with self.create_watcher(use_inotify, poll_interval) as watcher:
+                print("Press Ctrl+C to stop")
+                while True:
+                    changes = watcher.wait(poll_interval)
+                    if changes:
+                        self.apply(changes)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            orchestrator.cache.save()
+
+
 # -------------------------
 # CLI Entry Point
 # -------------------------
 
+def print_result(result: ValidationResult, allow_warnings: bool = False) -> None:
+    """
+    Print the errors grouped by category and a summary.
+    allow_warnings: The run passes if there are only warnings, see main()
+    """
+    if result.errors:
+        # Group errors by category
+        errors_by_category: Dict[str, List[ValidationError]] = {}
+        for error in result.errors:
+            if error.category not in errors_by_category:
+                errors_by_category[error.category] = []
+            errors_by_category[error.category].append(error)
+
+        # Print errors grouped by category
+        for category, errors in sorted(errors_by_category.items()):
+            print(f"\n{category} ({len(errors)}):")
+            print("-" * 80)
+            for error in errors:
+                print(f"  {error}")
+
+        if result.is_valid and allow_warnings:
+            print(f"\nAll validations passed with {result.warning_count} warnings")
+        else:
+            print(f"\nValidation failed: {result.error_count} errors, {result.warning_count} warnings")
+    else:
+        print("All validations passed!")
+
+
 def main():
     from argparse import ArgumentParser
 
@@ -815,14 +1925,51 @@ def main():
     parser.add_argument("--folder-names", action="store_true",
                         help="Validate folder names")
     parser.add_argument("--store-ids", action="store_true", help="Validate store IDs")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(),
+                        help="Number of worker processes (default: number of CPUs)")
+    parser.add_argument("--chunk-size", type=int,
+                        help=f"Tasks per work unit (default: about {CHUNKS_PER_WORKER} units per worker)")
+    parser.add_argument("--executor", choices=EXECUTORS, default="auto",
+                        help="Run the tasks inline, on threads or on processes (default: auto, per task type)")
+    parser.add_argument("--cache-file", default=VALIDATION_CACHE_FILE,
+                        help=f"Reuse the results of unchanged files from this file (default: {VALIDATION_CACHE_FILE})")
+    parser.add_argument("--no-cache", action="store_true", help="Validate everything and don't write the cache")
+    parser.add_argument("--changed-since", metavar="REV",
+                        help="Only validate the files changed since the git revision REV and the files depending on them")
+    parser.add_argument("--watch", action="store_true",
+                        help="Validate everything, then revalidate what changes on disk until interrupted")
+    parser.add_argument("--poll", action="store_true", help="Poll for changes instead of using inotify (--watch)")
+    parser.add_argument("--allow-warnings", action="store_true",
+                        help="Only fail on errors, warnings (e.g. duplicate GTINs) are reported but pass")
 
     args = parser.parse_args()
 
-    orchestrator = ValidationOrchestrator(max_workers=os.cpu_count())
+    orchestrator = ValidationOrchestrator(max_workers=args.workers, chunk_size=args.chunk_size,
+                                          executor=args.executor,
+                                          cache_path=None if args.no_cache else Path(args.cache_file))
     result = ValidationResult()
 
+    if args.watch:
+        WatchSession(orchestrator).watch(use_inotify=False if args.poll else None)
+        exit(0)
+
+    if args.changed_since:
+        from subprocess import CalledProcessError
+        try:
+            changed = git_changed_paths(args.changed_since)
+        except (CalledProcessError, OSError) as e:
+            print(f"Failed to get the changes since '{args.changed_since}': {getattr(e, 'stderr', None) or e}")
+            exit(2)
+        orchestrator.scope = changed_scope(changed, orchestrator.manifest, orchestrator.cache,
+                                           git_old_facts(args.changed_since))
+        if orchestrator.scope is None:
+            print("The validator changed, validating everything")
+        else:
+            print(f"{len(changed)} files changed since {args.changed_since}")
+
     # Run requested validations
-    if not any(vars(args).values()):
+    validate_all = not any((args.json_files, args.logo_files, args.folder_names, args.store_ids))
+    if validate_all:
         print("No args passed, validating all")
         result = orchestrator.validate_all()
     else:
@@ -835,28 +1982,13 @@ def main():
         if args.store_ids:
             result.merge(orchestrator.validate_store_ids())
 
-    # Print results
-    if result.errors:
-        # Group errors by category
-        errors_by_category: Dict[str, List[ValidationError]] = {}
-        for error in result.errors:
-            if error.category not in errors_by_category:
-                errors_by_category[error.category] = []
-            errors_by_category[error.category].append(error)
+    # Entries of deleted files are only dropped after a full run, a partial run doesn't see all of them
+    orchestrator.cache.save(prune=validate_all and orchestrator.scope is None)
 
-        # Print errors grouped by category
-        for category, errors in sorted(errors_by_category.items()):
-            print(f"\n{category} ({len(errors)}):")
-            print("-" * 80)
-            for error in errors:
-                print(f"  {error}")
-
-        print(
-            f"\nValidation failed: {result.error_count} errors, {result.warning_count} warnings")
-        exit(1)
-    else:
-        print("All validations passed!")
-        exit(0)
+    # Print results
+    print_result(result, args.allow_warnings)
+    # Warnings fail the run unless they are allowed
+    exit(0 if result.is_valid and (args.allow_warnings or not result.errors) else 1)
 
 
 if __name__ == '__main__':
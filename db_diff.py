@@ -0,0 +1,413 @@
+import os
+import sys
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Optional, Any, Union, Iterator, TextIO, Callable
+
+import json_codec
+from db_serializer import Brand, Material, Filament, FilamentVariant, FilamentSize, SizePurchaseLink, Store, \
+    IToFromJSONData, get_json_from_file, canonical_json, merkle_hash, entity_segment, size_key, purchase_link_key, \
+    named_children, unique_key, cleanse_folder_name, AIO_FILE_SUFFIX
+
+PathLike = Union[str, os.PathLike[str]]
+
+# Entity kinds in tree order. These are also the prefixes of the entity path segments.
+KIND_ROOT = "root"
+KIND_STORE = "store"
+KIND_BRAND = "brand"
+KIND_MATERIAL = "material"
+KIND_FILAMENT = "filament"
+KIND_VARIANT = "variant"
+KIND_SIZE = "size"
+KIND_PURCHASE_LINK = "purchase_link"
+
+
+# ---------------------------------
+# Diff Tree
+# ---------------------------------
+
+@dataclass
+class DiffNode:
+    """
+    A single entity of the data tree as seen by the diff engine
+    `fields` holds the entity's own data, child entities live in `children` keyed by their path segment
+    Nodes built from a checkout also keep the document as read in `raw`, `normalized` is False if the model couldn't
+    load it and `fields` is the raw document
+    """
+    kind: str
+    key: str
+    fields: dict[str, Any]
+    children: dict[str, 'DiffNode'] = field(default_factory=dict)
+    raw: Optional[dict[str, Any]] = field(default=None, repr=False)
+    normalized: bool = True
+    _digest: Optional[str] = field(default=None, repr=False)
+
+    @property
+    def segment(self) -> str:
+        return entity_segment(self.kind, self.key)
+
+    @property
+    def digest(self) -> str:
+        """
+        The subtree hash of this node
+        For trees built from the model this is equal to the node's content_hash()
+        """
+        if self._digest is None:
+            self._digest = merkle_hash(self.fields, {k: v.digest for k, v in self.children.items()})
+        return self._digest
+
+    def add_child(self, child: 'DiffNode'):
+        self.children[child.segment] = child
+
+
+def _sizes_node_children(parent: DiffNode, sizes_data: Any, store_map: dict[str, Store]):
+    if not isinstance(sizes_data, list):
+        return
+    used_sizes: set[str] = set()
+    for size in sizes_data:
+        if not isinstance(size, dict):
+            continue
+        # Sizes are normalized without their purchase links, so a link whose store is missing doesn't change them
+        size_node = _document_node(KIND_SIZE, FilamentSize.from_json_data, _without(size, "purchase_links"),
+                                   lambda x: size_key(x, used_sizes))
+        used_links: set[str] = set()
+        links = size.get("purchase_links", [])
+        for link in links if isinstance(links, list) else []:
+            if not isinstance(link, dict):
+                continue
+            size_node.add_child(_document_node(KIND_PURCHASE_LINK,
+                                               lambda x: SizePurchaseLink.from_json_data(x, store_map=store_map),
+                                               link, lambda x: purchase_link_key(x, used_links)))
+        parent.add_child(size_node)
+
+
+# ---------------------------------
+# Build From Folder
+# Documents are normalized through the model (see _normalized()), so a checkout and a loaded snapshot of the same
+# data get equal digests and can be diffed against each other. Documents the model can't load are used as they are,
+# diff_trees() then compares the raw documents of both sides.
+# ---------------------------------
+
+def _normalized(from_json_data: Callable[..., Optional[IToFromJSONData]],
+                json_data: dict[str, Any]) -> tuple[dict[str, Any], bool]:
+    """
+    Returns the document the way the model writes it (e.g. upper case color hex, default values filled in)
+    and whether the model could load it. If it couldn't, json_data is returned unchanged
+    """
+    try:
+        obj = from_json_data(json_data)
+    except Exception:
+        return json_data, False
+    return (json_data, False) if obj is None else (obj.to_dict(), True)
+
+
+def _document_node(kind: str, from_json_data: Callable[..., Optional[IToFromJSONData]], json_data: dict[str, Any],
+                   get_key: Callable[[dict[str, Any]], str]) -> DiffNode:
+    """Build the node of a document read from a checkout, get_key is called with the normalized document"""
+    fields, normalized = _normalized(from_json_data, json_data)
+    return DiffNode(kind, get_key(fields), fields, raw=json_data, normalized=normalized)
+
+
+def _entity_key(json_data: dict[str, Any], name_field: str, fallback: str) -> str:
+    """Entities are keyed by their cleansed name like in the model, fallback is used if the document has no name"""
+    name = json_data.get(name_field)
+    return cleanse_folder_name(name) if isinstance(name, str) else fallback
+
+
+def _sorted_subdirs(path: Path) -> list[Path]:
+    return sorted((x for x in path.iterdir() if x.is_dir()), key=lambda x: x.name)
+
+
+def _sorted_aio_files(path: Path) -> list[Path]:
+    return sorted((x for x in path.iterdir() if x.is_file() and x.name.endswith(AIO_FILE_SUFFIX)), key=lambda x: x.name)
+
+
+def _load_fields(json_path: Path) -> Optional[dict[str, Any]]:
+    if not json_path.exists():
+        return None
+    json_data = get_json_from_file(json_path)
+    if not isinstance(json_data, dict):
+        return None
+    return json_data
+
+
+def tree_from_folder(root: PathLike) -> DiffNode:
+    """
+    Build a diff tree from a checkout of the database
+    Raw JSON documents are read so a checkout can be diffed even if it would not load through the model,
+    the documents that do load are normalized the same way as in tree_from_model()
+    :param root: The folder containing the "data" and "stores" folders
+    """
+    root = Path(root)
+    tree = DiffNode(KIND_ROOT, "", {})
+
+    store_map: dict[str, Store] = {}
+    stores_dir = root.joinpath("stores")
+    if stores_dir.is_dir():
+        for store_dir in _sorted_subdirs(stores_dir):
+            store_data = _load_fields(store_dir.joinpath("store.json"))
+            if store_data is None:
+                continue
+            try:
+                store = Store.from_json_data(store_data)
+            except Exception:
+                store = None
+            store_node = DiffNode(KIND_STORE, str(store_data.get("id", store_dir.name)), store_data, raw=store_data,
+                                  normalized=False)
+            if store is not None:
+                store_map[store.store_id] = store
+                store_node.fields, store_node.normalized = store.to_dict(), True
+            tree.add_child(store_node)
+
+    data_dir = root.joinpath("data")
+    if not data_dir.is_dir():
+        return tree
+
+    used_brands: set[str] = set()
+    for brand_dir in _sorted_subdirs(data_dir):
+        brand_node = _brand_node_from_folder(brand_dir, used_brands, store_map)
+        if brand_node is not None:
+            tree.add_child(brand_node)
+    return tree
+
+
+def _brand_node_from_folder(brand_dir: Path, used: set[str], store_map: dict[str, Store]) -> Optional[DiffNode]:
+    brand_data = _load_fields(brand_dir.joinpath("brand.json"))
+    if brand_data is None:
+        return None
+    brand_node = _document_node(KIND_BRAND, lambda x: Brand.from_json_data(x, validate=False), brand_data,
+                                lambda x: unique_key(_entity_key(x, "brand", brand_dir.name), used))
+
+    used_materials: set[str] = set()
+    for material_dir in _sorted_subdirs(brand_dir):
+        material_data = _load_fields(material_dir.joinpath("material.json"))
+        if material_data is None:
+            continue
+        material_node = _document_node(
+            KIND_MATERIAL, lambda x: Material.from_json_data(x, validate=False), material_data,
+            lambda x: unique_key(_entity_key(x, "material", material_dir.name), used_materials))
+        brand_node.add_child(material_node)
+
+        used_filaments: set[str] = set()
+        for filament_dir in _sorted_subdirs(material_dir):
+            filament_data = _load_fields(filament_dir.joinpath("filament.json"))
+            if filament_data is None:
+                continue
+            filament_node = _filament_node(filament_data, filament_dir.name, used_filaments)
+            material_node.add_child(filament_node)
+
+            used_variants: set[str] = set()
+            for variant_dir in _sorted_subdirs(filament_dir):
+                variant_data = _load_fields(variant_dir.joinpath("variant.json"))
+                if variant_data is None:
+                    continue
+                variant_node = _variant_node(variant_data, variant_dir.name, used_variants)
+                sizes_path = variant_dir.joinpath("sizes.json")
+                if sizes_path.exists():
+                    _sizes_node_children(variant_node, get_json_from_file(sizes_path), store_map)
+                filament_node.add_child(variant_node)
+
+    for aio_path in _sorted_aio_files(brand_dir):
+        aio_data = _load_fields(aio_path)
+        if aio_data is None:
+            continue
+        material_node = _material_node_from_aio(aio_path.name[:-len(AIO_FILE_SUFFIX)], aio_data, store_map)
+        # A material is the same entity whether it is stored as a folder or as an AIO file
+        if material_node.key in used_materials:
+            continue
+        used_materials.add(material_node.key)
+        brand_node.add_child(material_node)
+    return brand_node
+
+
+def _without(data: dict[str, Any], key: str) -> dict[str, Any]:
+    return {k: v for k, v in data.items() if k != key}
+
+
+def _filament_node(filament_data: dict[str, Any], fallback_key: str, used: set[str]) -> DiffNode:
+    return _document_node(KIND_FILAMENT, lambda x: Filament.from_json_data(x, None, validate=False), filament_data,
+                          lambda x: unique_key(_entity_key(x, "name", fallback_key), used))
+
+
+def _variant_node(variant_data: dict[str, Any], fallback_key: str, used: set[str]) -> DiffNode:
+    return _document_node(KIND_VARIANT, lambda x: FilamentVariant.from_json_data(x, None, validate=False), variant_data,
+                          lambda x: unique_key(_entity_key(x, "color_name", fallback_key), used))
+
+
+def _material_node_from_aio(fallback_key: str, aio_data: dict[str, Any], store_map: dict[str, Store]) -> DiffNode:
+    """Build a material node from an AIO material file, keyed the same way as the equivalent material folder"""
+    material_node = _document_node(KIND_MATERIAL, lambda x: Material.from_json_data(x, validate=False),
+                                   _without(aio_data, "filaments"), lambda x: _entity_key(x, "material", fallback_key))
+    filaments = aio_data.get("filaments", [])
+    used_filaments: set[str] = set()
+    for filament_data in filaments if isinstance(filaments, list) else []:
+        if not isinstance(filament_data, dict):
+            continue
+        filament_node = _filament_node(_without(filament_data, "variants"), "None", used_filaments)
+        variants = filament_data.get("variants", [])
+        used_variants: set[str] = set()
+        for variant_data in variants if isinstance(variants, list) else []:
+            if not isinstance(variant_data, dict):
+                continue
+            variant_node = _variant_node(_without(variant_data, "sizes"), "None", used_variants)
+            _sizes_node_children(variant_node, variant_data.get("sizes"), store_map)
+            filament_node.add_child(variant_node)
+        material_node.add_child(filament_node)
+    return material_node
+
+
+# ---------------------------------
+# Build From Model
+# ---------------------------------
+
+def tree_from_model(brands: list[Brand], stores: dict[str, Store]) -> DiffNode:
+    """
+    Build a diff tree from loaded model objects
+    Entities are keyed the same way as in the hash manifest, so node digests equal the objects' content_hash()
+    :param brands: The loaded brands
+    :param stores: The loaded stores, keyed by store id
+    """
+    tree = DiffNode(KIND_ROOT, "", {})
+    for store_id in sorted(stores):
+        tree.add_child(_node_from_model(entity_segment(KIND_STORE, store_id), stores[store_id]))
+    for segment, brand in named_children(KIND_BRAND, brands, lambda x: x.brand_name):
+        tree.add_child(_node_from_model(segment, brand))
+    return tree
+
+
+def _node_from_model(segment: str, obj: IToFromJSONData) -> DiffNode:
+    node = DiffNode(obj.hash_kind, segment.split(":", 1)[1], obj.hash_fields())
+    for child_segment, child in obj.hash_children():
+        node.add_child(_node_from_model(child_segment, child))
+    return node
+
+
+# ---------------------------------
+# Diff
+# ---------------------------------
+
+def _walk(node: DiffNode, path: str, post_order=False) -> Iterator[tuple[str, DiffNode]]:
+    if not post_order:
+        yield path, node
+    for segment in sorted(node.children):
+        yield from _walk(node.children[segment], f"{path}/{segment}", post_order)
+    if post_order:
+        yield path, node
+
+
+def _field_changes(old: dict[str, Any], new: dict[str, Any]) -> dict[str, dict[str, Any]]:
+    changes = {}
+    for k in sorted(old.keys() | new.keys()):
+        if k not in new:
+            changes[k] = {"old": old[k]}
+        elif k not in old:
+            changes[k] = {"new": new[k]}
+        elif canonical_json(old[k]) != canonical_json(new[k]):
+            changes[k] = {"old": old[k], "new": new[k]}
+    return changes
+
+
+def _comparable_fields(old: DiffNode, new: DiffNode) -> tuple[dict[str, Any], dict[str, Any]]:
+    """
+    Returns the fields to compare for a pair of nodes
+    If the model couldn't load either side, the raw documents of both are compared, a normalized document compared
+    to a raw one would show differences in shape (e.g. default values) as changes
+    """
+    if (not old.normalized or not new.normalized) and old.raw is not None and new.raw is not None:
+        return old.raw, new.raw
+    return old.fields, new.fields
+
+
+def _moved_children(old: DiffNode, new: DiffNode) -> tuple[set[str], set[str]]:
+    """
+    Returns the segments of the old and the new children whose content is on the other side under another segment,
+    children whose segment is on both sides with the same content are left out
+    """
+    unchanged = {k for k, v in old.children.items() if k in new.children and new.children[k].digest == v.digest}
+    old_by_digest: dict[str, list[str]] = {}
+    for segment in sorted(old.children.keys() - unchanged):
+        old_by_digest.setdefault(old.children[segment].digest, []).append(segment)
+    moved_old, moved_new = set(), set()
+    for segment in sorted(new.children.keys() - unchanged):
+        candidates = old_by_digest.get(new.children[segment].digest)
+        if candidates:
+            moved_old.add(candidates.pop(0))
+            moved_new.add(segment)
+    return moved_old, moved_new
+
+
+def diff_trees(old: DiffNode, new: DiffNode, path: str = "") -> Iterator[dict[str, Any]]:
+    """
+    Yield change records between two diff trees
+    Subtrees with equal digests are skipped without being visited
+    Removed subtrees are reported children first, added subtrees parents first
+
+    Each record is a dict with:
+        op: "added", "removed" or "modified"
+        kind: The entity kind (store, brand, material, filament, variant, size, purchase_link)
+        path: The stable entity path, e.g. "brand:Bambu Lab/material:PLA/filament:Basic/variant:Black"
+        data: The entity's fields (added/removed only)
+        changes: {field: {"old": ..., "new": ...}} (modified only, a missing side means the field was added/removed)
+    """
+    if old.digest == new.digest:
+        return
+
+    if old.kind != KIND_ROOT:
+        changes = _field_changes(*_comparable_fields(old, new))
+        if changes:
+            yield {"op": "modified", "kind": new.kind, "path": path, "changes": changes}
+
+    # Children that only moved to another segment are unchanged. Their content is the same, so only the
+    # occurrence suffix of their key differs (e.g. the second of two sizes of the same weight became the only one)
+    moved = _moved_children(old, new)
+    prefix = f"{path}/" if path else ""
+    for segment in sorted(old.children.keys() | new.children.keys()):
+        child_path = prefix + segment
+        old_child = old.children.get(segment) if segment not in moved[0] else None
+        new_child = new.children.get(segment) if segment not in moved[1] else None
+        if old_child is None and new_child is None:
+            continue
+        if new_child is None:
+            for sub_path, node in _walk(old_child, child_path, post_order=True):
+                yield {"op": "removed", "kind": node.kind, "path": sub_path, "data": node.fields}
+        elif old_child is None:
+            for sub_path, node in _walk(new_child, child_path):
+                yield {"op": "added", "kind": node.kind, "path": sub_path, "data": node.fields}
+        else:
+            yield from diff_trees(old_child, new_child, child_path)
+
+
+def diff_folders(old_root: PathLike, new_root: PathLike) -> Iterator[dict[str, Any]]:
+    """Yield the change records between two checkouts of the database"""
+    return diff_trees(tree_from_folder(old_root), tree_from_folder(new_root))
+
+
+def write_change_feed(changes: Iterator[dict[str, Any]], out: TextIO) -> int:
+    """
+    Write change records as NDJSON, one record per line
+    :returns The number of records written
+    """
+    count = 0
+    for change in changes:
+        out.write(json_codec.dumps(change, ensure_ascii=False))
+        out.write("\n")
+        count += 1
+    return count
+
+
+# If running from the command line, provide argument parsing
+if __name__ == "__main__":
+    from argparse import ArgumentParser
+
+    parser = ArgumentParser(description="Emit an NDJSON change feed between two checkouts of the database")
+    parser.add_argument("old_root", help="The folder containing the old 'data' and 'stores' folders")
+    parser.add_argument("new_root", help="The folder containing the new 'data' and 'stores' folders")
+    parser.add_argument("-o", "--output", help="Write the change feed to this file instead of stdout")
+    args = parser.parse_args()
+
+    if args.output:
+        with open(args.output, "w", encoding="utf8") as f:
+            written = write_change_feed(diff_folders(args.old_root, args.new_root), f)
+        print(f"Wrote {written} changes to {args.output}")
+    else:
+        write_change_feed(diff_folders(args.old_root, args.new_root), sys.stdout)
@@ -0,0 +1,233 @@
+import math
+import os
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Optional, Any, Union, Iterator
+
+import json_codec
+from db_serializer import Brand, Filament, load_brands, named_children
+
+PathLike = Union[str, os.PathLike[str]]
+
+# Cross-brand rebrand detection
+# Many filaments are sold by several brands under different names. Likely duplicates are found without comparing
+# every pair of filaments:
+#   1. Blocking: filaments are grouped by material type and density bucket. Only filaments of the same and the
+#      following buckets within DENSITY_RANGE are compared, so the number of comparisons grows with the block sizes, not the catalog.
+#   2. Scoring: the variant colors of a filament are quantized and stored as bits of an int, so the shared colors of
+#      a pair are one AND and a popcount. Pairs that share no color are skipped before anything else is compared.
+#   3. Clustering: pairs that score at least the threshold are joined best first (average linkage). Two clusters are
+#      only merged if their filaments are of different brands and all pairs across them score the threshold on
+#      average, so clusters don't chain through a single shared neighbour.
+
+# The width of a density bucket (g/cm³), filaments are compared with those of the buckets within DENSITY_RANGE
+DENSITY_STEP = 0.03
+# Bits per color channel after quantization, 3 bits = 512 color buckets
+COLOR_BITS = 3
+# The weight of each score component, components that are missing on either side are left out
+WEIGHTS = {
+    "colors": 0.5,
+    "density": 0.2,
+    "diameter_tolerance": 0.1,
+    "temperatures": 0.2
+}
+# Added to the number of distinct colors of a pair when scoring colors, so sharing one or two colors (e.g. only
+# black) is weak evidence and sharing a whole color range is strong evidence
+COLOR_PRIOR = 2
+# The difference at which a numeric component scores 0
+DENSITY_RANGE = 0.05
+DIAMETER_TOLERANCE_RANGE = 0.05
+TEMPERATURE_RANGE = 20
+# The buckets following a filament's one that may hold densities closer than DENSITY_RANGE
+DENSITY_NEIGHBOURS = math.ceil(DENSITY_RANGE / DENSITY_STEP)
+
+
+@dataclass(slots=True)
+class FilamentFeatures:
+    path: str  # Entity path, e.g. "brand:Bambu Lab/material:PLA/filament:Basic"
+    brand: str
+    material: str
+    filament: str
+    density: float
+    diameter_tolerance: float
+    # (nozzle, bed, max dry) temperatures after falling back to the material's defaults, None where unknown
+    temperatures: tuple[Optional[int], ...]
+    colors: int  # Bit set of quantized variant colors
+    variants: int
+
+
+@dataclass
+class RebrandCluster:
+    score: float  # The average score of all pairs of members
+    members: list[FilamentFeatures]
+    pairs: list[dict[str, Any]] = field(default_factory=list)
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "score": self.score,
+            "members": [{"path": x.path, "brand": x.brand, "material": x.material, "filament": x.filament,
+                         "variants": x.variants} for x in self.members],
+            "pairs": self.pairs
+        }
+
+
+# ---------------------------------
+# Features
+# ---------------------------------
+
+def normalize_material(name: str) -> str:
+    """Material types are compared case and punctuation insensitive ("PLA+" == "pla +")"""
+    return "".join(x for x in name.upper() if x.isalnum() or x == "+")
+
+
+def color_bit(color_hex: str) -> int:
+    value = int(color_hex.lstrip("#"), 16)
+    shift = 8 - COLOR_BITS
+    r, g, b = (value >> 16 & 0xFF) >> shift, (value >> 8 & 0xFF) >> shift, (value & 0xFF) >> shift
+    return 1 << (r << 2 * COLOR_BITS | g << COLOR_BITS | b)
+
+
+def filament_temperatures(filament: Filament) -> tuple[Optional[int], ...]:
+    generic = filament.get_resolved_slicer_settings().generic
+    nozzle = generic.nozzle_temp if generic is not None else None
+    bed = generic.bed_temp if generic is not None else None
+    return nozzle, bed, filament.get_max_dry_temperature()
+
+
+def iter_features(brands: list[Brand]) -> Iterator[FilamentFeatures]:
+    for brand_segment, brand in named_children(Brand.hash_kind, brands, lambda x: x.brand_name):
+        for material_segment, material in brand.hash_children():
+            for filament_segment, filament in material.hash_children():
+                colors = 0
+                for variant in filament.variants:
+                    for color_hex in variant.color_hex:
+                        colors |= color_bit(color_hex)
+                yield FilamentFeatures(
+                    path=f"{brand_segment}/{material_segment}/{filament_segment}",
+                    brand=brand.brand_name,
+                    material=material.material_name,
+                    filament=filament.name,
+                    density=filament.density,
+                    diameter_tolerance=filament.diameter_tolerance,
+                    temperatures=filament_temperatures(filament),
+                    colors=colors,
+                    variants=len(filament.variants)
+                )
+
+
+# ---------------------------------
+# Blocking & Scoring
+# ---------------------------------
+
+def block_key(features: FilamentFeatures) -> tuple[str, int]:
+    return normalize_material(features.material), int(features.density // DENSITY_STEP)
+
+
+def iter_candidate_pairs(features: list[FilamentFeatures]) -> Iterator[tuple[int, int]]:
+    """Yields the index pairs of filaments of different brands within the same or neighbouring blocks"""
+    blocks: dict[tuple[str, int], list[int]] = defaultdict(list)
+    for i, x in enumerate(features):
+        blocks[block_key(x)].append(i)
+    for (material, bucket), members in blocks.items():
+        neighbours = [j for k in range(1, DENSITY_NEIGHBOURS + 1) for j in blocks.get((material, bucket + k), [])]
+        for n, i in enumerate(members):
+            for j in members[n + 1:] + neighbours:
+                if features[i].brand != features[j].brand and features[i].colors & features[j].colors:
+                    yield i, j
+
+
+def _closeness(a: Optional[float], b: Optional[float], value_range: float) -> Optional[float]:
+    if a is None or b is None:
+        return None
+    return max(0.0, 1 - abs(a - b) / value_range)
+
+
+def score_pair(a: FilamentFeatures, b: FilamentFeatures) -> tuple[float, dict[str, float]]:
+    """Returns the weighted score (0-1) of a pair and its components"""
+    components = {
+        "colors": (a.colors & b.colors).bit_count() / ((a.colors | b.colors).bit_count() + COLOR_PRIOR),
+        "density": _closeness(a.density, b.density, DENSITY_RANGE),
+        "diameter_tolerance": _closeness(a.diameter_tolerance, b.diameter_tolerance, DIAMETER_TOLERANCE_RANGE)
+    }
+    temperatures = [_closeness(x, y, TEMPERATURE_RANGE) for x, y in zip(a.temperatures, b.temperatures)]
+    temperatures = [x for x in temperatures if x is not None]
+    components["temperatures"] = sum(temperatures) / len(temperatures) if temperatures else None
+
+    components = {k: round(v, 4) for k, v in components.items() if v is not None}
+    total_weight = sum(WEIGHTS[k] for k in components)
+    return round(sum(WEIGHTS[k] * v for k, v in components.items()) / total_weight, 4), components
+
+
+# ---------------------------------
+# Clustering
+# ---------------------------------
+
+def find_rebrands(brands: list[Brand], min_score=0.6) -> list[RebrandCluster]:
+    """
+    Returns clusters of filaments of different brands that are likely the same product, best first
+    :param min_score: The score (0-1) a pair needs to be joined into a cluster, and the average score of all pairs
+                      across two clusters to merge them
+    """
+    features = list(iter_features(brands))
+    scores: dict[tuple[int, int], tuple[float, dict[str, float]]] = {}
+
+    def pair_score(i: int, j: int) -> float:
+        key = (i, j) if i < j else (j, i)
+        if key not in scores:
+            scores[key] = score_pair(features[key[0]], features[key[1]])
+        return scores[key][0]
+
+    pairs: list[tuple[int, int]] = []
+    for i, j in iter_candidate_pairs(features):
+        if pair_score(i, j) >= min_score:
+            pairs.append((i, j))
+    pairs.sort(key=lambda x: -pair_score(*x))
+
+    # The members of each cluster by cluster id (the index of one of its filaments), and the cluster of each filament
+    members: dict[int, list[int]] = {i: [i] for i in range(len(features))}
+    cluster_of = list(range(len(features)))
+    for i, j in pairs:
+        a, b = cluster_of[i], cluster_of[j]
+        if a == b or {features[x].brand for x in members[a]} & {features[x].brand for x in members[b]}:
+            continue
+        linkage = sum(pair_score(x, y) for x in members[a] for y in members[b]) / (len(members[a]) * len(members[b]))
+        if linkage < min_score:
+            continue
+        for x in members[b]:
+            cluster_of[x] = a
+        members[a].extend(members.pop(b))
+
+    clusters: dict[int, RebrandCluster] = {}
+    for key, indices in members.items():
+        if len(indices) < 2:
+            continue
+        member_pairs = [(x, y) for n, x in enumerate(indices) for y in indices[n + 1:]]
+        score = round(sum(pair_score(x, y) for x, y in member_pairs) / len(member_pairs), 4)
+        clusters[key] = RebrandCluster(score, [features[x] for x in sorted(indices)])
+    for i, j in pairs:
+        cluster = clusters.get(cluster_of[i])
+        if cluster is not None and cluster_of[i] == cluster_of[j]:
+            score, components = scores[(i, j) if i < j else (j, i)]
+            cluster.pairs.append({"a": features[i].path, "b": features[j].path, "score": score,
+                                  "components": components})
+    return sorted(clusters.values(), key=lambda x: (-x.score, -len(x.members)))
+
+
+# If running from the command line, provide argument parsing
+if __name__ == "__main__":
+    from argparse import ArgumentParser
+
+    parser = ArgumentParser(description="Find filaments that are likely sold by several brands under different names")
+    parser.add_argument("--data-dir", default="data", help="The folder containing the brand folders")
+    parser.add_argument("--min-score", type=float, default=0.6, help="The score (0-1) a pair needs to be reported")
+    parser.add_argument("--top", type=int, default=20, help="The number of clusters to print")
+    parser.add_argument("-o", "--output", help="Write all clusters to this JSON file")
+    args = parser.parse_args()
+
+    found = find_rebrands(load_brands(args.data_dir), args.min_score)
+    for found_cluster in found[:args.top]:
+        print(f"{found_cluster.score:.3f}  " + "  |  ".join(f"{x.brand} {x.filament}" for x in found_cluster.members))
+    print(f"Found {len(found)} clusters")
+    if args.output:
+        with open(args.output, "w", encoding="utf8") as f:
+            json_codec.dump([x.to_dict() for x in found], f, indent=4, ensure_ascii=False)
@@ -1,18 +1,37 @@
-import json
+import hashlib
 import os
 import re
+import shutil
+import stat
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from collections import OrderedDict, Counter
+from concurrent.futures import ThreadPoolExecutor, Future
+from contextlib import contextmanager, nullcontext
 from copy import deepcopy
+from dataclasses import dataclass, field
 from json import JSONDecodeError
 from pathlib import Path
-from typing import Optional, Any, Union, Self
+from typing import Optional, Any, Union, Self, Iterator, Callable, Iterable, Collection
 
-from jsonschema.exceptions import ValidationError
-from jsonschema.validators import validate
+from jsonschema.exceptions import ValidationError, best_match
+from jsonschema.validators import validator_for
+
+import json_codec
+from fs_watch import FileChange, RESCAN, create_watcher
+from gtin import normalize_gtin_ean, validate_identifiers, IdentifierIssue
 
 PathLike = Union[str, os.PathLike[str]]
 
 COLOR_HEX_PATTERN = re.compile(r"#?([a-fA-F0-9]{6})")
 
+# All-in-one (AIO) material files hold a material with all of its filaments, variants and sizes.
+# They are stored in the brand folder next to (or instead of) material folders, e.g. "data/<brand>/PLA.material.json"
+AIO_FILE_SUFFIX = ".material.json"
+
 # Global variable that denotes the last json file that was read
 # This is used to for json validation error messages
 last_json_file_loaded = ""
@@ -26,7 +45,7 @@ def shallow_remove_empty(input_dict: dict):
     """Remove elements that are 'None' or have an empty list/dict"""
     cpy = input_dict.copy()
     for k, v in input_dict.items():
-        if v is None or (isinstance(v, (list, dict)) and len(v) == 0):
+        if v is None or (isinstance(v, (list, tuple, dict)) and len(v) == 0):
             del cpy[k]
     return cpy
 
@@ -43,40 +62,502 @@ def normalize_color_hex(input_data: list[str]):
     return res
 
 
+def intern_strings(values: list) -> list:
+    """
+    Returns the list with its strings interned
+    Store ids and country codes repeat thousands of times across the data, interned each is only stored once
+    """
+    return [sys.intern(x) if isinstance(x, str) else x for x in values]
+
+
 def cleanse_folder_name(name: str) -> str:
     return name.replace("/", " ").strip()
 
 
+def read_file_bytes(path: PathLike) -> bytes:
+    """Read the whole file at path. All JSON loading goes through here."""
+    with open(path, mode="rb") as file:
+        return file.read()
+
+
 def get_json_from_file(json_path: PathLike):
     """
     Attempt to load JSON from the specified path
+    If a FilePrefetcher is active and has already read the file, its bytes are used
     :returns Loaded JSON as a dict or None if there is an error
     """
     try:
         global last_json_file_loaded
         last_json_file_loaded = json_path.__str__()
-        with open(json_path, mode="r", encoding="utf8") as file:
-            return json.load(file)
-    except JSONDecodeError:
+        profiler = _active_profiler
+        if profiler is not None:
+            start = time.perf_counter()
+        data = _active_prefetcher.take(json_path) if _active_prefetcher is not None else None
+        if data is None:
+            data = read_file_bytes(json_path)
+        if profiler is None:
+            return json_codec.loads(data)
+        read_done = time.perf_counter()
+        try:
+            return json_codec.loads(data)
+        finally:
+            profiler.add(files=1, bytes_read=len(data), read_time=read_done - start,
+                         decode_time=time.perf_counter() - read_done)
+    except (JSONDecodeError, UnicodeDecodeError):
         print(f"Failed to import JSON from file: {json_path}")
     except OSError:
         print(f"Failed to open the provided JSON file: {json_path}")
     return None
 
 
+def json_bytes(json_data) -> bytes:
+    """Returns the bytes that are written to disk for the provided json data"""
+    return json_codec.dumps_bytes(json_data, indent=4)
+
+
+def data_json_bytes(json_data) -> bytes:
+    """Returns the json data formatted the same way as the hand maintained files in the data folder"""
+    return json_codec.dumps_bytes(json_data, indent=2, ensure_ascii=False)
+
+
+# The umask can only be read by setting it, which isn't safe while other threads create files.
+# It's read once on import instead.
+_UMASK = os.umask(0o022)
+os.umask(_UMASK)
+
+
+def write_file_if_changed(path: PathLike, data: bytes) -> bool:
+    """
+    Atomically write data to the file at path, unless the file already contains exactly that data
+    The data is written to a temp file in the same folder which then replaces the target
+    :returns True if the file was written
+    """
+    path = Path(path)
+    try:
+        with open(path, mode="rb") as f:
+            if f.read() == data:
+                return False
+            mode = stat.S_IMODE(os.fstat(f.fileno()).st_mode)
+    except FileNotFoundError:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # What open(path, "w") would create
+        mode = 0o666 & ~_UMASK
+
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, mode="wb") as f:
+            f.write(data)
+        # mkstemp() creates the file as 0600, the replaced file keeps the permissions of the one it replaces
+        os.chmod(tmp_path, mode)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    return True
+
+
+def write_files(writes: list[tuple[Path, bytes]], max_workers: Optional[int] = None) -> int:
+    """
+    Write many files with write_file_if_changed() using a thread pool
+    :param writes: (path, data) pairs
+    :param max_workers: The number of writer threads, defaults to the ThreadPoolExecutor default
+    :returns The number of files that were actually written
+    """
+    if len(writes) <= 1:
+        return sum(write_file_if_changed(path, data) for path, data in writes)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return sum(executor.map(lambda x: write_file_if_changed(*x), writes))
+
+
+# ---------------------------------
+# Read-ahead
+# ---------------------------------
+
+class FilePrefetcher:
+    """
+    Reads files on a thread pool ahead of the parser
+    Meant for slow (e.g. network) filesystems where loading is bound by per-file latency rather than CPU.
+    Files are submitted in the order they will be parsed and at most max_pending reads are in flight or
+    buffered at any time. When the parser takes a file, any files queued before it are assumed to have
+    been skipped by the parser (e.g. the rest of a brand that failed to load) and are dropped.
+    """
+
+    def __init__(self, paths: list[PathLike], max_workers: int = 8, max_pending: Optional[int] = None):
+        self._paths = [os.path.normpath(x) for x in paths]
+        self._positions = {x: i for i, x in enumerate(self._paths)}
+        self._next = 0
+        self._pending: OrderedDict[str, Future] = OrderedDict()
+        self._max_pending = max_pending if max_pending is not None else max_workers * 4
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="prefetch")
+        self.hits = 0
+        self.misses = 0
+        self._fill()
+
+    def _fill(self):
+        while self._next < len(self._paths) and len(self._pending) < self._max_pending:
+            path = self._paths[self._next]
+            self._next += 1
+            self._pending[path] = self._executor.submit(read_file_bytes, path)
+
+    def _skip_to(self, position: int):
+        """Drop the read-ahead window and restart it at position"""
+        for future in self._pending.values():
+            future.cancel()
+        self._pending.clear()
+        self._next = position
+        self._fill()
+
+    def take(self, path: PathLike) -> Optional[bytes]:
+        """
+        Returns the prefetched bytes of path, or None if the file was not prefetched
+        Read errors are raised the same way read_file_bytes() would raise them
+        """
+        key = os.path.normpath(path)
+        if key not in self._pending:
+            position = self._positions.get(key)
+            if position is None or position < self._next:
+                self.misses += 1
+                return None
+            # The parser skipped past the read-ahead window
+            self._skip_to(position)
+        while True:
+            queued_path, future = self._pending.popitem(last=False)
+            if queued_path == key:
+                break
+            future.cancel()
+        self._fill()
+        self.hits += 1
+        return future.result()
+
+    def close(self):
+        for future in self._pending.values():
+            future.cancel()
+        self._pending.clear()
+        self._next = len(self._paths)
+        self._executor.shutdown(wait=True)
+
+
+_active_prefetcher: Optional[FilePrefetcher] = None
+
+
+@contextmanager
+def prefetch_files(paths: list[PathLike], max_workers: int = 8, max_pending: Optional[int] = None):
+    """
+    Activate a FilePrefetcher for get_json_from_file() within the context
+    :param paths: The files that will be loaded, in the order they will be loaded
+    :param max_workers: The number of reader threads
+    :param max_pending: The maximum number of files read ahead of the parser
+    """
+    global _active_prefetcher
+    prefetcher = FilePrefetcher(paths, max_workers, max_pending)
+    previous = _active_prefetcher
+    _active_prefetcher = prefetcher
+    try:
+        yield prefetcher
+    finally:
+        _active_prefetcher = previous
+        prefetcher.close()
+
+
+# ---------------------------------
+# Instrumentation
+# Opt-in timing and allocation figures for loads, see profile_load().
+# When no profiler is active the hooks cost a single global lookup.
+# ---------------------------------
+
+@dataclass
+class ProfileSpan:
+    name: str
+    category: str  # "total", "stage" or "brand"
+    start: float  # Seconds since the profiler started
+    wall: float = 0.0  # Seconds
+    files: int = 0  # JSON files loaded
+    bytes_read: int = 0
+    read_time: float = 0.0  # Seconds spent reading files (or waiting for the prefetcher)
+    decode_time: float = 0.0  # Seconds spent parsing JSON
+    validate_time: float = 0.0  # Seconds spent in schema validation
+    peak_memory: Optional[int] = None  # Peak traced bytes above the traced bytes at the start of the span
+    _start_memory: int = field(default=0, repr=False)
+
+    @property
+    def construct_time(self) -> float:
+        """Seconds not spent reading, decoding or validating: object construction, resolving and bookkeeping"""
+        return max(0.0, self.wall - self.read_time - self.decode_time - self.validate_time)
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "name": self.name,
+            "category": self.category,
+            "start": round(self.start, 6),
+            "wall": round(self.wall, 6),
+            "files": self.files,
+            "bytes_read": self.bytes_read,
+            "read_time": round(self.read_time, 6),
+            "decode_time": round(self.decode_time, 6),
+            "validate_time": round(self.validate_time, 6),
+            "construct_time": round(self.construct_time, 6),
+            "peak_memory": self.peak_memory
+        }
+
+
+class LoadProfiler:
+    """
+    Collects ProfileSpans for the stages of a load and for every brand
+    Counters are added to every open span, so a brand's figures are also part of its stage's and the total's.
+    :param trace_memory: Record tracemalloc peaks per span. This slows loading down considerably.
+    """
+
+    def __init__(self, trace_memory=False):
+        self.trace_memory = trace_memory
+        self.spans: list[ProfileSpan] = []
+        self.total = ProfileSpan("total", "total", 0.0)
+        self._open: list[ProfileSpan] = [self.total]
+        self._origin = time.perf_counter()
+
+    @contextmanager
+    def span(self, name: str, category="stage"):
+        span = ProfileSpan(name, category, time.perf_counter() - self._origin)
+        self.spans.append(span)
+        if self.trace_memory:
+            self._fold_peak()
+            tracemalloc.reset_peak()
+            span._start_memory = tracemalloc.get_traced_memory()[0]
+        self._open.append(span)
+        try:
+            yield span
+        finally:
+            span.wall = time.perf_counter() - self._origin - span.start
+            if self.trace_memory:
+                self._fold_peak()
+            self._open.pop()
+
+    def _fold_peak(self):
+        """Fold the current tracemalloc peak into the open spans, before it is reset for a nested span"""
+        peak = tracemalloc.get_traced_memory()[1]
+        for span in self._open:
+            span.peak_memory = max(span.peak_memory or 0, peak - span._start_memory)
+
+    def add(self, files=0, bytes_read=0, read_time=0.0, decode_time=0.0, validate_time=0.0):
+        for span in self._open:
+            span.files += files
+            span.bytes_read += bytes_read
+            span.read_time += read_time
+            span.decode_time += decode_time
+            span.validate_time += validate_time
+
+    def _start(self):
+        if self.trace_memory:
+            self._started_tracemalloc = not tracemalloc.is_tracing()
+            if self._started_tracemalloc:
+                tracemalloc.start()
+            tracemalloc.reset_peak()
+            self.total._start_memory = tracemalloc.get_traced_memory()[0]
+        self._origin = time.perf_counter()
+
+    def _stop(self):
+        self.total.wall = time.perf_counter() - self._origin
+        if self.trace_memory:
+            self._fold_peak()
+            if self._started_tracemalloc:
+                tracemalloc.stop()
+
+    # Export
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "total": self.total.to_dict(),
+            "stages": [x.to_dict() for x in self.spans if x.category == "stage"],
+            "brands": [x.to_dict() for x in self.spans if x.category == "brand"]
+        }
+
+    def to_chrome_trace(self) -> dict[str, Any]:
+        """Returns the spans in the Chrome trace event format (chrome://tracing, Perfetto)"""
+        events = []
+        for span in [self.total] + self.spans:
+            args = span.to_dict()
+            for k in ("name", "category", "start", "wall"):
+                del args[k]
+            events.append({
+                "name": span.name,
+                "cat": span.category,
+                "ph": "X",
+                "ts": round(span.start * 1e6, 3),
+                "dur": round(span.wall * 1e6, 3),
+                "pid": os.getpid(),
+                "tid": 1,
+                "args": args
+            })
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def save(self, path: PathLike, trace_format="json"):
+        """
+        Write the figures to a file
+        :param trace_format: "json" for to_dict() or "chrome" for to_chrome_trace()
+        """
+        data = self.to_chrome_trace() if trace_format == "chrome" else self.to_dict()
+        with open(path, mode="w", encoding="utf8") as f:
+            json_codec.dump(data, f, indent=4)
+
+    def summary(self, top_brands=10) -> str:
+        """Returns a table of the stages and the slowest brands"""
+        columns = "{:<32} {:>9} {:>7} {:>10} {:>9} {:>9} {:>9} {:>9} {:>10}"
+        lines = [columns.format("span", "wall", "files", "KiB", "read", "decode", "validate", "construct", "peak KiB")]
+        brands = sorted((x for x in self.spans if x.category == "brand"), key=lambda x: x.wall, reverse=True)
+        for span in [self.total] + [x for x in self.spans if x.category == "stage"] + brands[:top_brands]:
+            name = span.name if span.category != "brand" else f"  {span.name}"
+            lines.append(columns.format(
+                name[:32], f"{span.wall:.3f}", span.files, span.bytes_read // 1024, f"{span.read_time:.3f}",
+                f"{span.decode_time:.3f}", f"{span.validate_time:.3f}", f"{span.construct_time:.3f}",
+                "-" if span.peak_memory is None else span.peak_memory // 1024))
+        return "\n".join(lines)
+
+
+_active_profiler: Optional[LoadProfiler] = None
+
+
+@contextmanager
+def profile_load(trace_memory=False):
+    """
+    Activate a LoadProfiler within the context
+    Loads within the context record their stages (load_stores, load_brands) and brands
+    :param trace_memory: Record tracemalloc peaks, see LoadProfiler
+    """
+    global _active_profiler
+    profiler = LoadProfiler(trace_memory)
+    previous = _active_profiler
+    _active_profiler = profiler
+    profiler._start()
+    try:
+        yield profiler
+    finally:
+        profiler._stop()
+        _active_profiler = previous
+
+
+def profile_span(name: str, category="stage"):
+    """Returns a span of the active profiler, or a no-op context if there is none"""
+    if _active_profiler is None:
+        return nullcontext()
+    return _active_profiler.span(name, category)
+
+
+# Compiled schema validators, keyed by the id of the schema dict
+# The schema is stored alongside its validator so the id can't be reused by a different dict
+_schema_validators: dict[int, tuple[dict, Any]] = {}
+
+
+def get_schema_validator(schema: dict):
+    """
+    Returns a compiled validator for the schema
+    The schema is checked and compiled once, later calls reuse the cached validator
+    """
+    cached = _schema_validators.get(id(schema))
+    if cached is not None and cached[0] is schema:
+        return cached[1]
+    cls = validator_for(schema)
+    cls.check_schema(schema)
+    validator = cls(schema)
+    _schema_validators[id(schema)] = (schema, validator)
+    return validator
+
+
 def validate_json(json_data, schema) -> bool:
     """
     Validate the json data with the provided schema
     If valid, returns true.
     If not valid, returns false and emits an error message
     """
-    try:
-        validate(json_data, schema)
+    profiler = _active_profiler
+    if profiler is not None:
+        start = time.perf_counter()
+    error: Optional[ValidationError] = best_match(get_schema_validator(schema).iter_errors(json_data))
+    if profiler is not None:
+        profiler.add(validate_time=time.perf_counter() - start)
+    if error is None:
         return True
-    except ValidationError as error:
-        print(
-            f"Failed to validate json. JSON path: {error.json_path}, Error: {error.message}, JSON file: {last_json_file_loaded}")
-        return False
+    print(
+        f"Failed to validate json. JSON path: {error.json_path}, Error: {error.message}, JSON file: {last_json_file_loaded}")
+    return False
+
+
+# ---------------------------------
+# Content Hashes
+# ---------------------------------
+
+# Bump this if the hashing scheme changes so stale manifests are not trusted
+HASH_MANIFEST_VERSION = 2
+# The node kinds that are recorded in the hash manifest
+HASH_MANIFEST_KINDS = ("store", "brand", "material", "filament", "variant")
+
+
+def canonical_json(data: Any) -> str:
+    """Serialize data in a stable form (sorted keys, no whitespace) so equal data always hashes equally"""
+    return json_codec.dumps(data, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+
+
+def merkle_hash(fields: dict[str, Any], children: dict[str, str]) -> str:
+    """
+    Hash a node of the data tree
+    :param fields: The node's own data (without its children)
+    :param children: The hashes of the node's children, keyed by their entity path segment
+    :returns The hex sha256 of the canonical JSON of the fields followed by the sorted child hashes
+    """
+    h = hashlib.sha256()
+    h.update(canonical_json(fields).encode("utf8"))
+    for segment in sorted(children):
+        h.update(b"\0")
+        h.update(segment.encode("utf8"))
+        h.update(b"\0")
+        h.update(children[segment].encode("ascii"))
+    return h.hexdigest()
+
+
+def entity_segment(kind: str, key: str) -> str:
+    """Returns a single segment of an entity path, e.g. "brand:Prusament" """
+    return f"{kind}:{key}"
+
+
+def unique_key(base: str, used: set[str]) -> str:
+    """Returns base, or base with an occurrence suffix ("#1", "#2", ...) if it was already used"""
+    key = base
+    n = 1
+    while key in used:
+        key = f"{base}#{n}"
+        n += 1
+    used.add(key)
+    return key
+
+
+# The fields telling apart sizes of the same weight and diameter, in order of preference (see size_key())
+SIZE_TIE_BREAK_FIELDS = ("gtin", "ean", "article_number")
+
+
+def size_key(size_data: dict[str, Any], used: set[str]) -> str:
+    """
+    Sizes have no id, so they are keyed by weight and diameter
+    Further sizes of the same weight and diameter are keyed by their GTIN/EAN or article number (e.g.
+    "1000g@1.75mm#gtin:5903175652195"), by occurrence only if they have none of them
+    """
+    base = f"{size_data.get('filament_weight')}g@{size_data.get('diameter')}mm"
+    if base in used:
+        for name in SIZE_TIE_BREAK_FIELDS:
+            value = size_data.get(name)
+            key = f"{base}#{name}:{value}"
+            if isinstance(value, str) and value and key not in used:
+                used.add(key)
+                return key
+    return unique_key(base, used)
+
+
+def purchase_link_key(link_data: dict[str, Any], used: set[str]) -> str:
+    """Purchase links are keyed by their store id"""
+    return unique_key(str(link_data.get("store_id")), used)
+
+
+def named_children(kind: str, children: list, get_name) -> list[tuple[str, Any]]:
+    """Returns (entity path segment, child) pairs for children keyed by their cleansed folder name"""
+    used: set[str] = set()
+    return [(entity_segment(kind, unique_key(cleanse_folder_name(get_name(x)), used)), x) for x in children]
 
 
 # These will be inited at the end of the file
@@ -86,17 +567,37 @@ MATERIAL_SCHEMA: dict
 FILAMENT_SCHEMA: dict
 VARIANT_SCHEMA: dict
 SIZE_SCHEMA: dict
+MATERIAL_AIO_SCHEMA: dict
 
 
 # ---------------------------------
 # Interfaces
 # ---------------------------------
 
+# The dirty fields of a clean object, shared by all of them
+_NO_FIELDS: frozenset[str] = frozenset()
+
+
 class IToFromJSONData:
     """
     An interface that defines the required methods for storing and retrieving from json data
     """
 
+    # The entity kind used in entity paths and content hashes (see entity_segment())
+    hash_kind: str = ""
+
+    # Dirty tracking
+    # Assigning a public attribute marks it as dirty. New objects start out with every attribute dirty (None) and
+    # are marked clean once they are loaded from or saved to a folder. Adding/removing items of list or dict
+    # attributes is detected by comparing them to a snapshot taken when the object was marked clean.
+    _dirty_fields: Optional[frozenset[str]] = None
+    _clean_snapshot: Optional[dict[str, tuple]] = None
+
+    def __setattr__(self, key: str, value):
+        object.__setattr__(self, key, value)
+        if not key.startswith("_") and self._dirty_fields is not None and key not in self._dirty_fields:
+            object.__setattr__(self, "_dirty_fields", self._dirty_fields | {key})
+
     def to_dict(self) -> dict:
         """
         :returns: The object as a dict
@@ -107,28 +608,201 @@ class IToFromJSONData:
     def from_json_data(json_data: dict[str, Any], parent):
         ...
 
+    def _public_values(self, fields: Optional[Collection[str]] = None):
+        if fields is None:
+            return self.public_dict().items()
+        return [(k, self.__dict__[k]) for k in fields if k in self.__dict__]
+
+    def public_dict(self) -> dict[str, Any]:
+        """Returns the instance attributes without private/bookkeeping ones (e.g. dirty tracking state)"""
+        return {k: v for k, v in self.__dict__.items() if not k.startswith("_")}
+
+    def _collection_snapshot(self, fields: Optional[Collection[str]] = None) -> Optional[dict[str, tuple]]:
+        snapshot = {}
+        for k, v in self._public_values(fields):
+            # Empty collections are left out, a missing entry and an empty one compare the same
+            if not v:
+                continue
+            if isinstance(v, list):
+                snapshot[k] = tuple(id(x) for x in v)
+            elif isinstance(v, dict):
+                snapshot[k] = tuple((x, id(y)) for x, y in v.items())
+        # Most objects have no (non-empty) collections, don't keep an empty dict around for each of them
+        return snapshot or None
+
+    def _tracked_values(self, fields: Optional[Collection[str]] = None) -> list['IToFromJSONData']:
+        """Returns the nested objects that are serialized as part of this object's file(s)"""
+        tracked = []
+        for _, v in self._public_values(fields):
+            for item in (v if isinstance(v, list) else (v,)):
+                if isinstance(item, IToFromJSONData) and not isinstance(item, IToFromFS):
+                    tracked.append(item)
+        return tracked
+
+    def is_dirty(self, fields: Optional[Collection[str]] = None) -> bool:
+        """
+        Returns True if anything serialized by this object changed since it was marked clean
+        :param fields: Only check these attributes (and the objects nested in them)
+        """
+        if self._dirty_fields is None:
+            return True
+        if fields is None:
+            if self._dirty_fields or self._clean_snapshot != self._collection_snapshot():
+                return True
+        else:
+            if not self._dirty_fields.isdisjoint(fields):
+                return True
+            clean_snapshot = {k: v for k, v in (self._clean_snapshot or {}).items() if k in fields}
+            if clean_snapshot != (self._collection_snapshot(fields) or {}):
+                return True
+        return any(x.is_dirty() for x in self._tracked_values(fields))
+
+    def mark_clean(self):
+        """Mark this object and the nested objects serialized with it as unchanged"""
+        for x in self._tracked_values():
+            x.mark_clean()
+        object.__setattr__(self, "_clean_snapshot", self._collection_snapshot())
+        object.__setattr__(self, "_dirty_fields", _NO_FIELDS)
+
+    def hash_fields(self) -> dict[str, Any]:
+        """Returns the data of this node that is covered by its own hash (children excluded)"""
+        return self.to_dict()
+
+    def hash_children(self) -> list[tuple[str, 'IToFromJSONData']]:
+        """Returns the child nodes as (entity path segment, child) pairs"""
+        return []
+
+    def content_hash(self, path: str = "", record: Optional[dict[str, str]] = None) -> str:
+        """
+        Compute the Merkle hash of this node
+        The hash covers the canonical JSON of the node and the hashes of all of its children
+        :param path: The entity path of this node, only needed when recording
+        :param record: If provided, the hash of this node and every descendant of a kind in HASH_MANIFEST_KINDS is stored here keyed by entity path
+        """
+        children: dict[str, str] = {}
+        for segment, child in self.hash_children():
+            child_path = f"{path}/{segment}" if path else segment
+            children[segment] = child.content_hash(child_path, record)
+        digest = merkle_hash(self.hash_fields(), children)
+        if record is not None and path and self.hash_kind in HASH_MANIFEST_KINDS:
+            record[path] = digest
+        return digest
+
 
 class IToFromFS(IToFromJSONData):
     """
     This is an interface that defines the required methods for storing and retrieving from a folder based structure
     """
 
+    # The folder (or AIO file) this object was last loaded from or saved to, while it was clean
+    _saved_folder: Optional[str] = None
+    # The attributes holding the child objects stored in sub folders, they are not part of this object's files
+    _child_fields: tuple[str, ...] = ()
+
     def to_json_file(self, parent_folder: PathLike):
         """
         Saves this object as a json file
+        The file is only written if its contents changed
         :param parent_folder: The folder where the json file should be stored
         """
         path = Path(parent_folder)
         if not path.is_dir():
             print(f"The provided path is not a folder: {path.__str__()}")
             return
-        with path.joinpath(f"{self._file_name()}.json").open("w") as f:
-            json.dump(self.to_dict(), f, indent=4)
+        write_file_if_changed(path.joinpath(f"{self._file_name()}.json"), data_json_bytes(self.to_dict()))
 
-    def to_folder(self, parent_folder: PathLike):
-        """Creates a folder within the parent folder and store the json file within it"""
+    def to_folder(self, parent_folder: PathLike, max_workers: Optional[int] = None) -> int:
+        """
+        Creates a folder within the parent folder and store the json file within it
+        Files whose data was not changed since the object was loaded from/saved to the same folder are skipped,
+        all other files are only written if their contents differ. Writes are atomic and run in a thread pool.
+        :param parent_folder: The folder to store this object's folder in
+        :param max_workers: The number of writer threads
+        :returns The number of files that were written
+        """
+        path = Path(parent_folder)
+        if not path.exists() or not path.is_dir():
+            print(f"The provided path is not a folder: {path.__str__()}")
+            return 0
+        writes: list[tuple[Path, bytes]] = []
+        saved: list[Callable[[], None]] = []
+        self._collect_writes(path, writes, saved)
+        written = write_files(writes, max_workers)
+        # Objects are only marked clean once all files were written, if a write fails they are written again next time
+        for mark_saved in saved:
+            mark_saved()
+        return written
+
+    def _folder_name(self) -> str:
+        """Returns the name of the folder this object is stored in"""
         ...
 
+    def _file_fields(self) -> tuple[str, ...]:
+        """Returns the attributes stored in this object's json file"""
+        return tuple(k for k in self.__dict__ if not k.startswith("_") and k not in self._child_fields)
+
+    def _json_files(self) -> list[tuple[str, tuple[str, ...]]]:
+        """Returns the (file name, attributes stored in it) pairs of the files in this object's folder"""
+        return [(f"{self._file_name()}.json", self._file_fields())]
+
+    def _json_file_data(self, file_name: str) -> Any:
+        """Returns the json data of one of the files of _json_files()"""
+        return self.to_dict()
+
+    def _normalize_json_file(self, file_name: str, json_data: Any) -> Any:
+        """Returns what _json_file_data() would return after loading the json data of one of the files of _json_files()"""
+        return self.from_json_data(json_data, None).to_dict()
+
+    def _same_as_file(self, path: Path, file_name: str, json_data: Any) -> bool:
+        """
+        Returns True if the file at path already holds json_data, only formatted differently (e.g. lower case color hex
+        or an indentation of 4). Such files are kept as they are, so saving an object without real edits changes nothing.
+        """
+        data = _read_bytes(path)
+        if data is None:
+            return False
+        try:
+            return self._normalize_json_file(file_name, json_codec.loads(data)) == json_data
+        except Exception:
+            # Anything that doesn't load (invalid JSON, missing keys, a failed validation, ...) is overwritten
+            return False
+
+    def _child_nodes(self) -> list['IToFromFS']:
+        """Returns the child objects stored in sub folders of this object's folder"""
+        return []
+
+    def _iter_tree(self) -> Iterator['IToFromFS']:
+        """Yields this object and all of its descendants"""
+        yield self
+        for child in self._child_nodes():
+            yield from child._iter_tree()
+
+    def _collect_writes(self, parent_folder: Path, writes: list[tuple[Path, bytes]],
+                        saved: list[Callable[[], None]]):
+        """
+        Add the (path, data) of the files of this object and its descendants that have to be written to writes,
+        and the calls that mark them as saved once the files were written to saved
+        Every file is checked on its own, e.g. changing a size of a variant only rewrites its sizes.json
+        """
+        path = parent_folder.joinpath(cleanse_folder_name(self._folder_name()))
+        moved = self._saved_folder != os.path.abspath(path)
+        files = [file_name for file_name, fields in self._json_files() if moved or self.is_dirty(fields)]
+        for file_name in files:
+            file_path = path.joinpath(file_name)
+            json_data = self._json_file_data(file_name)
+            if not self._same_as_file(file_path, file_name, json_data):
+                writes.append((file_path, data_json_bytes(json_data)))
+        # Adding/removing children changes no file of this object, but it has to be marked clean again
+        if files or (self._child_fields and self.is_dirty(self._child_fields)):
+            saved.append(lambda: self.mark_saved(path))
+        for child in self._child_nodes():
+            child._collect_writes(path, writes, saved)
+
+    def mark_saved(self, folder_path: PathLike):
+        """Mark this object as clean and in sync with the files in folder_path"""
+        self.mark_clean()
+        object.__setattr__(self, "_saved_folder", os.path.abspath(folder_path))
+
     @classmethod
     def from_json_file(cls, json_file_path: PathLike, parent) -> Optional[Self]:
         """Returns an instance of the class from a JSON file"""
@@ -166,6 +840,8 @@ class IToFromFS(IToFromJSONData):
 # ---------------------------------
 
 class Store(IToFromJSONData):
+    hash_kind = "store"
+
     store_id: str
     name: str
     storefront_url: str
@@ -187,13 +863,13 @@ class Store(IToFromJSONData):
         if ships_to is None:
             ships_to = []
 
-        self.store_id = store_id
+        self.store_id = sys.intern(store_id) if isinstance(store_id, str) else store_id
         self.name = name
         self.storefront_url = storefront_url
         self.logo = logo
         self.storefront_affiliate_link = storefront_affiliate_link
-        self.ships_from = ships_from
-        self.ships_to = ships_to
+        self.ships_from = intern_strings(ships_from)
+        self.ships_to = intern_strings(ships_to)
 
     def to_dict(self):
         return shallow_remove_empty({
@@ -228,23 +904,47 @@ stores: dict[str, Store]
 
 def load_stores():
     global stores
-    stores = {}
-    stores_dir = Path("stores")
-    for item in stores_dir.iterdir():
+    with profile_span("load_stores"):
+        stores = load_store_folders("stores")
+
+
+def load_store_folders(stores_dir: PathLike, folders: Optional[dict[str, str]] = None) -> dict[str, Store]:
+    """
+    Returns the stores of every store folder within stores_dir keyed by store id
+    :param folders: If provided, the store id of each loaded store folder is stored here keyed by the folder's absolute path
+    """
+    ret: dict[str, Store] = {}
+    for item in Path(stores_dir).iterdir():
         store_file = item.joinpath("store.json")
         if not item.is_dir() or not store_file.exists():
             continue
-
-        # Verify the schema
-        json_data = get_json_from_file(store_file)
-        if not validate_json(json_data, STORE_SCHEMA):
-            # An error msg will be emitted by the validate function if there is an error
+        store = load_store_file(store_file)
+        if store is None:
             continue
-        store = Store.from_json_data(json_data)
-        if stores.__contains__(store.store_id):
+        if ret.__contains__(store.store_id):
             print(f"There were multiple stores with the same store ID: {store.store_id}")
             continue
-        stores[store.store_id] = store
+        ret[store.store_id] = store
+        if folders is not None:
+            folders[os.path.abspath(item)] = store.store_id
+    return ret
+
+
+def load_store_file(store_file: PathLike) -> Optional[Store]:
+    # Verify the schema
+    json_data = get_json_from_file(store_file)
+    if not validate_json(json_data, STORE_SCHEMA):
+        # An error msg will be emitted by the validate function if there is an error
+        return None
+    return Store.from_json_data(json_data)
+
+
+def linked_stores(sizes: Iterable['FilamentSize']) -> dict[str, Store]:
+    """
+    Returns the stores the purchase links of sizes link to, keyed by store id
+    Enough to load the sizes again, e.g. to compare them to a file. A link to any other store is a change anyway.
+    """
+    return {link.store.store_id: link.store for size in sizes for link in size.purchase_links}
 
 
 def save_stores(parent_folder: PathLike):
@@ -253,10 +953,7 @@ def save_stores(parent_folder: PathLike):
         print(f"The provided path is not a folder: {path.__str__()}")
         return
     for store_id, store_data in stores.items():
-        store_path = path.joinpath(store_id)
-        store_path.mkdir(exist_ok=True)
-        with store_path.joinpath("store.json").open("w") as f:
-            json.dump(store_data.to_dict(), f, indent=4)
+        write_file_if_changed(path.joinpath(store_id, "store.json"), data_json_bytes(store_data.to_dict()))
 
 
 # ---------------------------------
@@ -264,6 +961,8 @@ def save_stores(parent_folder: PathLike):
 # ---------------------------------
 
 class SizePurchaseLink(IToFromJSONData):
+    hash_kind = "purchase_link"
+
     store: Store  # Required
     url: str  # Required
     affiliate: bool  # Required
@@ -277,18 +976,22 @@ class SizePurchaseLink(IToFromJSONData):
                  affiliate=False,
                  spool_refill=False,
                  ships_from: list[str] = None,
-                 ships_to: list[str] = None):
+                 ships_to: list[str] = None,
+                 store_map: Optional[dict[str, Store]] = None):
+        """
+        :param store_map: The stores to look the store id up in, defaults to the loaded stores
+        """
         if ships_from is None:
             ships_from = []
         if ships_to is None:
             ships_to = []
 
-        self.store = stores[store_id]
+        self.store = (stores if store_map is None else store_map)[store_id]
         self.url = url
         self.affiliate = affiliate
         self.spool_refill = spool_refill
-        self.ships_from = ships_from
-        self.ships_to = ships_to
+        self.ships_from = intern_strings(ships_from)
+        self.ships_to = intern_strings(ships_to)
 
     def get_ships_from(self):
         """
@@ -321,18 +1024,22 @@ class SizePurchaseLink(IToFromJSONData):
         })
 
     @staticmethod
-    def from_json_data(json_data: dict[str, Any], parent: None = None) -> 'SizePurchaseLink':
+    def from_json_data(json_data: dict[str, Any], parent: None = None,
+                       store_map: Optional[dict[str, Store]] = None) -> 'SizePurchaseLink':
         return SizePurchaseLink(
             store_id=json_data["store_id"],
             url=json_data["url"],
             affiliate=json_data["affiliate"],
             spool_refill=json_data.get("spool_refill", False),
             ships_from=json_data.get("ships_from", []),
-            ships_to=json_data.get("ships_to", [])
+            ships_to=json_data.get("ships_to", []),
+            store_map=store_map
         )
 
 
 class FilamentSize(IToFromJSONData):
+    hash_kind = "size"
+
     filament_weight: float  # Required
     diameter: float  # Required
     empty_spool_weight: Optional[float]
@@ -366,29 +1073,8 @@ class FilamentSize(IToFromJSONData):
         self.diameter = diameter
         self.empty_spool_weight = empty_spool_weight
         self.spool_core_diameter = spool_core_diameter
-        # Normalize and validate GTIN/EAN per rules
-        gtin = gtin.strip() if isinstance(gtin, str) else gtin
-        ean = ean.strip() if isinstance(ean, str) else ean
-
-        gtin_pattern = re.compile(r"^[0-9]{12,13}$")
-        ean_pattern = re.compile(r"^[0-9]{13}$")
-
-        # Input normalization
-        if (not gtin) and ean and ean_pattern.fullmatch(ean):
-            gtin = ean
-        if gtin and (not ean) and len(gtin) == 13:
-            ean = gtin
-
-        # Validation rules
-        if gtin is not None:
-            if not gtin_pattern.fullmatch(gtin):
-                raise Exception("Invalid gtin: must be 12 or 13 digits only")
-        if ean is not None:
-            if not ean_pattern.fullmatch(ean):
-                raise Exception("Invalid ean: must be exactly 13 digits")
-        if gtin and ean:
-            if len(gtin) == 13 and len(ean) == 13 and gtin != ean:
-                raise Exception("Mismatch between gtin and ean (both 13 digits); they must match")
+        # Normalize and validate GTIN/EAN per rules, check digits are checked in batches (see identifier_issues())
+        gtin, ean = normalize_gtin_ean(gtin, ean)
 
         self.gtin = gtin
         self.ean = ean
@@ -420,11 +1106,24 @@ class FilamentSize(IToFromJSONData):
             "purchase_links": [x.to_dict() for x in self.purchase_links]
         })
 
+    def hash_fields(self):
+        data = self.to_dict()
+        data.pop("purchase_links", None)
+        return data
+
+    def hash_children(self):
+        used: set[str] = set()
+        return [(entity_segment(x.hash_kind, purchase_link_key(x.to_dict(), used)), x) for x in self.purchase_links]
+
     @staticmethod
-    def from_json_data(json_data: dict[str, Any], parent: None = None) -> 'FilamentSize':
+    def from_json_data(json_data: dict[str, Any], parent: None = None,
+                       store_map: Optional[dict[str, Store]] = None) -> 'FilamentSize':
+        """
+        :param store_map: The stores of the purchase links, defaults to the loaded stores
+        """
         purchase_links = []
         for data in json_data.get("purchase_links", []):
-            purchase_links.append(SizePurchaseLink.from_json_data(data))
+            purchase_links.append(SizePurchaseLink.from_json_data(data, store_map=store_map))
 
         return FilamentSize(
             filament_weight=json_data["filament_weight"],
@@ -469,7 +1168,7 @@ class VariantTraits(IToFromJSONData):
         self.biodegradable = biodegradable
 
     def to_dict(self):
-        return shallow_remove_empty(self.__dict__)
+        return shallow_remove_empty(self.public_dict())
 
     @staticmethod
     def from_json_data(json_data: Optional[dict[str, Any]], parent: None = None) -> 'VariantTraits':
@@ -506,7 +1205,7 @@ class ColorStandards(IToFromJSONData):
         self.munsell = munsell
 
     def to_dict(self):
-        return shallow_remove_empty(self.__dict__)
+        return shallow_remove_empty(self.public_dict())
 
     @staticmethod
     def from_json_data(json_data: dict[str, Any], parent: None = None) -> Optional['ColorStandards']:
@@ -521,6 +1220,10 @@ class ColorStandards(IToFromJSONData):
 
 
 class FilamentVariant(IToFromFS):
+    hash_kind = "variant"
+    # The sizes are stored in sizes.json, not in sub folders
+    _child_fields = ("sizes",)
+
     __parent: 'Filament'
 
     color_name: str  # Required
@@ -579,27 +1282,36 @@ class FilamentVariant(IToFromFS):
             "traits": self.traits.to_dict()
         })
 
-    def __sizes_to_json_file(self, parent_folder: PathLike):
-        path = Path(parent_folder)
-        if not path.is_dir():
-            print(f"The provided path is not a folder: {path.__str__()}")
-            return
-        with path.joinpath("sizes.json").open("w") as f:
-            json.dump([x.to_dict() for x in self.sizes], f, indent=4)
+    def hash_children(self):
+        used: set[str] = set()
+        return [(entity_segment(x.hash_kind, size_key(x.to_dict(), used)), x) for x in self.sizes]
 
-    def to_folder(self, parent_folder: PathLike):
-        path = Path(parent_folder)
-        if not path.exists() or not path.is_dir():
-            print(f"The provided path is not a folder: {path.__str__()}")
-            return
-        path = path.joinpath(cleanse_folder_name(self.color_name))
-        path.mkdir(parents=True, exist_ok=True)
-        self.to_json_file(path)
-        self.__sizes_to_json_file(path)
+    def _folder_name(self):
+        return self.color_name
+
+    def _json_files(self):
+        return [("variant.json", self._file_fields()), ("sizes.json", ("sizes",))]
+
+    def _json_file_data(self, file_name: str):
+        if file_name == "sizes.json":
+            return [x.to_dict() for x in self.sizes]
+        return self.to_dict()
+
+    def _normalize_json_file(self, file_name: str, json_data):
+        if file_name == "sizes.json":
+            store_map = linked_stores(self.sizes)
+            return [FilamentSize.from_json_data(x, store_map=store_map).to_dict() for x in json_data]
+        return super()._normalize_json_file(file_name, json_data)
+
+    def to_aio_dict(self):
+        """Returns variant.json with the sizes embedded, as stored in AIO material files"""
+        data = self.to_dict()
+        data["sizes"] = [x.to_dict() for x in self.sizes]
+        return data
 
     @staticmethod
-    def from_json_data(json_data: dict[str, Any], parent: 'Filament') -> Optional['FilamentVariant']:
-        if not validate_json(json_data, VARIANT_SCHEMA):
+    def from_json_data(json_data: dict[str, Any], parent: 'Filament', validate=True) -> Optional['FilamentVariant']:
+        if validate and not validate_json(json_data, VARIANT_SCHEMA):
             # An error msg will be emitted by the validate function if there is an error
             return None
 
@@ -613,27 +1325,30 @@ class FilamentVariant(IToFromFS):
         )
 
     @staticmethod
-    def __sizes_from_folder(folder_path: PathLike) -> Optional[list[FilamentSize]]:
+    def _sizes_from_folder(folder_path: PathLike,
+                           store_map: Optional[dict[str, Store]] = None) -> Optional[list[FilamentSize]]:
         json_data = get_json_from_file(f"{folder_path}/sizes.json")
         if not validate_json(json_data, SIZE_SCHEMA):
             # An error msg will be emitted by the validate function if there is an error
             return None
         if not isinstance(json_data, list):
             return None
-        return [FilamentSize.from_json_data(x) for x in json_data]
+        return [FilamentSize.from_json_data(x, store_map=store_map) for x in json_data]
 
     @classmethod
-    def from_folder(cls, folder_path: PathLike, parent: 'Filament') -> Optional['FilamentVariant']:
+    def from_folder(cls, folder_path: PathLike, parent: 'Filament',
+                    store_map: Optional[dict[str, Store]] = None) -> Optional['FilamentVariant']:
         variant = super().from_folder(folder_path, parent)
 
         # ensure return was not None and hint the typing system
         if not isinstance(variant, FilamentVariant): return None
 
-        variant.sizes = cls.__sizes_from_folder(folder_path)
+        variant.sizes = cls._sizes_from_folder(folder_path, store_map)
 
         if not variant.sizes:
             return None
 
+        variant.mark_saved(folder_path)
         return variant
 
 
@@ -669,7 +1384,7 @@ class GenericSlicerSettings(IToFromJSONData):
             self.nozzle_temp = other.nozzle_temp
 
     def to_dict(self):
-        return shallow_remove_empty(self.__dict__)
+        return shallow_remove_empty(self.public_dict())
 
     @staticmethod
     def from_json_data(json_data: Optional[dict[str, Any]], parent: None = None) -> Optional['GenericSlicerSettings']:
@@ -833,7 +1548,7 @@ class SlicerSettings(IToFromJSONData):
                     this_var.update(other_var)
 
     def to_dict(self):
-        return {k: v.to_dict() for k, v in self.__dict__.items() if v is not None}
+        return {k: v.to_dict() for k, v in self.public_dict().items() if v is not None}
 
     @staticmethod
     def from_json_data(json_data: Optional[dict[str, Any]], parent: None = None):
@@ -872,7 +1587,7 @@ class SlicerIDs(IToFromJSONData):
         self.cura = cura
 
     def to_dict(self):
-        return shallow_remove_empty(self.__dict__)
+        return shallow_remove_empty(self.public_dict())
 
     @staticmethod
     def from_json_data(json_data: dict[str, Any], parent: None = None) -> 'SlicerIDs':
@@ -888,6 +1603,9 @@ class SlicerIDs(IToFromJSONData):
 
 
 class Filament(IToFromFS):
+    hash_kind = "filament"
+    _child_fields = ("variants",)
+
     __parent: 'Material'
 
     name: str  # Required
@@ -977,20 +1695,24 @@ class Filament(IToFromFS):
             "slicer_settings": self.slicer_settings.to_dict() if self.slicer_settings else None
         })
 
-    def to_folder(self, parent_folder: PathLike):
-        path = Path(parent_folder)
-        if not path.exists() or not path.is_dir():
-            print(f"The provided path is not a folder: {path.__str__()}")
-            return
-        path = path.joinpath(cleanse_folder_name(self.name))
-        path.mkdir(parents=True, exist_ok=True)
-        self.to_json_file(path)
-        for variant in self.variants:
-            variant.to_folder(path)
+    def hash_children(self):
+        return named_children(FilamentVariant.hash_kind, self.variants, lambda x: x.color_name)
+
+    def _folder_name(self):
+        return self.name
+
+    def _child_nodes(self):
+        return self.variants
+
+    def to_aio_dict(self):
+        """Returns filament.json with the variants embedded, as stored in AIO material files"""
+        data = self.to_dict()
+        data["variants"] = [x.to_aio_dict() for x in self.variants]
+        return data
 
     @staticmethod
-    def from_json_data(json_data: dict[str, Any], parent: 'Material') -> Optional['Filament']:
-        if not validate_json(json_data, FILAMENT_SCHEMA):
+    def from_json_data(json_data: dict[str, Any], parent: 'Material', validate=True) -> Optional['Filament']:
+        if validate and not validate_json(json_data, FILAMENT_SCHEMA):
             # An error msg will be emitted by the validate function if there is an error
             return None
 
@@ -1008,7 +1730,8 @@ class Filament(IToFromFS):
         )
 
     @classmethod
-    def from_folder(cls, folder_path: PathLike, parent: 'Material') -> Optional['Filament']:
+    def from_folder(cls, folder_path: PathLike, parent: 'Material',
+                    store_map: Optional[dict[str, Store]] = None) -> Optional['Filament']:
         filament = super().from_folder(folder_path, parent)
 
         # ensure return was not None and hint the typing system
@@ -1018,10 +1741,11 @@ class Filament(IToFromFS):
         for entry in Path(folder_path).iterdir():
             if not entry.is_dir():
                 continue
-            variant = FilamentVariant.from_folder(entry, filament)
+            variant = FilamentVariant.from_folder(entry, filament, store_map)
             if variant is None:
                 continue
             filament.variants.append(variant)
+        filament.mark_saved(folder_path)
         return filament
 
 
@@ -1030,11 +1754,17 @@ class Filament(IToFromFS):
 # ---------------------------------
 
 class Material(IToFromFS):
+    hash_kind = "material"
+    _child_fields = ("filaments",)
+
     material_name: str  # Required
     default_max_dry_temperature: Optional[int]
     default_slicer_settings: Optional[SlicerSettings]
     filaments: list[Filament]  # Required
 
+    # True if this material is stored as an AIO file instead of a material folder
+    _aio_file: bool = False
+
     def __init__(self,
                  material_name: str,
                  default_max_dry_temperature: Optional[int] = None,
@@ -1055,20 +1785,69 @@ class Material(IToFromFS):
             "default_slicer_settings": self.default_slicer_settings.to_dict() if self.default_slicer_settings else None
         })
 
-    def to_folder(self, parent_folder: PathLike):
+    def hash_children(self):
+        return named_children(Filament.hash_kind, self.filaments, lambda x: x.name)
+
+    def _folder_name(self):
+        return self.material_name
+
+    def _child_nodes(self):
+        return self.filaments
+
+    def _aio_file_name(self) -> str:
+        return f"{cleanse_folder_name(self.material_name)}{AIO_FILE_SUFFIX}"
+
+    def to_aio_dict(self):
+        """Returns the material with all of its filaments, variants and sizes embedded (see material_aio_schema.json)"""
+        data = self.to_dict()
+        data["filaments"] = [x.to_aio_dict() for x in self.filaments]
+        return data
+
+    def to_aio_file(self, parent_folder: PathLike) -> bool:
+        """
+        Saves this material as a single AIO file within the parent (brand) folder
+        From then on to_folder() saves the material as an AIO file as well
+        The file is only written if its contents changed
+        :param parent_folder: The folder where the AIO file should be stored
+        :returns True if the file was written
+        """
         path = Path(parent_folder)
-        if not path.exists() or not path.is_dir():
+        if not path.is_dir():
             print(f"The provided path is not a folder: {path.__str__()}")
+            return False
+        file_path = path.joinpath(self._aio_file_name())
+        written = write_file_if_changed(file_path, data_json_bytes(self.to_aio_dict()))
+        self._mark_aio_saved(file_path)
+        return written
+
+    def _mark_aio_saved(self, file_path: PathLike):
+        self._aio_file = True
+        for node in self._iter_tree():
+            node.mark_saved(file_path)
+
+    def _collect_writes(self, parent_folder: Path, writes: list[tuple[Path, bytes]],
+                        saved: list[Callable[[], None]]):
+        if not self._aio_file:
+            super()._collect_writes(parent_folder, writes, saved)
             return
-        path = path.joinpath(cleanse_folder_name(self.material_name))
-        path.mkdir(parents=True, exist_ok=True)
-        self.to_json_file(path)
-        for filament in self.filaments:
-            filament.to_folder(path)
+        # The AIO file holds the whole subtree, so any change below the material rewrites it
+        path = parent_folder.joinpath(self._aio_file_name())
+        if self._saved_folder != os.path.abspath(path) or any(x.is_dirty() for x in self._iter_tree()):
+            aio_data = self.to_aio_dict()
+            if not self._same_as_file(path, path.name, aio_data):
+                writes.append((path, data_json_bytes(aio_data)))
+            saved.append(lambda: self._mark_aio_saved(path))
+
+    def _normalize_json_file(self, file_name: str, json_data):
+        if file_name == self._aio_file_name():
+            store_map = linked_stores(x for node in self._iter_tree() if isinstance(node, FilamentVariant)
+                                      for x in node.sizes or [])
+            return Material.from_aio_data(json_data, store_map).to_aio_dict()
+        return super()._normalize_json_file(file_name, json_data)
 
     @staticmethod
-    def from_json_data(json_data: dict[str, Any], parent: None = None) -> Optional['Material']:
-        if not validate_json(json_data, MATERIAL_SCHEMA):
+    def from_json_data(json_data: dict[str, Any], parent: None = None, validate=True) -> Optional['Material']:
+        if validate and not validate_json(json_data, MATERIAL_SCHEMA):
             # An error msg will be emitted by the validate function if there is an error
             return None
 
@@ -1078,8 +1857,40 @@ class Material(IToFromFS):
             default_slicer_settings=SlicerSettings.from_json_data(json_data.get("default_slicer_settings"))
         )
 
+    @staticmethod
+    def from_aio_data(json_data: dict[str, Any], store_map: Optional[dict[str, Store]] = None) -> Optional['Material']:
+        """
+        Returns a material with its filaments, variants and sizes from the contents of an AIO material file
+        :param store_map: The stores of the purchase links, defaults to the loaded stores
+        """
+        if not validate_json(json_data, MATERIAL_AIO_SCHEMA):
+            # An error msg will be emitted by the validate function if there is an error
+            return None
+
+        # The whole document was validated above, so the parts are not validated again
+        material = Material.from_json_data(json_data, validate=False)
+        for filament_data in json_data["filaments"]:
+            filament = Filament.from_json_data(filament_data, material, validate=False)
+            for variant_data in filament_data["variants"]:
+                variant = FilamentVariant.from_json_data(variant_data, filament, validate=False)
+                variant.sizes = [FilamentSize.from_json_data(x, store_map=store_map) for x in variant_data["sizes"]]
+                filament.variants.append(variant)
+            material.filaments.append(filament)
+        return material
+
+    @classmethod
+    def from_aio_file(cls, aio_file_path: PathLike, parent: None = None,
+                      store_map: Optional[dict[str, Store]] = None) -> Optional['Material']:
+        """Returns a material from an AIO material file"""
+        material = cls.from_aio_data(get_json_from_file(aio_file_path), store_map)
+        if material is None:
+            return None
+        material._mark_aio_saved(aio_file_path)
+        return material
+
     @classmethod
-    def from_folder(cls, folder_path: PathLike, parent: None = None) -> Optional['Material']:
+    def from_folder(cls, folder_path: PathLike, parent: None = None,
+                    store_map: Optional[dict[str, Store]] = None) -> Optional['Material']:
         material = super().from_folder(folder_path, None)
 
         # ensure return was not None and hint the typing system
@@ -1089,10 +1900,11 @@ class Material(IToFromFS):
         for entry in Path(folder_path).iterdir():
             if not entry.is_dir():
                 continue
-            filament = Filament.from_folder(entry, material)
+            filament = Filament.from_folder(entry, material, store_map)
             if filament is None:
                 continue
             material.filaments.append(filament)
+        material.mark_saved(folder_path)
         return material
 
 
@@ -1101,6 +1913,9 @@ class Material(IToFromFS):
 # ---------------------------------
 
 class Brand(IToFromFS):
+    hash_kind = "brand"
+    _child_fields = ("materials",)
+
     brand_name: str
     website: str
     logo: str
@@ -1130,20 +1945,18 @@ class Brand(IToFromFS):
             "origin": self.origin
         })
 
-    def to_folder(self, parent_folder: PathLike):
-        path = Path(parent_folder)
-        if not path.exists() or not path.is_dir():
-            print(f"The provided path is not a folder: {path.__str__()}")
-            return
-        path = path.joinpath(cleanse_folder_name(self.brand_name))
-        path.mkdir(parents=True, exist_ok=True)
-        self.to_json_file(path)
-        for material in self.materials:
-            material.to_folder(path)
+    def hash_children(self):
+        return named_children(Material.hash_kind, self.materials, lambda x: x.material_name)
+
+    def _folder_name(self):
+        return self.brand_name
+
+    def _child_nodes(self):
+        return self.materials
 
     @staticmethod
-    def from_json_data(json_data: dict[str, Any], parent: None = None) -> Optional['Brand']:
-        if not validate_json(json_data, BRAND_SCHEMA):
+    def from_json_data(json_data: dict[str, Any], parent: None = None, validate=True) -> Optional['Brand']:
+        if validate and not validate_json(json_data, BRAND_SCHEMA):
             # An error msg will be emitted by the validate function if there is an error
             return None
         return Brand(
@@ -1154,7 +1967,12 @@ class Brand(IToFromFS):
         )
 
     @classmethod
-    def from_folder(cls, folder_path: PathLike, parent: None = None) -> Optional['Brand']:
+    def from_folder(cls, folder_path: PathLike, parent: None = None,
+                    store_map: Optional[dict[str, Store]] = None) -> Optional['Brand']:
+        """
+        Returns the brand with all of its materials from a brand folder
+        :param store_map: The stores of the purchase links, defaults to the loaded stores
+        """
         brand = super().from_folder(folder_path, None)
 
         # ensure return was not None and hint the typing system
@@ -1164,16 +1982,1029 @@ class Brand(IToFromFS):
 
         entry: Path
         for entry in Path(folder_path).iterdir():
-            if not entry.is_dir():
+            if entry.is_dir():
+                print(f"Attempting to import {entry} as a material")
+                material = Material.from_folder(entry, store_map=store_map)
+            elif entry.name.endswith(AIO_FILE_SUFFIX):
+                print(f"Attempting to import {entry} as an AIO material")
+                material = Material.from_aio_file(entry, store_map=store_map)
+            else:
                 continue
-            print(f"Attempting to import {entry} as a material")
-            material = Material.from_folder(entry)
             if material is None:
                 continue
             brand.materials.append(material)
+        brand.mark_saved(folder_path)
         return brand
 
 
+# ---------------------------------
+# Load Brands
+# ---------------------------------
+
+# The files read at each level of a brand folder, see brand_json_files()
+LOAD_ORDER: tuple[tuple[str, ...], ...] = (
+    ("brand.json",),
+    ("material.json",),
+    ("filament.json",),
+    ("variant.json", "sizes.json")
+)
+
+
+def brand_json_files(brand_folder: PathLike) -> list[str]:
+    """Returns the JSON files of a brand folder in the order Brand.from_folder() loads them"""
+    files = []
+
+    def walk(folder: str, level: int):
+        files.extend(os.path.join(folder, x) for x in LOAD_ORDER[level])
+        if level + 1 == len(LOAD_ORDER):
+            return
+        # Same directory order as the Path.iterdir() calls in from_folder()
+        with os.scandir(folder) as it:
+            entries = [(x.path, x.is_dir()) for x in it]
+        for entry_path, is_dir in entries:
+            if is_dir:
+                walk(entry_path, level + 1)
+            elif level == 0 and entry_path.endswith(AIO_FILE_SUFFIX):
+                files.append(entry_path)
+
+    walk(str(brand_folder), 0)
+    return files
+
+
+def load_brands(data_dir: PathLike = "data", prefetch_workers: int = 0,
+                store_map: Optional[dict[str, Store]] = None) -> list[Brand]:
+    """
+    Load every brand folder within the data folder, sorted by folder name
+    Brands that fail to import are reported and skipped
+    :param data_dir: The folder containing the brand folders
+    :param prefetch_workers: If above 0, the JSON files of each brand are read ahead of the parser by this many threads
+    :param store_map: The stores of the purchase links, defaults to the loaded stores
+    """
+    with profile_span("load_brands"):
+        brand_folders = sorted((x for x in Path(data_dir).iterdir() if x.is_dir()), key=lambda x: x.name)
+        if prefetch_workers > 0:
+            files = [file for folder in brand_folders for file in brand_json_files(folder)]
+            with prefetch_files(files, prefetch_workers):
+                return _load_brand_folders(brand_folders, store_map)
+        return _load_brand_folders(brand_folders, store_map)
+
+
+def _load_brand_folders(brand_folders: list[Path], store_map: Optional[dict[str, Store]] = None) -> list[Brand]:
+    brands: list[Brand] = []
+    for folder in brand_folders:
+        try:
+            with profile_span(folder.name, "brand"):
+                brand = Brand.from_folder(folder, store_map=store_map)
+        except Exception as e:
+            print(f"Failed to import brand {folder}: {e}")
+            continue
+        if brand is not None:
+            brands.append(brand)
+    return brands
+
+
+def identifier_issues(brands: list[Brand]) -> list[tuple[str, IdentifierIssue]]:
+    """
+    Check the gtins/eans of all loaded sizes in one batch for bad check digits and duplicates across variants
+    Their format is already enforced while loading
+    :returns (entity path of the size's variant, issue) pairs
+    """
+    entries = []
+    for brand_segment, brand in named_children(Brand.hash_kind, brands, lambda x: x.brand_name):
+        for material_segment, material in brand.hash_children():
+            for filament_segment, filament in material.hash_children():
+                for variant_segment, variant in filament.hash_children():
+                    path = f"{brand_segment}/{material_segment}/{filament_segment}/{variant_segment}"
+                    entries.extend((x.gtin, x.ean, path) for x in variant.sizes)
+    return [(entries[x.index][2], x) for x in validate_identifiers(entries)]
+
+
+# ---------------------------------
+# Streaming
+# These walk the data folder without building the Brand graph.
+# Only one variant's documents are held in memory at a time.
+# ---------------------------------
+
+@dataclass(frozen=True, slots=True)
+class VariantRecord:
+    brand: str  # Brand folder name
+    material: str  # Material folder name
+    filament: str  # Filament folder name
+    path: str  # Variant folder path (for AIO materials, the path the folder would have)
+    variant: dict[str, Any]  # Contents of variant.json
+    sizes: list[dict[str, Any]]  # Contents of sizes.json
+    aio_file: Optional[str] = None  # The AIO file the variant was read from, if any
+
+
+@dataclass(frozen=True, slots=True)
+class SizeRecord:
+    brand: str  # Brand folder name
+    material: str  # Material folder name
+    filament: str  # Filament folder name
+    variant: str  # Variant folder name
+    index: int  # Index within sizes.json
+    path: str  # Path to sizes.json (or the AIO file)
+    size: dict[str, Any]  # The size entry
+
+
+def _scandir_sorted_dirs(path: PathLike) -> list[os.DirEntry]:
+    """Returns the sub folders of path sorted by name, so iteration order doesn't depend on the filesystem"""
+    try:
+        with os.scandir(path) as it:
+            return sorted((x for x in it if x.is_dir()), key=lambda x: x.name)
+    except OSError:
+        return []
+
+
+def _load_validated(json_path: str, schema: dict, validate: bool):
+    json_data = get_json_from_file(json_path)
+    if json_data is None:
+        return None
+    if validate and not validate_json(json_data, schema):
+        # An error msg will be emitted by the validate function if there is an error
+        return None
+    return json_data
+
+
+def iter_variants(data_dir: PathLike = "data", validate=True) -> Iterator[VariantRecord]:
+    """
+    Stream every variant in the data folder in a deterministic order (sorted by folder names)
+    Variants whose variant.json or sizes.json can't be loaded or fail validation are reported and skipped
+    AIO materials are streamed after the material folders of their brand, an invalid AIO file is skipped as a whole
+    :param data_dir: The folder containing the brand folders
+    :param validate: Validate variant.json and sizes.json (or AIO files) against their schemas
+    """
+    for brand_entry in _scandir_sorted_dirs(data_dir):
+        yield from _iter_folder_variants(brand_entry, validate)
+        yield from _iter_aio_variants(brand_entry, validate)
+
+
+def _iter_folder_variants(brand_entry: os.DirEntry, validate: bool) -> Iterator[VariantRecord]:
+    for material_entry in _scandir_sorted_dirs(brand_entry.path):
+        for filament_entry in _scandir_sorted_dirs(material_entry.path):
+            for variant_entry in _scandir_sorted_dirs(filament_entry.path):
+                variant_path = os.path.join(variant_entry.path, "variant.json")
+                sizes_path = os.path.join(variant_entry.path, "sizes.json")
+                if not os.path.exists(variant_path) or not os.path.exists(sizes_path):
+                    continue
+                variant_data = _load_validated(variant_path, VARIANT_SCHEMA, validate)
+                if variant_data is None:
+                    continue
+                sizes_data = _load_validated(sizes_path, SIZE_SCHEMA, validate)
+                if not isinstance(sizes_data, list):
+                    continue
+                yield VariantRecord(
+                    brand=brand_entry.name,
+                    material=material_entry.name,
+                    filament=filament_entry.name,
+                    path=variant_entry.path,
+                    variant=variant_data,
+                    sizes=sizes_data
+                )
+
+
+def _iter_aio_variants(brand_entry: os.DirEntry, validate: bool) -> Iterator[VariantRecord]:
+    with os.scandir(brand_entry.path) as it:
+        aio_files = sorted((x for x in it if x.is_file() and x.name.endswith(AIO_FILE_SUFFIX)), key=lambda x: x.name)
+    for aio_entry in aio_files:
+        aio_data = _load_validated(aio_entry.path, MATERIAL_AIO_SCHEMA, validate)
+        if not isinstance(aio_data, dict):
+            continue
+        material_name = aio_entry.name[:-len(AIO_FILE_SUFFIX)]
+        for filament_data in sorted(aio_data["filaments"], key=lambda x: cleanse_folder_name(x["name"])):
+            filament_name = cleanse_folder_name(filament_data["name"])
+            variants = filament_data["variants"]
+            for variant_data in sorted(variants, key=lambda x: cleanse_folder_name(x["color_name"])):
+                yield VariantRecord(
+                    brand=brand_entry.name,
+                    material=material_name,
+                    filament=filament_name,
+                    path=os.path.join(brand_entry.path, material_name, filament_name,
+                                      cleanse_folder_name(variant_data["color_name"])),
+                    variant={k: v for k, v in variant_data.items() if k != "sizes"},
+                    sizes=variant_data["sizes"],
+                    aio_file=aio_entry.path
+                )
+
+
+def iter_sizes(data_dir: PathLike = "data", validate=True) -> Iterator[SizeRecord]:
+    """
+    Stream every size in the data folder in a deterministic order
+    :param data_dir: The folder containing the brand folders
+    :param validate: Validate variant.json and sizes.json against their schemas
+    """
+    for record in iter_variants(data_dir, validate):
+        sizes_path = record.aio_file or os.path.join(record.path, "sizes.json")
+        variant_name = os.path.basename(record.path)
+        for idx, size in enumerate(record.sizes):
+            yield SizeRecord(
+                brand=record.brand,
+                material=record.material,
+                filament=record.filament,
+                variant=variant_name,
+                index=idx,
+                path=sizes_path,
+                size=size
+            )
+
+
+# ---------------------------------
+# AIO Conversion
+# These work on the raw JSON documents instead of the model, so every field survives the conversion.
+# Files are written in the data folder's formatting (see data_json_bytes()). Before converting, the result of
+# converting back is compared byte for byte with the source, so a round trip reproduces the original files.
+# Sources that wouldn't round trip (e.g. a trailing newline, a number written as 1.30, other files in the folder)
+# are refused, unless normalize is set to accept writing them in the data folder's formatting.
+# ---------------------------------
+
+def _load_dict(json_path: PathLike) -> Optional[dict[str, Any]]:
+    json_data = get_json_from_file(json_path)
+    return json_data if isinstance(json_data, dict) else None
+
+
+def _check_no_sub_folders(folder: PathLike) -> bool:
+    if _scandir_sorted_dirs(folder):
+        print(f"Can't convert to an AIO file, unexpected sub folder in: {folder}")
+        return False
+    return True
+
+
+def _check_folder_name(folder: PathLike, name) -> bool:
+    """The folder names are derived from the entity names when converting back, so they have to match"""
+    if not isinstance(name, str) or cleanse_folder_name(name) != os.path.basename(folder):
+        print(f"Can't convert to an AIO file, the folder name doesn't match the name in its json file: {folder}")
+        return False
+    return True
+
+
+def material_folder_to_aio_data(folder_path: PathLike) -> Optional[dict[str, Any]]:
+    """
+    Returns the contents of a material folder as AIO material data
+    Filaments and variants are ordered by folder name
+    :returns The AIO data, or None if the folder can't be converted without losing data
+    """
+    material_data = _load_dict(os.path.join(folder_path, "material.json"))
+    if material_data is None or not _check_folder_name(folder_path, material_data.get("material")):
+        return None
+
+    filaments = []
+    for filament_entry in _scandir_sorted_dirs(folder_path):
+        filament_data = _load_dict(os.path.join(filament_entry.path, "filament.json"))
+        if filament_data is None or not _check_folder_name(filament_entry.path, filament_data.get("name")):
+            return None
+        variants = []
+        for variant_entry in _scandir_sorted_dirs(filament_entry.path):
+            variant_data = _load_dict(os.path.join(variant_entry.path, "variant.json"))
+            if variant_data is None or not _check_folder_name(variant_entry.path, variant_data.get("color_name")) \
+                    or not _check_no_sub_folders(variant_entry.path):
+                return None
+            variant_data["sizes"] = get_json_from_file(os.path.join(variant_entry.path, "sizes.json"))
+            variants.append(variant_data)
+        filament_data["variants"] = variants
+        filaments.append(filament_data)
+    material_data["filaments"] = filaments
+
+    if not validate_json(material_data, MATERIAL_AIO_SCHEMA):
+        # An error msg will be emitted by the validate function if there is an error
+        return None
+    return material_data
+
+
+def aio_data_to_folder_files(aio_data: dict[str, Any]) -> Optional[list[tuple[Path, Any]]]:
+    """
+    Split AIO material data into the files of a material folder
+    :returns (path relative to the brand folder, json data) pairs, or None if two entries would share a folder
+    """
+    material_folder = Path(cleanse_folder_name(aio_data["material"]))
+    files: list[tuple[Path, Any]] = [
+        (material_folder.joinpath("material.json"), {k: v for k, v in aio_data.items() if k != "filaments"})
+    ]
+    used_folders: set[Path] = set()
+
+    def sub_folder(parent: Path, name: str) -> Optional[Path]:
+        folder = parent.joinpath(cleanse_folder_name(name))
+        if folder in used_folders:
+            print(f"Can't convert the AIO file, two entries share the folder: {folder}")
+            return None
+        used_folders.add(folder)
+        return folder
+
+    for filament_data in aio_data["filaments"]:
+        filament_folder = sub_folder(material_folder, filament_data["name"])
+        if filament_folder is None:
+            return None
+        files.append((filament_folder.joinpath("filament.json"), {k: v for k, v in filament_data.items() if k != "variants"}))
+        for variant_data in filament_data["variants"]:
+            variant_folder = sub_folder(filament_folder, variant_data["color_name"])
+            if variant_folder is None:
+                return None
+            files.append((variant_folder.joinpath("variant.json"), {k: v for k, v in variant_data.items() if k != "sizes"}))
+            files.append((variant_folder.joinpath("sizes.json"), variant_data["sizes"]))
+    return files
+
+
+def _read_bytes(path: PathLike) -> Optional[bytes]:
+    try:
+        with open(path, mode="rb") as f:
+            return f.read()
+    except OSError:
+        return None
+
+
+def _check_round_trip(source: PathLike, differences: list[str], normalize: bool) -> bool:
+    if not differences:
+        return True
+    if normalize:
+        print(f"Normalizing the formatting of {len(differences)} file(s) converted from: {source}")
+        return True
+    shown = ", ".join(differences[:3]) + (f" and {len(differences) - 3} more" if len(differences) > 3 else "")
+    print(f"Can't convert {source} without changing it, converting back wouldn't reproduce: {shown}")
+    return False
+
+
+def material_folder_round_trip_differences(folder_path: PathLike, aio_data: dict[str, Any]) -> list[str]:
+    """
+    Returns the files of the material folder that converting aio_data back to a folder wouldn't reproduce byte for
+    byte, and the files it wouldn't write at all (relative to the brand folder)
+    """
+    folder = Path(folder_path)
+    files = aio_data_to_folder_files(aio_data)
+    if files is None:
+        return [str(folder.name)]
+    expected = {str(path): data_json_bytes(json_data) for path, json_data in files}
+    differences = [path for path, data in expected.items() if _read_bytes(folder.parent.joinpath(path)) != data]
+    for dir_path, _, file_names in os.walk(folder):
+        for file_name in file_names:
+            path = os.path.relpath(os.path.join(dir_path, file_name), folder.parent)
+            if path not in expected:
+                differences.append(path)
+    return differences
+
+
+def material_folder_to_aio(folder_path: PathLike, remove_source=False, normalize=False) -> Optional[Path]:
+    """
+    Convert a material folder to an AIO file stored next to it in the brand folder
+    :param folder_path: The material folder
+    :param remove_source: Delete the material folder after the AIO file was written
+    :param normalize: Convert even if converting back wouldn't reproduce the folder byte for byte
+    :returns The path of the AIO file, or None if the folder can't be converted
+    """
+    folder = Path(folder_path)
+    aio_data = material_folder_to_aio_data(folder)
+    if aio_data is None:
+        return None
+    if not _check_round_trip(folder, material_folder_round_trip_differences(folder, aio_data), normalize):
+        return None
+    aio_path = folder.parent.joinpath(f"{folder.name}{AIO_FILE_SUFFIX}")
+    write_file_if_changed(aio_path, data_json_bytes(aio_data))
+    if remove_source:
+        shutil.rmtree(folder)
+    return aio_path
+
+
+def aio_to_material_folder(aio_file_path: PathLike, remove_source=False, normalize=False) -> Optional[Path]:
+    """
+    Convert an AIO file to a material folder stored next to it in the brand folder
+    :param aio_file_path: The AIO file
+    :param remove_source: Delete the AIO file after the material folder was written
+    :param normalize: Convert even if converting back wouldn't reproduce the AIO file byte for byte
+    :returns The path of the material folder, or None if the file can't be converted
+    """
+    aio_path = Path(aio_file_path)
+    aio_data = get_json_from_file(aio_path)
+    if not validate_json(aio_data, MATERIAL_AIO_SCHEMA):
+        # An error msg will be emitted by the validate function if there is an error
+        return None
+    differences = [aio_path.name] if _read_bytes(aio_path) != data_json_bytes(aio_data) else []
+    if not _check_round_trip(aio_path, differences, normalize):
+        return None
+    files = aio_data_to_folder_files(aio_data)
+    if files is None:
+        return None
+    material_folder = aio_path.parent.joinpath(files[0][0].parent)
+    if material_folder.exists():
+        print(f"Can't convert the AIO file, the material folder already exists: {material_folder}")
+        return None
+    write_files([(aio_path.parent.joinpath(path), data_json_bytes(json_data)) for path, json_data in files])
+    if remove_source:
+        aio_path.unlink()
+    return material_folder
+
+
+# ---------------------------------
+# Hash Manifest
+# ---------------------------------
+
+def build_hash_manifest(brands: list[Brand], store_map: Optional[dict[str, Store]] = None) -> dict[str, Any]:
+    """
+    Compute the content hash of every store, brand, material, filament and variant
+    The hashes can be used as cache keys for anything derived from a node, they change whenever the node or anything below it changes
+    :param brands: The brands to include
+    :param store_map: The stores to include, defaults to the loaded stores
+    :returns: A manifest dict with the manifest version, the hash of the whole tree and the hash of every node keyed by entity path
+    """
+    if store_map is None:
+        store_map = stores
+
+    nodes: dict[str, str] = {}
+    root_children: dict[str, str] = {}
+    for store_id in sorted(store_map):
+        segment = entity_segment(Store.hash_kind, store_id)
+        root_children[segment] = store_map[store_id].content_hash(segment, nodes)
+    for segment, brand in named_children(Brand.hash_kind, brands, lambda x: x.brand_name):
+        root_children[segment] = brand.content_hash(segment, nodes)
+
+    return {
+        "version": HASH_MANIFEST_VERSION,
+        "root": merkle_hash({}, root_children),
+        "nodes": dict(sorted(nodes.items()))
+    }
+
+
+def save_hash_manifest(manifest: dict[str, Any], manifest_path: PathLike):
+    with open(manifest_path, mode="w", encoding="utf8") as f:
+        json_codec.dump(manifest, f, indent=4)
+
+
+def load_hash_manifest(manifest_path: PathLike) -> Optional[dict[str, Any]]:
+    """
+    Load a hash manifest written by save_hash_manifest()
+    :returns The manifest, or None if it does not exist, can't be read or was written by a different hashing scheme
+    """
+    if not Path(manifest_path).exists():
+        return None
+    manifest = get_json_from_file(manifest_path)
+    if not isinstance(manifest, dict) or manifest.get("version") != HASH_MANIFEST_VERSION:
+        return None
+    return manifest
+
+
+def changed_entities(old_manifest: dict[str, Any], new_manifest: dict[str, Any]) -> list[str]:
+    """
+    Returns the entity paths that were added, removed or whose hash changed between two manifests
+    Because the hashes are Merkle hashes, an unchanged brand path means nothing below it changed
+    """
+    if old_manifest.get("root") == new_manifest.get("root"):
+        return []
+    old_nodes: dict[str, str] = old_manifest.get("nodes", {})
+    new_nodes: dict[str, str] = new_manifest.get("nodes", {})
+    return sorted(k for k in old_nodes.keys() | new_nodes.keys() if old_nodes.get(k) != new_nodes.get(k))
+
+
+# ---------------------------------
+# Catalog
+# A loaded data/stores tree that is kept in sync with the files on disk.
+# File changes are mapped to the entity they belong to and only that entity is reparsed and revalidated.
+# ---------------------------------
+
+# The model class and child list attribute of each level of a brand folder, the json files are in LOAD_ORDER
+CATALOG_LEVELS: tuple[tuple[type[IToFromFS], str], ...] = (
+    (Brand, "materials"),
+    (Material, "filaments"),
+    (Filament, "variants"),
+    (FilamentVariant, "sizes")
+)
+
+
+def iter_nodes(obj: IToFromJSONData) -> Iterator[IToFromJSONData]:
+    """Yields obj and every entity below it (see IToFromJSONData.hash_children())"""
+    yield obj
+    for _, child in obj.hash_children():
+        yield from iter_nodes(child)
+
+
+@dataclass
+class CatalogChange:
+    """
+    A change to a Catalog, published to its subscribers
+    `removed` holds every object (nested ones included) that left the catalog or has to be re-indexed,
+    `added` every object that entered the catalog or was changed in place. A modified entity is in both.
+    """
+    op: str  # "added", "removed", "modified" or "reloaded"
+    kind: str  # The entity kind (store, brand, material, filament, variant), "root" for reloads
+    path: str  # The entity path, e.g. "brand:Bambu Lab/material:PLA"
+    entity: Optional[IToFromJSONData]  # None for reloads
+    file: str  # The file or folder whose change caused this
+    removed: list[IToFromJSONData] = field(default_factory=list)
+    added: list[IToFromJSONData] = field(default_factory=list)
+    parent: Optional[IToFromJSONData] = None  # The entity's parent, None for brands, stores and removals
+
+
+class CatalogIndex:
+    """
+    A lookup table over the objects of a Catalog that is patched in place when the catalog changes
+    Register it with Catalog.add_index()
+    :param keys: Returns the keys an object is indexed under, an empty iterable to leave the object out
+    """
+
+    def __init__(self, keys: Callable[[IToFromJSONData], Iterable]):
+        self._keys = keys
+        self._entries: dict[Any, list[IToFromJSONData]] = {}
+        # The keys each object was indexed under, so it can be removed after being changed in place
+        self._indexed: dict[int, tuple[IToFromJSONData, tuple]] = {}
+
+    def get(self, key) -> list[IToFromJSONData]:
+        return self._entries.get(key, [])
+
+    def keys(self):
+        return self._entries.keys()
+
+    def add(self, obj: IToFromJSONData):
+        self.remove(obj)
+        keys = tuple(self._keys(obj))
+        if not keys:
+            return
+        self._indexed[id(obj)] = (obj, keys)
+        for key in keys:
+            self._entries.setdefault(key, []).append(obj)
+
+    def remove(self, obj: IToFromJSONData):
+        indexed = self._indexed.pop(id(obj), None)
+        if indexed is None:
+            return
+        for key in indexed[1]:
+            entries = [x for x in self._entries[key] if x is not obj]
+            if entries:
+                self._entries[key] = entries
+            else:
+                del self._entries[key]
+
+    def rebuild(self, objects: Iterable[IToFromJSONData]):
+        self._entries.clear()
+        self._indexed.clear()
+        for obj in objects:
+            self.add(obj)
+
+    def __call__(self, change: CatalogChange):
+        for obj in change.removed:
+            self.remove(obj)
+        for obj in change.added:
+            self.add(obj)
+
+
+class Catalog:
+    """
+    The brands and stores of a data and stores folder
+    watch()/start_watching() apply changes made on disk to the loaded objects. Unchanged entities keep their
+    identity, changed ones are updated in place where possible. Every change is published to the subscribers.
+    Hold `lock` while reading the catalog from another thread than the watcher.
+    Purchase links are resolved against the catalog's stores, the module's `stores` are left as they are.
+    """
+
+    def __init__(self, data_dir: PathLike = "data", stores_dir: PathLike = "stores", prefetch_workers: int = 0):
+        self.data_dir = os.path.abspath(data_dir)
+        self.stores_dir = os.path.abspath(stores_dir)
+        self.lock = threading.RLock()
+        self.brands: list[Brand] = []
+        self.stores: dict[str, Store] = {}
+        self._subscribers: list[Callable[[CatalogChange], Any]] = []
+        # Loaded entities keyed by the absolute path of their folder (or AIO file)
+        self._objects: dict[str, IToFromFS] = {}
+        # Store ids keyed by the absolute path of their folder
+        self._store_folders: dict[str, str] = {}
+        self.reload(prefetch_workers)
+
+    # Subscribers
+
+    def subscribe(self, callback: Callable[[CatalogChange], Any]):
+        self._subscribers.append(callback)
+
+    def unsubscribe(self, callback: Callable[[CatalogChange], Any]):
+        self._subscribers.remove(callback)
+
+    def add_index(self, index: CatalogIndex) -> CatalogIndex:
+        """Build the index from the current objects and keep it up to date"""
+        with self.lock:
+            index.rebuild(self.iter_objects())
+            self.subscribe(index)
+        return index
+
+    def add_stats(self, stats: 'CatalogStats') -> 'CatalogStats':
+        """Compute the statistics from the current objects and keep them up to date"""
+        with self.lock:
+            stats.rebuild(self.brands, self.stores.values())
+            self.subscribe(stats)
+        return stats
+
+    def _publish(self, change: CatalogChange):
+        for callback in list(self._subscribers):
+            try:
+                callback(change)
+            except Exception as e:
+                print(f"Catalog subscriber failed to handle the change of {change.path}: {e}")
+
+    def iter_objects(self) -> Iterator[IToFromJSONData]:
+        """Yields every store and every entity of every brand"""
+        yield from self.stores.values()
+        for brand in self.brands:
+            yield from iter_nodes(brand)
+
+    # Loading
+
+    def reload(self, prefetch_workers: int = 0, file: str = ""):
+        """Load everything from disk again, subscribers get a single "reloaded" change"""
+        with self.lock:
+            old_objects = list(self.iter_objects())
+            self._store_folders = {}
+            self.stores = load_store_folders(self.stores_dir, self._store_folders) if os.path.isdir(self.stores_dir) else {}
+            self.brands = load_brands(self.data_dir, prefetch_workers, self.stores)
+            self._objects = {}
+            for brand in self.brands:
+                self._register(brand)
+            if old_objects:
+                self._publish(CatalogChange("reloaded", "root", "", None, file or self.data_dir,
+                                            removed=old_objects, added=list(self.iter_objects())))
+
+    def _register(self, obj: IToFromFS):
+        if obj._saved_folder is not None:
+            self._objects[obj._saved_folder] = obj
+        # The entities of an AIO material share its file and are reloaded with it
+        if isinstance(obj, Material) and obj._aio_file:
+            return
+        for child in obj._child_nodes():
+            self._register(child)
+
+    def _unregister(self, folder: str):
+        prefix = folder + os.sep
+        for key in [x for x in self._objects if x == folder or x.startswith(prefix)]:
+            del self._objects[key]
+
+    def _entity_path(self, folder: str) -> str:
+        if os.path.dirname(folder) == self.stores_dir:
+            return entity_segment(Store.hash_kind, self._store_folders.get(folder, os.path.basename(folder)))
+        parts = os.path.relpath(folder, self.data_dir).split(os.sep)
+        if parts[-1].endswith(AIO_FILE_SUFFIX):
+            parts[-1] = parts[-1][:-len(AIO_FILE_SUFFIX)]
+        return "/".join(entity_segment(CATALOG_LEVELS[i][0].hash_kind, x) for i, x in enumerate(parts))
+
+    # Applying changes
+
+    def _target(self, change: FileChange) -> Optional[tuple[str, Optional[str]]]:
+        """Returns the (entity folder, changed json file) of a file change, the file is None for folder changes"""
+        path = os.path.abspath(change.path)
+        for root, levels in ((self.stores_dir, 1), (self.data_dir, len(CATALOG_LEVELS))):
+            if not path.startswith(root + os.sep):
+                continue
+            parts = os.path.relpath(path, root).split(os.sep)
+            if change.is_dir:
+                return (path, None) if len(parts) <= levels else None
+            name = parts[-1]
+            if root == self.data_dir and len(parts) == 2 and name.endswith(AIO_FILE_SUFFIX):
+                return path, None
+            level = len(parts) - 2
+            if level < 0 or level >= levels:
+                return None
+            json_files = ("store.json",) if root == self.stores_dir else LOAD_ORDER[level]
+            return (os.path.dirname(path), name) if name in json_files else None
+        return None
+
+    def apply_changes(self, changes: list[FileChange]) -> list[CatalogChange]:
+        """
+        Update the catalog for the provided file changes (e.g. from a fs_watch watcher) and publish the results
+        Each affected entity is handled once, parents before their children
+        :returns The published changes
+        """
+        with self.lock:
+            rescan = next((x for x in changes if x.change == RESCAN), None)
+            if rescan is not None:
+                self.reload(file=rescan.path)
+                return []
+
+            targets: dict[str, Optional[str]] = {}
+            for change in changes:
+                target = self._target(change)
+                if target is None:
+                    continue
+                folder, file_name = target
+                # None means all of the entity's files are reparsed
+                targets[folder] = file_name if targets.get(folder, file_name) == file_name else None
+
+            published = []
+            # Parents before children, and removals first so an entity that moved between layouts is removed before it is added
+            for folder in sorted(targets, key=lambda x: (x.count(os.sep), os.path.exists(x))):
+                for catalog_change in self._refresh(folder, targets[folder]):
+                    self._publish(catalog_change)
+                    published.append(catalog_change)
+            return published
+
+    def _refresh(self, folder: str, file_name: Optional[str]) -> list[CatalogChange]:
+        if os.path.dirname(folder) == self.stores_dir:
+            return self._refresh_store(folder)
+        if folder.endswith(AIO_FILE_SUFFIX):
+            return self._refresh_aio_material(folder)
+
+        level = os.path.relpath(folder, self.data_dir).count(os.sep)
+        cls, children_attr = CATALOG_LEVELS[level]
+        obj = self._objects.get(folder)
+        parent = self._objects.get(os.path.dirname(folder)) if level > 0 else None
+        complete = os.path.isdir(folder) and all(os.path.exists(os.path.join(folder, x)) for x in LOAD_ORDER[level])
+
+        if obj is not None and (not complete or (level > 0 and parent is None)):
+            return [self._remove(obj, folder, parent)]
+        if not complete:
+            return []
+        if obj is None:
+            if level > 0 and parent is None:
+                # It will be loaded along with its parent once the parent is complete
+                return []
+            obj = cls.from_folder(folder, parent if level >= 2 else None, store_map=self.stores)
+            if obj is None:
+                return []
+            self._attach(obj, parent)
+            return [CatalogChange("added", cls.hash_kind, self._entity_path(folder), obj, folder,
+                                  added=list(iter_nodes(obj)), parent=parent)]
+
+        # The entity exists, only reparse its changed file(s). Invalid files leave the loaded entity as it is.
+        removed: list[IToFromJSONData] = [obj]
+        added: list[IToFromJSONData] = [obj]
+        changed = False
+        for name in (LOAD_ORDER[level] if file_name is None else (file_name,)):
+            if name == "sizes.json":
+                sizes = FilamentVariant._sizes_from_folder(folder, self.stores)
+                if not sizes or [x.to_dict() for x in sizes] == [x.to_dict() for x in obj.sizes]:
+                    continue
+                for size in obj.sizes:
+                    removed.extend(iter_nodes(size))
+                obj.sizes = sizes
+                for size in sizes:
+                    added.extend(iter_nodes(size))
+            else:
+                new = cls.from_json_file(os.path.join(folder, name), parent if level >= 2 else None)
+                if new is None or new.to_dict() == obj.to_dict():
+                    continue
+                for k, v in new.public_dict().items():
+                    if k != children_attr:
+                        setattr(obj, k, v)
+            changed = True
+        if not changed:
+            return []
+        obj.mark_saved(folder)
+        return [CatalogChange("modified", cls.hash_kind, self._entity_path(folder), obj,
+                              os.path.join(folder, file_name) if file_name else folder, removed, added, parent)]
+
+    def _refresh_aio_material(self, path: str) -> list[CatalogChange]:
+        old = self._objects.get(path)
+        brand = self._objects.get(os.path.dirname(path))
+        if old is not None and (brand is None or not os.path.isfile(path)):
+            return [self._remove(old, path, brand)]
+        if brand is None or not os.path.isfile(path):
+            return []
+        material = Material.from_aio_file(path, store_map=self.stores)
+        if material is None:
+            return []
+        if old is None:
+            self._attach(material, brand)
+            return [CatalogChange("added", Material.hash_kind, self._entity_path(path), material, path,
+                                  added=list(iter_nodes(material)), parent=brand)]
+        if material.to_aio_dict() == old.to_aio_dict():
+            return []
+        # The whole file was reparsed, so the material is replaced instead of updated in place
+        self._detach(old, brand)
+        self._attach(material, brand)
+        return [CatalogChange("modified", Material.hash_kind, self._entity_path(path), material, path,
+                              removed=list(iter_nodes(old)), added=list(iter_nodes(material)), parent=brand)]
+
+    def _refresh_store(self, folder: str) -> list[CatalogChange]:
+        old_id = self._store_folders.get(folder)
+        old = self.stores.get(old_id) if old_id is not None else None
+        store_file = os.path.join(folder, "store.json")
+        if not os.path.isfile(store_file):
+            if old is None:
+                return []
+            del self.stores[old_id]
+            del self._store_folders[folder]
+            return [CatalogChange("removed", Store.hash_kind, entity_segment(Store.hash_kind, old_id), old, folder,
+                                  removed=[old])]
+
+        store = load_store_file(store_file)
+        if store is None or (old is not None and store.to_dict() == old.to_dict()):
+            return []
+        if store.store_id != old_id and store.store_id in self.stores:
+            print(f"There were multiple stores with the same store ID: {store.store_id}")
+            return []
+        if old is not None and store.store_id == old_id:
+            # Purchase links reference the store object, so it is updated in place
+            for k, v in store.public_dict().items():
+                setattr(old, k, v)
+            return [CatalogChange("modified", Store.hash_kind, entity_segment(Store.hash_kind, old_id), old, store_file,
+                                  removed=[old], added=[old])]
+        if old is not None:
+            del self.stores[old_id]
+        self.stores[store.store_id] = store
+        self._store_folders[folder] = store.store_id
+        # A changed store id is a different store, links to the old id keep referencing the old object
+        return [CatalogChange("modified" if old is not None else "added", Store.hash_kind,
+                              entity_segment(Store.hash_kind, store.store_id), store, store_file,
+                              removed=[old] if old is not None else [], added=[store])]
+
+    def _children_of(self, parent: Optional[IToFromFS]) -> list:
+        if parent is None:
+            return self.brands
+        return getattr(parent, dict(CATALOG_LEVELS)[type(parent)])
+
+    def _attach(self, obj: IToFromFS, parent: Optional[IToFromFS]):
+        # Adding a child that is already on disk doesn't make the parent dirty
+        was_clean = parent is not None and not parent.is_dirty()
+        self._children_of(parent).append(obj)
+        if was_clean:
+            parent.mark_clean()
+        self._register(obj)
+
+    def _detach(self, obj: IToFromFS, parent: Optional[IToFromFS]):
+        was_clean = parent is not None and not parent.is_dirty()
+        children = self._children_of(parent)
+        for i, x in enumerate(children):
+            if x is obj:
+                del children[i]
+                break
+        if was_clean:
+            parent.mark_clean()
+        if obj._saved_folder is not None:
+            self._unregister(obj._saved_folder)
+
+    def _remove(self, obj: IToFromFS, folder: str, parent: Optional[IToFromFS]) -> CatalogChange:
+        self._detach(obj, parent)
+        self._unregister(folder)
+        return CatalogChange("removed", obj.hash_kind, self._entity_path(folder), obj, folder,
+                             removed=list(iter_nodes(obj)))
+
+    # Watching
+
+    def _create_watcher(self, use_inotify: Optional[bool], poll_interval: float):
+        roots = [x for x in (self.data_dir, self.stores_dir) if os.path.isdir(x)]
+        return create_watcher(roots, use_inotify, poll_interval)
+
+    def _watch_loop(self, watcher, stop: Optional[threading.Event], poll_interval: float):
+        with watcher:
+            while stop is None or not stop.is_set():
+                changes = watcher.wait(poll_interval)
+                if changes:
+                    self.apply_changes(changes)
+
+    def watch(self, stop: Optional[threading.Event] = None, use_inotify: Optional[bool] = None,
+              poll_interval: float = 1.0):
+        """
+        Apply changes made on disk until stop is set (or forever), see start_watching() to watch in the background
+        :param use_inotify: True to require inotify, False to poll, None to use inotify if available
+        :param poll_interval: Seconds between polls, also the longest time it takes to notice stop being set
+        """
+        self._watch_loop(self._create_watcher(use_inotify, poll_interval), stop, poll_interval)
+
+    def start_watching(self, use_inotify: Optional[bool] = None, poll_interval: float = 1.0) -> threading.Event:
+        """
+        Watch for changes on a daemon thread
+        :returns An event that stops the watcher when set
+        """
+        stop = threading.Event()
+        # The watcher is set up before returning, so no change made after this call is missed
+        watcher = self._create_watcher(use_inotify, poll_interval)
+        threading.Thread(target=self._watch_loop, args=(watcher, stop, poll_interval),
+                         name="catalog-watcher", daemon=True).start()
+        return stop
+
+
+# ---------------------------------
+# Catalog Statistics
+# Coverage figures kept as counters. Every entity's contribution is remembered, so a change only
+# subtracts the old contributions of the changed entities and adds their new ones.
+# ---------------------------------
+
+class CatalogStats:
+    """
+    Counts of the entities of a catalog, broken down by brand, material, diameter and store
+    Call rebuild() to count a loaded catalog in one pass, or register it with Catalog.add_stats() to keep it up to date.
+    Variants are grouped by brand and material name, so renaming a brand or material recounts its subtree.
+    """
+
+    def __init__(self):
+        self._counters: dict[str, Counter] = {}
+        # The (brand name, material name) context and the counter increments of each counted object
+        self._counted: dict[int, tuple[IToFromJSONData, tuple[Optional[str], Optional[str]], tuple]] = {}
+
+    def count(self, metric: str, key=None) -> int:
+        counter = self._counters.get(metric)
+        return counter[key] if counter is not None else 0
+
+    def counter(self, metric: str) -> Counter:
+        return self._counters.get(metric, Counter())
+
+    @staticmethod
+    def _increments(obj: IToFromJSONData, brand: Optional[str], material: Optional[str]) -> tuple:
+        """Returns the (metric, key) pairs obj counts towards"""
+        if isinstance(obj, Brand):
+            return ("brands", None),
+        if isinstance(obj, Material):
+            ret = [("materials", None)]
+            if obj.default_slicer_settings is not None:
+                ret.append(("materials_with_default_slicer_settings", None))
+            return tuple(ret)
+        if isinstance(obj, Filament):
+            ret = [("filaments", None), ("filaments_per_material", material)]
+            if obj.slicer_settings is not None:
+                ret.append(("filaments_with_slicer_settings", None))
+            if obj.discontinued:
+                ret.append(("filaments_discontinued", None))
+            return tuple(ret)
+        if isinstance(obj, FilamentVariant):
+            ret = [("variants", None), ("variants_per_brand", brand), ("variants_per_material", material),
+                   ("variants_per_brand_material", (brand, material))]
+            if obj.discontinued:
+                ret.append(("variants_discontinued", None))
+            return tuple(ret)
+        if isinstance(obj, FilamentSize):
+            ret = [("sizes", None), ("sizes_per_diameter", obj.diameter)]
+            if obj.gtin or obj.ean:
+                ret.append(("sizes_with_gtin", None))
+            if obj.discontinued:
+                ret.append(("sizes_discontinued", None))
+            return tuple(ret)
+        if isinstance(obj, SizePurchaseLink):
+            return ("purchase_links", None), ("purchase_links_per_store", obj.store.store_id)
+        if isinstance(obj, Store):
+            return ("stores", None), ("store_ids", obj.store_id)
+        return ()
+
+    def _apply(self, increments: tuple, sign: int):
+        for metric, key in increments:
+            counter = self._counters.setdefault(metric, Counter())
+            counter[key] += sign
+            if counter[key] == 0:
+                del counter[key]
+
+    def _add(self, obj: IToFromJSONData, context: tuple[Optional[str], Optional[str]]):
+        self._remove(obj)
+        increments = self._increments(obj, *context)
+        self._counted[id(obj)] = (obj, context, increments)
+        self._apply(increments, 1)
+
+    def _remove(self, obj: IToFromJSONData):
+        counted = self._counted.pop(id(obj), None)
+        if counted is not None:
+            self._apply(counted[2], -1)
+
+    def _add_tree(self, obj: IToFromJSONData, context: tuple[Optional[str], Optional[str]]):
+        """(Re)count obj and everything below it"""
+        if isinstance(obj, Brand):
+            context = (obj.brand_name, None)
+        elif isinstance(obj, Material):
+            context = (context[0], obj.material_name)
+        self._add(obj, context)
+        for _, child in obj.hash_children():
+            self._add_tree(child, context)
+
+    def rebuild(self, brands: Iterable[Brand], stores: Iterable[Store]):
+        self._counters.clear()
+        self._counted.clear()
+        for store in stores:
+            self._add(store, (None, None))
+        for brand in brands:
+            self._add_tree(brand, (None, None))
+
+    def __call__(self, change: CatalogChange):
+        if change.op == "reloaded":
+            self.rebuild((x for x in change.added if isinstance(x, Brand)), (x for x in change.added if isinstance(x, Store)))
+            return
+        for obj in change.removed:
+            self._remove(obj)
+        if change.entity is None or change.op == "removed":
+            return
+        counted_parent = self._counted.get(id(change.parent)) if change.parent is not None else None
+        # The whole subtree is recounted, a renamed brand/material moves its variants to other groups
+        self._add_tree(change.entity, counted_parent[1] if counted_parent is not None else (None, None))
+
+    @staticmethod
+    def _ratio(part: int, total: int) -> Optional[float]:
+        return round(part / total, 4) if total else None
+
+    def to_dict(self) -> dict[str, Any]:
+        """The statistics as JSON data, keyed by name (brand, material, diameter, store id)"""
+        totals = {x: self.count(x) for x in ("brands", "materials", "filaments", "variants", "sizes",
+                                              "purchase_links", "stores")}
+        per_brand_material: dict[str, dict[str, int]] = {}
+        for (brand, material), n in sorted(self.counter("variants_per_brand_material").items()):
+            per_brand_material.setdefault(brand, {})[material] = n
+        links = self.counter("purchase_links_per_store")
+        return {
+            "totals": totals,
+            "variants_per_brand": dict(sorted(self.counter("variants_per_brand").items())),
+            "variants_per_material": dict(sorted(self.counter("variants_per_material").items())),
+            "variants_per_brand_material": per_brand_material,
+            "filaments_per_material": dict(sorted(self.counter("filaments_per_material").items())),
+            "sizes_per_diameter": {str(k): v for k, v in sorted(self.counter("sizes_per_diameter").items())},
+            # Stores without links are listed with 0
+            "purchase_links_per_store": {x: links[x] for x in sorted(self.counter("store_ids").keys() | links.keys())},
+            "shares": {
+                "sizes_with_gtin": self._ratio(self.count("sizes_with_gtin"), totals["sizes"]),
+                "filaments_with_slicer_settings": self._ratio(self.count("filaments_with_slicer_settings"),
+                                                              totals["filaments"]),
+                "materials_with_default_slicer_settings": self._ratio(
+                    self.count("materials_with_default_slicer_settings"), totals["materials"])
+            },
+            "discontinued": {x: self._ratio(self.count(f"{x}_discontinued"), totals[x])
+                             for x in ("filaments", "variants", "sizes")}
+        }
+
+
 # ---------------------------------
 # Init
 # ---------------------------------
@@ -1188,9 +3019,87 @@ MATERIAL_SCHEMA = get_json_from_file("schemas/material_schema.json")
 FILAMENT_SCHEMA = get_json_from_file("schemas/filament_schema.json")
 VARIANT_SCHEMA = get_json_from_file("schemas/variant_schema.json")
 SIZE_SCHEMA = get_json_from_file("schemas/sizes_schema.json")
+MATERIAL_AIO_SCHEMA = get_json_from_file("schemas/material_aio_schema.json")
 
 # Automatically load the stores on import/run
 load_stores()
 
 # Revert to previous CWD
 os.chdir(cwd)
+
+
+# If running from the command line, provide argument parsing
+if __name__ == "__main__":
+    from argparse import ArgumentParser
+
+    parser = ArgumentParser(description="Load the database and write derived artifacts")
+    parser.add_argument("--data-dir", default="data", help="The folder containing the brand folders")
+    parser.add_argument("--prefetch-workers", type=int, default=0,
+                        help="Read JSON files ahead of the parser with this many threads (useful on network filesystems)")
+    parser.add_argument("--hash-manifest", help="Write the content hash manifest to this file")
+    parser.add_argument("--stats", metavar="FILE", help="Write the catalog statistics to this file")
+    parser.add_argument("--check-identifiers", action="store_true",
+                        help="Report gtins/eans with bad check digits or that are used by several variants")
+    parser.add_argument("--to-aio", nargs="+", metavar="MATERIAL_FOLDER", default=[],
+                        help="Convert material folders to AIO material files")
+    parser.add_argument("--from-aio", nargs="+", metavar="AIO_FILE", default=[],
+                        help="Convert AIO material files to material folders")
+    parser.add_argument("--remove-source", action="store_true",
+                        help="Delete the material folder/AIO file after it was converted")
+    parser.add_argument("--normalize", action="store_true",
+                        help="Convert even if converting back wouldn't reproduce the source byte for byte, the "
+                             "converted files are written in the data folder's formatting")
+    parser.add_argument("--watch", action="store_true",
+                        help="Load the catalog and print the changes made to it on disk until interrupted")
+    parser.add_argument("--stores-dir", default="stores", help="The folder containing the store folders (--watch)")
+    parser.add_argument("--poll", action="store_true", help="Poll for changes instead of using inotify (--watch)")
+    parser.add_argument("--profile", metavar="FILE",
+                        help="Load the stores and brands with instrumentation, print a summary and write the figures to FILE")
+    parser.add_argument("--profile-format", choices=("json", "chrome"), default="json",
+                        help="Write the figures as JSON or as a Chrome trace (--profile)")
+    parser.add_argument("--trace-memory", action="store_true",
+                        help="Record tracemalloc peaks, slows loading down considerably (--profile)")
+    args = parser.parse_args()
+
+    if args.profile:
+        with profile_load(args.trace_memory) as load_profiler:
+            with profile_span("load_stores"):
+                stores = load_store_folders(args.stores_dir)
+            load_brands(args.data_dir, prefetch_workers=args.prefetch_workers)
+        print(load_profiler.summary())
+        load_profiler.save(args.profile, args.profile_format)
+
+    for material_folder in args.to_aio:
+        converted = material_folder_to_aio(material_folder, args.remove_source, args.normalize)
+        if converted is not None:
+            print(f"Converted {material_folder} to {converted}")
+    for aio_file in args.from_aio:
+        converted = aio_to_material_folder(aio_file, args.remove_source, args.normalize)
+        if converted is not None:
+            print(f"Converted {aio_file} to {converted}")
+
+    if args.hash_manifest:
+        loaded_brands = load_brands(args.data_dir, prefetch_workers=args.prefetch_workers)
+        save_hash_manifest(build_hash_manifest(loaded_brands), args.hash_manifest)
+
+    if args.stats:
+        catalog_stats = CatalogStats()
+        catalog_stats.rebuild(load_brands(args.data_dir, prefetch_workers=args.prefetch_workers), stores.values())
+        with open(args.stats, mode="w", encoding="utf8") as f:
+            json_codec.dump(catalog_stats.to_dict(), f, indent=4)
+
+    if args.check_identifiers:
+        loaded_brands = load_brands(args.data_dir, prefetch_workers=args.prefetch_workers)
+        found_issues = identifier_issues(loaded_brands)
+        for variant_path, issue in found_issues:
+            print(f"{variant_path}: {issue.message}")
+        print(f"Found {len(found_issues)} identifier issues")
+
+    if args.watch:
+        catalog = Catalog(args.data_dir, args.stores_dir, prefetch_workers=args.prefetch_workers)
+        catalog.subscribe(lambda x: print(f"{x.op}: {x.path or x.file}"))
+        print(f"Watching {catalog.data_dir} and {catalog.stores_dir}")
+        try:
+            catalog.watch(use_inotify=False if args.poll else None)
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,312 @@
+import ctypes
+import ctypes.util
+import errno
+import os
+import select
+import struct
+import sys
+import time
+from dataclasses import dataclass
+from typing import Optional, Union, Iterable
+
+PathLike = Union[str, os.PathLike[str]]
+
+CREATED = "created"
+MODIFIED = "modified"
+DELETED = "deleted"
+# Events were lost (e.g. the inotify queue overflowed), everything below `path` has to be rescanned
+RESCAN = "rescan"
+
+
+@dataclass(frozen=True, slots=True)
+class FileChange:
+    path: str
+    change: str  # CREATED, MODIFIED, DELETED or RESCAN
+    is_dir: bool = False
+
+
+def _is_hidden(name: str) -> bool:
+    # Editors' swap files and the temp files of atomic writes (see db_serializer.write_file_if_changed)
+    return name.startswith(".") or name.endswith("~")
+
+
+def _coalesce(changes: list[FileChange]) -> list[FileChange]:
+    """Drop repeated events for the same path, keeping the last one in the order it was first seen"""
+    latest: dict[tuple[str, bool], FileChange] = {}
+    for change in changes:
+        key = (change.path, change.is_dir)
+        # Deleting and re-creating a path within one batch is a modification
+        previous = latest.pop(key, None)
+        if previous is not None and previous.change == DELETED and change.change == CREATED and not change.is_dir:
+            change = FileChange(change.path, MODIFIED, change.is_dir)
+        latest[key] = change
+    return list(latest.values())
+
+
+# ---------------------------------
+# Polling
+# ---------------------------------
+
+class PollingWatcher:
+    """
+    Detects changes by comparing snapshots of (mtime, size) of every file and folder below the roots
+    Works everywhere, but costs a full directory walk per poll
+    """
+
+    def __init__(self, roots: Iterable[PathLike], interval: float = 1.0, settle: float = 0.2):
+        self.roots = [os.path.abspath(x) for x in roots]
+        self.interval = interval
+        self.settle = settle
+        self._snapshot = self._scan()
+
+    def _scan(self) -> dict[str, tuple[bool, int, int]]:
+        snapshot = {}
+        stack = list(self.roots)
+        while stack:
+            folder = stack.pop()
+            try:
+                with os.scandir(folder) as it:
+                    for entry in it:
+                        if _is_hidden(entry.name):
+                            continue
+                        try:
+                            is_dir = entry.is_dir()
+                            stat = entry.stat()
+                        except OSError:
+                            continue
+                        snapshot[entry.path] = (is_dir, stat.st_mtime_ns, 0 if is_dir else stat.st_size)
+                        if is_dir:
+                            stack.append(entry.path)
+            except OSError:
+                continue
+        return snapshot
+
+    def poll(self) -> list[FileChange]:
+        """Returns the changes since the last poll"""
+        snapshot = self._scan()
+        old = self._snapshot
+        self._snapshot = snapshot
+        changes = []
+        for path in sorted(old.keys() - snapshot.keys()):
+            changes.append(FileChange(path, DELETED, old[path][0]))
+        for path in sorted(snapshot.keys()):
+            previous = old.get(path)
+            is_dir = snapshot[path][0]
+            if previous is None:
+                changes.append(FileChange(path, CREATED, is_dir))
+            elif not is_dir and previous != snapshot[path]:
+                changes.append(FileChange(path, MODIFIED, is_dir))
+        return changes
+
+    def wait(self, timeout: Optional[float] = None) -> list[FileChange]:
+        """
+        Poll until there are changes or the timeout (in seconds) has passed
+        Once there are changes, polling continues every `settle` seconds until a poll finds none,
+        so changes that are made together (e.g. an editor saving several files) are returned as one batch
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            changes = self.poll()
+            if changes:
+                while True:
+                    time.sleep(self.settle)
+                    more = self.poll()
+                    if not more:
+                        return _coalesce(changes)
+                    changes.extend(more)
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                return []
+            time.sleep(self.interval if remaining is None else min(self.interval, remaining))
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+# ---------------------------------
+# inotify (Linux)
+# ---------------------------------
+
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF
+EVENT_HEADER = struct.Struct("iIII")
+
+_libc = None
+
+
+def _load_libc():
+    global _libc
+    if _libc is None and sys.platform.startswith("linux"):
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+            if hasattr(libc, "inotify_init1"):
+                _libc = libc
+        except OSError:
+            pass
+    return _libc
+
+
+def inotify_available() -> bool:
+    return _load_libc() is not None
+
+
+class InotifyWatcher:
+    """
+    Receives changes from the kernel through inotify, so waiting costs nothing regardless of the tree size
+    Every folder below the roots gets its own watch, watches are added for folders as they are created
+    """
+
+    def __init__(self, roots: Iterable[PathLike], settle: float = 0.05):
+        libc = _load_libc()
+        if libc is None:
+            raise OSError("inotify is not available on this platform")
+        self._libc = libc
+        self.roots = [os.path.abspath(x) for x in roots]
+        self.settle = settle
+        self._fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self._folders: dict[int, str] = {}
+        try:
+            for root in self.roots:
+                self._watch_tree(root)
+        except OSError:
+            self.close()
+            raise
+
+    def _watch_tree(self, folder: str, failed: Optional[list[str]] = None) -> list[str]:
+        """
+        Watch folder and all folders below it, returns the paths that already exist inside of them
+        :param failed: If provided, the folders that couldn't be watched (e.g. the watch limit was reached) are added
+            to it, otherwise an OSError is raised
+        """
+        found = []
+        stack = [folder]
+        while stack:
+            path = stack.pop()
+            wd = self._libc.inotify_add_watch(self._fd, os.fsencode(path), WATCH_MASK)
+            if wd < 0:
+                error = ctypes.get_errno()
+                if error in (errno.ENOENT, errno.ENOTDIR):
+                    # Removed again before it could be watched
+                    continue
+                if failed is None:
+                    raise OSError(error, f"inotify_add_watch failed: {os.strerror(error)}", path)
+                failed.append(path)
+                continue
+            self._folders[wd] = path
+            try:
+                with os.scandir(path) as it:
+                    for entry in it:
+                        if _is_hidden(entry.name):
+                            continue
+                        found.append(entry.path)
+                        if entry.is_dir(follow_symlinks=False):
+                            stack.append(entry.path)
+            except OSError:
+                continue
+        return found
+
+    def _read_events(self) -> list[FileChange]:
+        changes = []
+        try:
+            data = os.read(self._fd, 1 << 16)
+        except BlockingIOError:
+            return changes
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, name_len = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            name = os.fsdecode(data[offset:offset + name_len].rstrip(b"\0"))
+            offset += name_len
+
+            if mask & IN_Q_OVERFLOW:
+                changes.extend(FileChange(x, RESCAN, True) for x in self.roots)
+                continue
+            if mask & IN_IGNORED:
+                self._folders.pop(wd, None)
+                continue
+            folder = self._folders.get(wd)
+            if folder is None or mask & (IN_DELETE_SELF | IN_MOVE_SELF):
+                # The parent folder's watch reports the deletion/move of the folder itself
+                continue
+            if _is_hidden(name):
+                continue
+
+            path = os.path.join(folder, name)
+            is_dir = bool(mask & IN_ISDIR)
+            if mask & (IN_DELETE | IN_MOVED_FROM):
+                changes.append(FileChange(path, DELETED, is_dir))
+            elif is_dir:
+                # A folder that was created or moved in may already have contents
+                changes.append(FileChange(path, CREATED, True))
+                failed: list[str] = []
+                for found in self._watch_tree(path, failed):
+                    changes.append(FileChange(found, CREATED, os.path.isdir(found)))
+                # Changes inside of folders without a watch would be missed
+                changes.extend(FileChange(x, RESCAN, True) for x in failed)
+            elif mask & IN_MOVED_TO:
+                changes.append(FileChange(path, CREATED))
+            elif mask & IN_CLOSE_WRITE:
+                changes.append(FileChange(path, MODIFIED))
+        return changes
+
+    def wait(self, timeout: Optional[float] = None) -> list[FileChange]:
+        """
+        Wait until there are changes or the timeout (in seconds) has passed
+        Changes that arrive within `settle` seconds of each other are returned as one batch
+        """
+        if not select.select([self._fd], [], [], timeout)[0]:
+            return []
+        changes = self._read_events()
+        while select.select([self._fd], [], [], self.settle)[0]:
+            changes.extend(self._read_events())
+        return _coalesce(changes)
+
+    def close(self):
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+def create_watcher(roots: Iterable[PathLike], use_inotify: Optional[bool] = None,
+                   poll_interval: float = 1.0) -> Union[InotifyWatcher, PollingWatcher]:
+    """
+    Returns a watcher for the folders below roots
+    :param use_inotify: True to require inotify, False to always poll, None to use inotify if available
+    :param poll_interval: The interval of the polling watcher in seconds
+    """
+    roots = list(roots)
+    if use_inotify:
+        return InotifyWatcher(roots)
+    if use_inotify is None and inotify_available():
+        try:
+            return InotifyWatcher(roots)
+        except OSError as e:
+            # e.g. the inotify watch limit was reached
+            print(f"Failed to set up inotify, falling back to polling: {e}")
+    return PollingWatcher(roots, poll_interval)
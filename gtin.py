@@ -0,0 +1,128 @@
+import re
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Optional, Hashable, Sequence
+
+# GTIN/EAN identifiers of filament sizes
+# A GTIN is 12 (UPC-A), 13 (EAN-13) or 14 (GTIN-14) digits, the last of which is a check digit. Codes of different
+# lengths are the same identifier if they only differ by leading zeros, e.g. the UPC-A "012345678905" is the
+# EAN-13 "0012345678905". normalize_gtin() pads them to 14 digits so equivalent codes compare equal.
+# The sizes schema only accepts 12 or 13 digit gtins and 13 digit eans, see normalize_gtin_ean().
+
+GTIN_PATTERN = re.compile(r"^[0-9]{12,13}$")
+EAN_PATTERN = re.compile(r"^[0-9]{13}$")
+ANY_GTIN_PATTERN = re.compile(r"^[0-9]{12,14}$")
+GTIN_LENGTH = 14
+
+# Issue kinds, see validate_identifiers()
+FORMAT = "format"
+CHECK_DIGIT = "check_digit"
+MISMATCH = "mismatch"
+DUPLICATE = "duplicate"
+
+# The value of a digit times its GTIN weight (3 for odd positions counted from the left of the 14 digit form,
+# 1 otherwise), by ASCII code. Used to weight a whole column of digits in one bytes.translate() call.
+_WEIGHT_TABLES = (bytes.maketrans(b"0123456789", bytes(range(0, 30, 3))),
+                  bytes.maketrans(b"0123456789", bytes(range(10))))
+
+
+def normalize_gtin(code: str) -> str:
+    """Returns the 14 digit form of a 12-14 digit GTIN"""
+    return code.zfill(GTIN_LENGTH)
+
+
+def check_digit(code: str) -> str:
+    """Returns the check digit a 12-14 digit GTIN should have"""
+    total = sum(int(x) * (3 if i % 2 == 0 else 1) for i, x in enumerate(normalize_gtin(code)[:-1]))
+    return str(-total % 10)
+
+
+def check_digits_valid(codes: Sequence[str]) -> list[bool]:
+    """
+    Check the check digits of a batch of 12-14 digit GTINs
+    All codes are padded to 14 digits and joined, then every digit position is weighted as one column
+    (a slice of the joined bytes) and the columns are summed per code. A code is valid if its sum,
+    check digit included, is a multiple of 10. Codes that aren't 12-14 digits are invalid.
+    """
+    well_formed = [isinstance(x, str) and ANY_GTIN_PATTERN.fullmatch(x) is not None for x in codes]
+    blob = "".join(normalize_gtin(x) for x, ok in zip(codes, well_formed) if ok).encode("ascii")
+    columns = [blob[i::GTIN_LENGTH].translate(_WEIGHT_TABLES[i % 2]) for i in range(GTIN_LENGTH)]
+    sums = iter(map(sum, zip(*columns)))
+    return [ok and next(sums) % 10 == 0 for ok in well_formed]
+
+
+def normalize_gtin_ean(gtin: Optional[str], ean: Optional[str]) -> tuple[Optional[str], Optional[str]]:
+    """
+    Strip the gtin and ean of a size and fill in one from the other
+    :raises ValueError: If a value doesn't have the digit count the schema allows, or if both are 13 digits and differ
+    """
+    gtin = gtin.strip() if isinstance(gtin, str) else gtin
+    ean = ean.strip() if isinstance(ean, str) else ean
+
+    if (not gtin) and ean and EAN_PATTERN.fullmatch(ean):
+        gtin = ean
+    if gtin and (not ean) and len(gtin) == 13:
+        ean = gtin
+
+    if gtin is not None and not GTIN_PATTERN.fullmatch(gtin):
+        raise ValueError("Invalid gtin: must be 12 or 13 digits only")
+    if ean is not None and not EAN_PATTERN.fullmatch(ean):
+        raise ValueError("Invalid ean: must be exactly 13 digits")
+    if gtin and ean and len(gtin) == 13 and len(ean) == 13 and gtin != ean:
+        raise ValueError("Mismatch between gtin and ean (both 13 digits); they must match")
+    return gtin, ean
+
+
+@dataclass(frozen=True, slots=True)
+class IdentifierIssue:
+    index: int  # The index of the entry within the batch
+    field: str  # "gtin", "ean" or "gtin/ean"
+    kind: str  # FORMAT, CHECK_DIGIT, MISMATCH or DUPLICATE
+    message: str
+    others: tuple = ()  # DUPLICATE: the owners of the other entries with the same identifier
+
+
+def validate_identifiers(entries: Sequence[tuple[Optional[str], Optional[str], Hashable]]) -> list[IdentifierIssue]:
+    """
+    Validate the identifiers of a batch of sizes
+    :param entries: (gtin, ean, owner) per size. The owner identifies the variant the size belongs to, the same
+                    identifier on sizes of different owners is reported as a DUPLICATE.
+    :returns The issues sorted by entry index. FORMAT and MISMATCH issues break the schema's rules,
+             CHECK_DIGIT and DUPLICATE issues are very likely typos.
+    """
+    issues: list[IdentifierIssue] = []
+    codes: list[tuple[int, str, str]] = []
+    for index, (gtin, ean, _) in enumerate(entries):
+        if gtin is not None:
+            if isinstance(gtin, str) and GTIN_PATTERN.fullmatch(gtin):
+                codes.append((index, "gtin", gtin))
+            else:
+                issues.append(IdentifierIssue(index, "gtin", FORMAT, "must be 12 or 13 digits"))
+        if ean is not None:
+            if isinstance(ean, str) and EAN_PATTERN.fullmatch(ean):
+                # An ean that equals the gtin is the same identifier, it's only checked once
+                if ean != gtin:
+                    codes.append((index, "ean", ean))
+            else:
+                issues.append(IdentifierIssue(index, "ean", FORMAT, "must be exactly 13 digits"))
+        if isinstance(gtin, str) and isinstance(ean, str) and len(gtin) == 13 and len(ean) == 13 and gtin != ean:
+            issues.append(IdentifierIssue(index, "gtin/ean", MISMATCH, "gtin and ean are both 13 digits but not equal"))
+
+    for (index, field, code), valid in zip(codes, check_digits_valid([x[2] for x in codes])):
+        if not valid:
+            issues.append(IdentifierIssue(index, field, CHECK_DIGIT,
+                                          f"{code} has an invalid check digit, expected {check_digit(code)}"))
+
+    owners_by_code: dict[str, dict[Hashable, tuple[int, str]]] = defaultdict(dict)
+    for index, field, code in codes:
+        owners_by_code[normalize_gtin(code)].setdefault(entries[index][2], (index, code))
+    for owners in owners_by_code.values():
+        if len(owners) < 2:
+            continue
+        for owner, (index, code) in owners.items():
+            others = tuple(x for x in owners if x != owner)
+            issues.append(IdentifierIssue(index, "gtin/ean", DUPLICATE,
+                                          f"{code} is also used by {len(others)} other variant(s)", others))
+
+    issues.sort(key=lambda x: x.index)
+    return issues
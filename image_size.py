@@ -0,0 +1,142 @@
+import re
+import struct
+from typing import BinaryIO, Optional
+from xml.etree.ElementTree import ParseError, iterparse
+
+# Logo dimensions without decoding the image
+# PNG, JPEG and WebP files store their dimensions in a header near the start of the file, read_image_size() reads
+# only as far as that header. SVG logos have no pixel size, read_svg_size() reads the width, height and viewBox of
+# the root element with a streaming parser that stops at the root element, not the whole drawing.
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+# JPEG markers of the frame header (SOF) holding the dimensions: C0-CF except DHT (C4), JPG (C8) and DAC (CC)
+JPEG_SOF_MARKERS = frozenset(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+# JPEG markers without a length: TEM, RST0-7, SOI and EOI
+JPEG_STANDALONE_MARKERS = frozenset([0x01, *range(0xD0, 0xDA)])
+
+# The pixels per unit of absolute SVG lengths (CSS units, 96 pixels per inch)
+SVG_UNITS = {"": 1.0, "px": 1.0, "pt": 96 / 72, "pc": 16.0, "mm": 96 / 25.4, "cm": 96 / 2.54, "in": 96.0}
+SVG_LENGTH_PATTERN = re.compile(r"^\s*([+-]?(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?)\s*([a-z]*)\s*$")
+
+
+def _read_exactly(f: BinaryIO, size: int) -> bytes:
+    data = f.read(size)
+    if len(data) != size:
+        raise ValueError("Unexpected end of file")
+    return data
+
+
+def _read_png_size(f: BinaryIO) -> tuple[int, int]:
+    # The IHDR chunk always comes first: length (4 bytes), type, width and height
+    header = _read_exactly(f, 16)
+    if header[4:8] != b"IHDR":
+        raise ValueError("PNG without IHDR chunk")
+    return struct.unpack(">II", header[8:16])
+
+
+def _read_jpeg_size(f: BinaryIO) -> tuple[int, int]:
+    # Skip the segments (EXIF, ICC profiles, tables, ...) until the frame header
+    while True:
+        byte = _read_exactly(f, 1)
+        if byte != b"\xff":
+            raise ValueError("Corrupt JPEG segment")
+        marker = _read_exactly(f, 1)[0]
+        # Markers may be padded with any number of 0xFF fill bytes
+        while marker == 0xFF:
+            marker = _read_exactly(f, 1)[0]
+        if marker in JPEG_STANDALONE_MARKERS:
+            continue
+        if marker == 0xDA:
+            raise ValueError("JPEG without frame header")
+        length = struct.unpack(">H", _read_exactly(f, 2))[0]
+        if length < 2:
+            raise ValueError("Corrupt JPEG segment length")
+        if marker in JPEG_SOF_MARKERS:
+            # Sample precision (1 byte), then height and width
+            height, width = struct.unpack(">xHH", _read_exactly(f, 5))
+            return width, height
+        f.seek(length - 2, 1)
+
+
+def _read_webp_size(f: BinaryIO) -> tuple[int, int]:
+    # The first chunk after "RIFF", the file size and "WEBP" (12 bytes)
+    chunk = _read_exactly(f, 18)
+    kind = chunk[:4]
+    if kind == b"VP8 ":
+        # Frame tag (3 bytes), start code (3 bytes), then 14 bit width and height
+        frame = chunk[8:]
+        if frame[3:6] != b"\x9d\x01\x2a":
+            raise ValueError("Corrupt lossy WebP frame")
+        width, height = struct.unpack("<HH", frame[6:10])
+        return width & 0x3FFF, height & 0x3FFF
+    if kind == b"VP8L":
+        # Signature (1 byte), then 14 bits width - 1 and 14 bits height - 1
+        if chunk[8] != 0x2F:
+            raise ValueError("Corrupt lossless WebP header")
+        bits = int.from_bytes(chunk[9:13], "little")
+        return (bits & 0x3FFF) + 1, (bits >> 14 & 0x3FFF) + 1
+    if kind == b"VP8X":
+        # Flags (4 bytes), then 24 bits canvas width - 1 and 24 bits height - 1
+        return int.from_bytes(chunk[12:15], "little") + 1, int.from_bytes(chunk[15:18], "little") + 1
+    raise ValueError(f"Unknown WebP chunk {kind!r}")
+
+
+def read_image_size(f: BinaryIO) -> tuple[int, int]:
+    """
+    Read the (width, height) of a PNG, JPEG or WebP image from its header
+    :raises ValueError: If the file isn't one of these formats or its header is corrupt
+    """
+    signature = f.read(12)
+    if signature.startswith(PNG_SIGNATURE):
+        f.seek(len(PNG_SIGNATURE))
+        return _read_png_size(f)
+    if signature.startswith(b"\xff\xd8"):
+        f.seek(2)
+        return _read_jpeg_size(f)
+    if signature.startswith(b"RIFF") and signature[8:12] == b"WEBP":
+        return _read_webp_size(f)
+    raise ValueError("Not a PNG, JPEG or WebP image")
+
+
+def parse_svg_length(value: Optional[str]) -> Optional[float]:
+    """Returns an absolute SVG length in pixels, None if missing or relative (e.g. "100%" or "2em")"""
+    match = SVG_LENGTH_PATTERN.fullmatch(value) if value is not None else None
+    if match is None or match.group(2) not in SVG_UNITS:
+        return None
+    return float(match.group(1)) * SVG_UNITS[match.group(2)]
+
+
+def read_svg_size(f: BinaryIO) -> tuple[float, float]:
+    """
+    Read the (width, height) an SVG is displayed at, in pixels if given as absolute lengths, or else the
+    size of its viewBox. Only the aspect ratio is meaningful if a length is missing.
+    :raises ValueError: If the file isn't an SVG or has no width, height or viewBox to take the size from
+    """
+    try:
+        _, root = next(iterparse(f, events=("start",)))
+    except (ParseError, StopIteration) as e:
+        raise ValueError(f"Invalid XML: {e}") from None
+    if root.tag.rpartition("}")[2] != "svg":
+        raise ValueError(f"The root element is <{root.tag}>, not <svg>")
+
+    width = parse_svg_length(root.get("width"))
+    height = parse_svg_length(root.get("height"))
+    if width is not None and height is not None:
+        return width, height
+
+    view_box = root.get("viewBox")
+    if view_box is None:
+        raise ValueError("No width, height or viewBox")
+    try:
+        _, _, box_width, box_height = (float(x) for x in view_box.replace(",", " ").split())
+    except ValueError:
+        raise ValueError(f"Invalid viewBox '{view_box}'") from None
+    if box_width <= 0 or box_height <= 0:
+        raise ValueError(f"Invalid viewBox '{view_box}'")
+    # A single absolute length is scaled by the aspect ratio of the viewBox. The ratio is computed first, so a
+    # square viewBox gives exactly the same width and height.
+    if width is not None:
+        return width, width * (box_height / box_width)
+    if height is not None:
+        return height * (box_width / box_height), height
+    return box_width, box_height
@@ -0,0 +1,171 @@
+import json
+import math
+import os
+import re
+from json import JSONDecodeError
+from typing import Any, Optional, Union, TextIO
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+PathLike = Union[str, os.PathLike[str]]
+
+# Shared JSON codec
+# All JSON documents are read and written through here. If orjson is installed it does the parsing and encoding,
+# otherwise (or when set_backend("stdlib") was called) the json module is used.
+# The output is always byte-identical to json.dumps() with the same arguments: for formats orjson can't produce,
+# and for the few values it writes differently, the json module is used instead.
+# Parse errors are the json module's, documents orjson rejects are re-parsed by it. This also keeps accepting
+# what the json module accepts but orjson doesn't (NaN/Infinity). Integers over 64 bits, which orjson would
+# parse as floats, and NaN/Infinity, which it would write as null, are left to the json module as well.
+
+__all__ = ["JSONDecodeError", "available_backends", "set_backend", "get_backend", "loads", "load_file", "dumps",
+           "dumps_bytes", "dump"]
+
+backend = "orjson" if orjson is not None else "stdlib"
+
+# orjson writes exponents differently (1e-5 instead of 1e-05), output that may contain one is re-encoded
+_EXPONENT_PATTERN = re.compile(rb"[0-9][eE][-+]?[0-9]")
+# orjson parses integers outside of the 64 bit range as floats, documents with a number that may be one
+# (19 or more digits) are parsed by the json module. Digits are translated to "1" and everything else to "0",
+# which finds a run of digits many times faster than a regular expression.
+_DIGIT_TABLE = bytes(ord("1") if chr(x).isdigit() and x < 128 else ord("0") for x in range(256))
+_LONG_NUMBER = b"1" * 19
+# orjson writes NaN and (-)Infinity as null, output containing a null is checked for them
+_NULL = b"null"
+# Types the json module rejects but orjson would serialize
+_ORJSON_OPTIONS = 0 if orjson is None else orjson.OPT_PASSTHROUGH_DATACLASS | orjson.OPT_PASSTHROUGH_DATETIME
+
+
+def available_backends() -> list[str]:
+    return ["orjson", "stdlib"] if orjson is not None else ["stdlib"]
+
+
+def set_backend(name: str):
+    """Select the backend, "orjson" or "stdlib" (e.g. to compare them)"""
+    global backend
+    if name not in available_backends():
+        raise ValueError(f"The JSON backend {name} is not available, available: {', '.join(available_backends())}")
+    backend = name
+
+
+def get_backend() -> str:
+    return backend
+
+
+# ---------------------------------
+# Decoding
+# ---------------------------------
+
+def loads(data: Union[bytes, str]) -> Any:
+    """
+    Parse a JSON document, bytes are decoded as UTF-8
+    Raises JSONDecodeError or UnicodeDecodeError like json.loads(data.decode("utf8")) would
+    """
+    if backend == "orjson":
+        raw = data.encode("utf8", "surrogatepass") if isinstance(data, str) else bytes(data)
+        if _LONG_NUMBER not in raw.translate(_DIGIT_TABLE):
+            try:
+                return orjson.loads(data)
+            except orjson.JSONDecodeError:
+                pass
+    if not isinstance(data, str):
+        data = bytes(data).decode("utf8")
+    return json.loads(data)
+
+
+def load_file(path: PathLike) -> Any:
+    """Read the whole file at path in one go and parse it"""
+    with open(path, mode="rb") as f:
+        return loads(f.read())
+
+
+# ---------------------------------
+# Encoding
+# ---------------------------------
+
+def _reindent(out: bytes, indent: int) -> bytes:
+    """
+    Change the 2 space indentation of orjson's output to `indent` spaces
+    Strings can't contain raw newlines, so the spaces after every newline are indentation. Pass n re-indents every
+    line at depth n or deeper by one level, lines above depth n already have fewer spaces than the searched prefix.
+    """
+    depth = 1
+    while True:
+        prefix = b"\n" + b" " * (indent * (depth - 1) + 2)
+        if prefix not in out:
+            return out
+        out = out.replace(prefix, b"\n" + b" " * (indent * depth))
+        depth += 1
+
+
+def _has_non_finite(data) -> bool:
+    """Whether data contains a NaN or (-)Infinity float, which json.dumps() writes as NaN/Infinity"""
+    if isinstance(data, float):
+        return data != data or data in (math.inf, -math.inf)
+    if isinstance(data, dict):
+        return any(_has_non_finite(x) for x in data.values())
+    if isinstance(data, (list, tuple)):
+        return any(_has_non_finite(x) for x in data)
+    return False
+
+
+def _orjson_dumps(data, indent: Optional[int], ensure_ascii: bool, sort_keys: bool,
+                  separators: Optional[tuple[str, str]]) -> Optional[bytes]:
+    """
+    Returns orjson's output formatted the way json.dumps() formats it
+    None is returned if the format isn't one orjson can produce or if the output may differ
+    """
+    if indent is None:
+        # orjson's compact output has no whitespace
+        if separators != (",", ":"):
+            return None
+        option = _ORJSON_OPTIONS
+    else:
+        if not isinstance(indent, int) or indent <= 0 or separators not in (None, (",", ": ")):
+            return None
+        option = _ORJSON_OPTIONS | orjson.OPT_INDENT_2
+    if sort_keys:
+        option |= orjson.OPT_SORT_KEYS
+
+    try:
+        out = orjson.dumps(data, option=option)
+    except orjson.JSONEncodeError:
+        # e.g. non-string keys, integers over 64 bits, lone surrogates
+        return None
+    if (ensure_ascii and not out.isascii()) or _EXPONENT_PATTERN.search(out):
+        return None
+    if _NULL in out and _has_non_finite(data):
+        return None
+    if indent is not None and indent != 2:
+        out = _reindent(out, indent)
+    return out
+
+
+def dumps(data, indent: Optional[int] = None, ensure_ascii=True, sort_keys=False,
+          separators: Optional[tuple[str, str]] = None) -> str:
+    """Returns the same string as json.dumps() with the same arguments"""
+    if backend == "orjson":
+        out = _orjson_dumps(data, indent, ensure_ascii, sort_keys, separators)
+        if out is not None:
+            return out.decode("utf8")
+    return json.dumps(data, indent=indent, ensure_ascii=ensure_ascii, sort_keys=sort_keys, separators=separators)
+
+
+def dumps_bytes(data, indent: Optional[int] = None, ensure_ascii=True, sort_keys=False,
+                separators: Optional[tuple[str, str]] = None) -> bytes:
+    """Returns dumps() encoded as UTF-8"""
+    if backend == "orjson":
+        out = _orjson_dumps(data, indent, ensure_ascii, sort_keys, separators)
+        if out is not None:
+            return out
+    return json.dumps(data, indent=indent, ensure_ascii=ensure_ascii, sort_keys=sort_keys,
+                      separators=separators).encode("utf8")
+
+
+def dump(data, fp: TextIO, indent: Optional[int] = None, ensure_ascii=True, sort_keys=False,
+         separators: Optional[tuple[str, str]] = None):
+    """Write dumps() to a text file in one write"""
+    fp.write(dumps(data, indent, ensure_ascii, sort_keys, separators))
@@ -1,5 +1,4 @@
 import fileinput
-import json
 import os
 import re
 import shutil
@@ -11,6 +10,8 @@ from zipfile import ZipFile
 import iniconfig
 from iniconfig import IniConfig, ParseError
 
+import json_codec
+
 iniconfig.COMMENTCHARS = ""
 
 PathLike = Union[str, os.PathLike[str]]
@@ -130,7 +131,7 @@ def split_prusaslicer_bundle(path: Path):
         data_out = squash_inherits(name)
         data_out["filament_settings_id"] = name
         with out_path.open("w") as f:
-            json.dump(data_out, f, indent=4)
+            json_codec.dump(data_out, f, indent=4)
 
 
 def unpack_prusaslicer_bundles():
@@ -188,8 +189,7 @@ def squash_slic3r_profiles(slicer_name: str, filament_library_name: Optional[str
                 continue
             if _item.suffix != ".json":
                 continue
-            with _item.open() as f:
-                file_data = json.load(f)
+            file_data = json_codec.load_file(_item)
 
             name: str
             if "name" in file_data:
@@ -250,7 +250,7 @@ def squash_slic3r_profiles(slicer_name: str, filament_library_name: Optional[str
                 continue
             path.parent.mkdir(parents=True, exist_ok=True)
             with path.open("w") as f:
-                json.dump(squash_inherits(name), f, indent=4)
+                json_codec.dump(squash_inherits(name), f, indent=4)
 
 
 def load_overlay_profiles(overlay_path: PathLike = "./overlay"):
@@ -0,0 +1,51 @@
+import json
+import os
+from pathlib import Path
+
+import pytest
+from PIL import Image
+
+SCHEMAS_DIR = Path(__file__).resolve().parent.parent.joinpath("schemas")
+STORE = {"id": "store1", "name": "Store 1", "storefront_url": "https://store1.example/", "logo": "store1.png",
+         "ships_from": ["SE"], "ships_to": []}
+BRAND = {"brand": "Brand", "website": "https://brand.example/", "logo": "brand.png", "origin": "Unknown"}
+# The variants of Brand/PLA/Basic and the GTIN of their only size
+VARIANTS = {"Black": "4006381333931", "Black Matte": "036000291452"}
+
+
+def write_json(path: Path, data):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(data, indent=2))
+
+
+def sizes(color_name: str, code: str, store_id: str = "store1") -> list[dict]:
+    return [{"filament_weight": 1000, "diameter": 1.75, "gtin": code,
+             "purchase_links": [{"store_id": store_id, "url": f"https://store1.example/{color_name}",
+                                 "affiliate": False}]}]
+
+
+@pytest.fixture
+def validation_tree(tmp_path, monkeypatch) -> Path:
+    """
+    A data and stores folder without errors, made the working directory like the repository is for the validator
+    Brand/PLA/Basic has a variant for each of VARIANTS, the sizes of each link to the only store, store1
+    """
+    monkeypatch.chdir(tmp_path)
+    # The validator reads the schemas relative to the working directory
+    os.symlink(SCHEMAS_DIR, tmp_path.joinpath("schemas"))
+
+    store_dir = tmp_path.joinpath("stores", "store1")
+    write_json(store_dir.joinpath("store.json"), STORE)
+    Image.new("RGB", (100, 100)).save(store_dir.joinpath("store1.png"))
+
+    brand_dir = tmp_path.joinpath("data", "Brand")
+    write_json(brand_dir.joinpath("brand.json"), BRAND)
+    Image.new("RGB", (100, 100)).save(brand_dir.joinpath("brand.png"))
+    write_json(brand_dir.joinpath("PLA", "material.json"), {"material": "PLA"})
+    write_json(brand_dir.joinpath("PLA", "Basic", "filament.json"),
+               {"name": "Basic", "density": 1.24, "diameter_tolerance": 0.02})
+    for color_name, code in VARIANTS.items():
+        variant_dir = brand_dir.joinpath("PLA", "Basic", color_name)
+        write_json(variant_dir.joinpath("variant.json"), {"color_name": color_name, "color_hex": "#000000"})
+        write_json(variant_dir.joinpath("sizes.json"), sizes(color_name, code))
+    return tmp_path
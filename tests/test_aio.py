@@ -0,0 +1,119 @@
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+from conftest import VARIANTS, sizes, write_json
+from data_validator import ValidationOrchestrator
+from db_serializer import (AIO_FILE_SUFFIX, Material, aio_to_material_folder, load_brands, load_store_folders,
+                           material_folder_to_aio)
+
+BRAND_DIR = Path("data", "Brand")
+MATERIAL_DIR = BRAND_DIR.joinpath("PLA")
+AIO_FILE = BRAND_DIR.joinpath(f"PLA{AIO_FILE_SUFFIX}")
+PETG = {"material": "PETG", "filaments": [
+    {"name": "Basic", "density": 1.27, "diameter_tolerance": 0.02, "variants": [
+        {"color_name": "Red", "color_hex": "#FF0000", "sizes": sizes("Red", "5901234123457")},
+        {"color_name": "Blue", "color_hex": "#0000FF", "sizes": sizes("Blue", "9780201379624")},
+    ]},
+]}
+
+
+def _files(folder: Path) -> dict[str, bytes]:
+    return {str(x.relative_to(folder)): x.read_bytes() for x in sorted(folder.rglob("*")) if x.is_file()}
+
+
+def _errors(result) -> list[tuple[str, str]]:
+    return sorted((x.path.name, x.message) for x in result.errors)
+
+
+def test_round_trip_is_exact(validation_tree):
+    before = _files(MATERIAL_DIR)
+    assert material_folder_to_aio(MATERIAL_DIR, remove_source=True) == AIO_FILE
+    assert not MATERIAL_DIR.exists()
+    assert json.loads(AIO_FILE.read_text())["filaments"][0]["variants"][0]["sizes"] == sizes("Black", VARIANTS["Black"])
+
+    assert aio_to_material_folder(AIO_FILE, remove_source=True) == MATERIAL_DIR
+    assert not AIO_FILE.exists()
+    assert _files(MATERIAL_DIR) == before
+
+
+def test_round_trip_from_the_command_line(validation_tree):
+    before = _files(MATERIAL_DIR)
+    script = Path(__file__).resolve().parent.parent.joinpath("db_serializer.py")
+    for args in (["--to-aio", str(MATERIAL_DIR)], ["--from-aio", str(AIO_FILE)]):
+        process = subprocess.run([sys.executable, str(script), *args, "--remove-source"], capture_output=True,
+                                 text=True)
+        assert process.returncode == 0, process.stderr
+        assert "Converted" in process.stdout
+    assert _files(MATERIAL_DIR) == before
+
+
+def test_to_aio_refuses_changes(validation_tree):
+    # Another formatting than the one the AIO file would be converted back to
+    variant_file = MATERIAL_DIR.joinpath("Basic", "Black", "variant.json")
+    variant_file.write_text(json.dumps({"color_name": "Black", "color_hex": "#000000"}, indent=4))
+    assert material_folder_to_aio(MATERIAL_DIR, remove_source=True) is None
+    assert not AIO_FILE.exists()
+    assert material_folder_to_aio(MATERIAL_DIR, normalize=True) == AIO_FILE
+
+    # A file the AIO file can't hold
+    AIO_FILE.unlink()
+    write_json(variant_file, {"color_name": "Black", "color_hex": "#000000"})
+    MATERIAL_DIR.joinpath("Basic", "notes.json").write_text("{}")
+    assert material_folder_to_aio(MATERIAL_DIR) is None
+    assert not AIO_FILE.exists()
+
+
+def test_from_aio_refuses_changes(validation_tree):
+    aio_file = BRAND_DIR.joinpath(f"PETG{AIO_FILE_SUFFIX}")
+    aio_file.write_text(json.dumps(PETG, indent=4))
+    assert aio_to_material_folder(aio_file) is None
+    assert not BRAND_DIR.joinpath("PETG").exists()
+
+    # Two variants would share a folder
+    petg = json.loads(json.dumps(PETG))
+    petg["filaments"][0]["variants"][1]["color_name"] = "Red"
+    write_json(aio_file, petg)
+    assert aio_to_material_folder(aio_file) is None
+    assert not BRAND_DIR.joinpath("PETG").exists()
+
+    # The material folder exists already
+    write_json(aio_file, dict(PETG, material="PLA"))
+    assert aio_to_material_folder(aio_file) is None
+
+    write_json(aio_file, PETG)
+    assert aio_to_material_folder(aio_file) == BRAND_DIR.joinpath("PETG")
+    assert aio_file.exists()
+
+
+def test_aio_material_loads(validation_tree):
+    write_json(BRAND_DIR.joinpath(f"PETG{AIO_FILE_SUFFIX}"), PETG)
+    brand, = load_brands("data", store_map=load_store_folders("stores"))
+    material = next(x for x in brand.materials if x.material_name == "PETG")
+    assert material._aio_file
+    assert [x.color_name for x in material.filaments[0].variants] == ["Red", "Blue"]
+    assert material.filaments[0].variants[0].sizes[0].purchase_links[0].store.store_id == "store1"
+    assert Material.from_aio_file(BRAND_DIR.joinpath(f"PETG{AIO_FILE_SUFFIX}"),
+                                  store_map=load_store_folders("stores")).to_aio_dict() == material.to_aio_dict()
+
+
+def test_aio_names(validation_tree):
+    write_json(BRAND_DIR.joinpath(f"PETG{AIO_FILE_SUFFIX}"), PETG)
+    assert ValidationOrchestrator(executor="inline").validate_all().errors == []
+
+    petg = json.loads(json.dumps(PETG))
+    petg["filaments"][0]["variants"][1]["color_name"] = "Red"
+    petg["filaments"].append(PETG["filaments"][0])
+    write_json(BRAND_DIR.joinpath(f"PETG{AIO_FILE_SUFFIX}"), petg)
+    write_json(BRAND_DIR.joinpath(f"Other{AIO_FILE_SUFFIX}"), PETG)
+    write_json(AIO_FILE, dict(PETG, material="PLA"))
+    # Leaving out the duplicate codes of the copied sizes
+    errors = [x for x in _errors(ValidationOrchestrator(executor="inline").validate_all()) if " name " in x[1] or
+              "both" in x[1]]
+    assert errors == [
+        (f"Other{AIO_FILE_SUFFIX}", "AIO file name 'Other' does not match 'material' value 'PETG'"),
+        (f"PETG{AIO_FILE_SUFFIX}", "Duplicate filament name 'Basic' at $.filaments[1]"),
+        (f"PETG{AIO_FILE_SUFFIX}", "Duplicate variant name 'Red' at $.filaments[0].variants[1]"),
+        (f"PLA{AIO_FILE_SUFFIX}", "Material 'PLA' is stored both as a folder and as an AIO file"),
+    ]
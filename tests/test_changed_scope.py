@@ -0,0 +1,113 @@
+import subprocess
+from pathlib import Path
+
+import pytest
+
+import data_validator
+from conftest import STORE, VARIANTS, sizes, write_json
+from data_validator import (ValidationOrchestrator, ValidationResult, ValidationScope, changed_scope,
+                            git_changed_paths, git_old_facts)
+from gtin import normalize_gtin
+
+VARIANT_DIR = Path("data", "Brand", "PLA", "Basic")
+# More variants linking store1, next to the ones of the validation_tree
+MORE_VARIANTS = {"White": "5901234123457", "Grey": "9780201379624"}
+
+
+def _git(*args: str):
+    subprocess.run(["git", "-c", "user.name=Test", "-c", "user.email=test@example.com", *args], check=True,
+                   capture_output=True)
+
+
+@pytest.fixture
+def checkout(validation_tree) -> Path:
+    for color_name, code in MORE_VARIANTS.items():
+        write_json(VARIANT_DIR.joinpath(color_name, "variant.json"), {"color_name": color_name, "color_hex": "#000000"})
+        write_json(VARIANT_DIR.joinpath(color_name, "sizes.json"), sizes(color_name, code))
+    _git("init", "-q")
+    _git("add", "data", "stores", "schemas")
+    _git("commit", "-q", "-m", "Initial")
+    return validation_tree
+
+
+def _orchestrator() -> ValidationOrchestrator:
+    return ValidationOrchestrator(Path("data"), Path("stores"), executor="inline")
+
+
+def _scoped(rev: str) -> tuple[ValidationScope, ValidationResult]:
+    """The scope of the changes since rev and the cross-file errors within it"""
+    orchestrator = _orchestrator()
+    orchestrator.scope = changed_scope(git_changed_paths(rev), orchestrator.manifest, orchestrator.cache,
+                                       git_old_facts(rev))
+    result = orchestrator.validate_store_ids()
+    result.merge(orchestrator.validate_gtin())
+    return orchestrator.scope, result
+
+
+def _full() -> ValidationResult:
+    orchestrator = _orchestrator()
+    result = orchestrator.validate_store_ids()
+    result.merge(orchestrator.validate_gtin())
+    return result
+
+
+def _errors(result: ValidationResult) -> list[tuple[str, str, str]]:
+    return sorted((x.category, x.message, str(x.path)) for x in result.errors)
+
+
+def test_store_id_rename_reaches_the_files_linking_it(checkout):
+    write_json(Path("stores", "store1", "store.json"), dict(STORE, id="store2"))
+    assert git_changed_paths("HEAD") == [Path("stores", "store1", "store.json")]
+
+    scope, result = _scoped("HEAD")
+    assert scope.store_ids == {"store1", "store2"}
+    dependents = {x.path.parent.name for x in result.errors if x.category == "StoreID"}
+    assert dependents == {*VARIANTS, *MORE_VARIANTS}
+    assert len(dependents) == 4
+    assert _errors(result) == _errors(_full())
+
+
+def test_code_change_reaches_the_duplicates(checkout):
+    # Black takes the code of Black Matte, whose file doesn't change
+    write_json(VARIANT_DIR.joinpath("Black", "sizes.json"), sizes("Black", VARIANTS["Black Matte"]))
+    scope, result = _scoped("HEAD")
+    assert scope.codes == {normalize_gtin(VARIANTS["Black"]), normalize_gtin(VARIANTS["Black Matte"])}
+    assert {x.path.parent.name for x in result.errors} == {"Black", "Black Matte"}
+    assert _errors(result) == _errors(_full())
+
+
+def test_old_codes_reach_the_former_duplicates(checkout):
+    write_json(VARIANT_DIR.joinpath("Black", "sizes.json"), sizes("Black", VARIANTS["Black Matte"]))
+    _git("commit", "-q", "-am", "Duplicate")
+    assert {x.path.parent.name for x in _full().errors} == {"Black", "Black Matte"}
+
+    # Resolving the duplicate in Black puts Black Matte in scope through the code Black had before
+    write_json(VARIANT_DIR.joinpath("Black", "sizes.json"), sizes("Black", VARIANTS["Black"]))
+    scope, result = _scoped("HEAD")
+    assert normalize_gtin(VARIANTS["Black Matte"]) in scope.codes
+    assert scope.includes_path(VARIANT_DIR.joinpath("Black"))
+    assert result.errors == _full().errors == []
+
+
+def test_deleted_and_untracked_files(checkout):
+    VARIANT_DIR.joinpath("Grey", "sizes.json").unlink()
+    write_json(VARIANT_DIR.joinpath("Blue", "variant.json"), {"color_name": "Blue", "color_hex": "#0000FF"})
+    assert sorted(git_changed_paths("HEAD")) == [VARIANT_DIR.joinpath("Blue", "variant.json"),
+                                                 VARIANT_DIR.joinpath("Grey", "sizes.json")]
+
+    # The codes of a deleted file are read from the revision
+    scope, _ = _scoped("HEAD")
+    assert scope.codes == {normalize_gtin(MORE_VARIANTS["Grey"])}
+    assert scope.includes_path(VARIANT_DIR.joinpath("Blue"))
+    assert not scope.includes_path(VARIANT_DIR.joinpath("Black"))
+
+
+def test_changed_validator_validates_everything(checkout):
+    orchestrator = _orchestrator()
+    changed = [Path(data_validator.__file__)]
+    assert changed_scope(changed, orchestrator.manifest, orchestrator.cache, git_old_facts("HEAD")) is None
+
+
+def test_unknown_revision(checkout):
+    with pytest.raises(subprocess.CalledProcessError):
+        git_changed_paths("missing")
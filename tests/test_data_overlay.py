@@ -0,0 +1,43 @@
+import json
+from pathlib import Path
+
+import db_serializer
+from data_overlay import LayeredData
+
+STORE = {"id": "overlaystore", "name": "Overlay Store", "storefront_url": "https://store.example/",
+         "logo": "store.png", "ships_from": ["SE"], "ships_to": []}
+LINK = {"store_id": "overlaystore", "url": "https://store.example/black", "affiliate": False}
+
+
+def _write(path: Path, data):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(data, indent=4))
+
+
+def _write_base(root: Path):
+    brand_dir = root.joinpath("data", "Brand")
+    _write(brand_dir.joinpath("brand.json"), {"brand": "Brand", "website": "https://brand.example/",
+                                              "logo": "brand.png", "origin": "Unknown"})
+    _write(brand_dir.joinpath("PLA", "material.json"), {"material": "PLA"})
+    _write(brand_dir.joinpath("PLA", "Basic", "filament.json"), {"name": "Basic", "density": 1.24,
+                                                                "diameter_tolerance": 0.02})
+    _write(brand_dir.joinpath("PLA", "Basic", "Black", "variant.json"), {"color_name": "Black",
+                                                                        "color_hex": "#000000"})
+    _write(brand_dir.joinpath("PLA", "Basic", "Black", "sizes.json"), [{"filament_weight": 1000, "diameter": 1.75}])
+    root.joinpath("stores").mkdir()
+
+
+def test_links_resolve_to_the_merged_stores(tmp_path):
+    _write_base(tmp_path.joinpath("base"))
+    overlay = tmp_path.joinpath("overlay")
+    _write(overlay.joinpath("stores", "overlaystore", "store.json"), STORE)
+    _write(overlay.joinpath("data", "Brand", "PLA", "Basic", "Black", "sizes.json"),
+           [{"filament_weight": 1000, "diameter": 1.75, "purchase_links": [LINK]}])
+
+    loaded_stores = db_serializer.stores
+    brands, stores = LayeredData(tmp_path.joinpath("base"), [overlay]).load()
+    link = brands[0].materials[0].filaments[0].variants[0].sizes[0].purchase_links[0]
+    assert link.store is stores["overlaystore"]
+    # Loading a view doesn't replace the stores other code loaded
+    assert db_serializer.stores is loaded_stores
+    assert "overlaystore" not in db_serializer.stores
@@ -0,0 +1,42 @@
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+from conftest import VARIANTS, sizes, write_json
+
+VARIANT_DIR = Path("data", "Brand", "PLA", "Basic")
+SCRIPT = Path(__file__).resolve().parent.parent.joinpath("data_validator.py")
+
+
+def _run(*args: str) -> subprocess.CompletedProcess:
+    return subprocess.run([sys.executable, str(SCRIPT), "--no-cache", "--executor", "inline", *args],
+                          capture_output=True, text=True)
+
+
+@pytest.mark.parametrize("args", [(), ("--allow-warnings",)])
+def test_clean_tree_passes(validation_tree, args):
+    process = _run(*args)
+    assert process.returncode == 0, process.stdout
+    assert "All validations passed!" in process.stdout
+
+
+def test_warnings_fail_unless_allowed(validation_tree):
+    # A duplicate GTIN is a warning
+    write_json(VARIANT_DIR.joinpath("Black", "sizes.json"), sizes("Black", VARIANTS["Black Matte"]))
+    process = _run()
+    assert process.returncode == 1
+    assert "Validation failed: 0 errors, 2 warnings" in process.stdout
+
+    process = _run("--allow-warnings")
+    assert process.returncode == 0
+    assert "All validations passed with 2 warnings" in process.stdout
+
+
+def test_errors_fail_with_allowed_warnings(validation_tree):
+    write_json(VARIANT_DIR.joinpath("Black", "sizes.json"), sizes("Black", VARIANTS["Black"], store_id="missing"))
+    for args in ((), ("--allow-warnings",)):
+        process = _run(*args)
+        assert process.returncode == 1
+        assert "Validation failed: 1 errors, 0 warnings" in process.stdout
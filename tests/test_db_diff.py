@@ -0,0 +1,87 @@
+import json
+from pathlib import Path
+
+from db_diff import diff_trees, tree_from_folder
+
+STORE = {"id": "store1", "name": "Store 1", "storefront_url": "https://store1.example/", "logo": "store1.png"}
+BRAND = {"brand": "Brand", "website": "https://brand.example/", "logo": "brand.png", "origin": "Unknown"}
+SIZE = {"filament_weight": 1000, "diameter": 1.75, "ean": "7340002118178",
+        "purchase_links": [{"store_id": "store1", "url": "https://store1.example/black", "affiliate": False}]}
+
+
+def _write_checkout(root: Path, sizes: list[dict], stores: list[dict]):
+    for store in stores:
+        store_dir = root.joinpath("stores", store["id"])
+        store_dir.mkdir(parents=True)
+        store_dir.joinpath("store.json").write_text(json.dumps(store))
+    variant_dir = root.joinpath("data", "Brand", "PLA", "Basic", "Black")
+    variant_dir.mkdir(parents=True)
+    variant_dir.parents[2].joinpath("brand.json").write_text(json.dumps(BRAND))
+    variant_dir.parents[1].joinpath("material.json").write_text(json.dumps({"material": "PLA"}))
+    variant_dir.parent.joinpath("filament.json").write_text(json.dumps({"name": "Basic", "density": 1.24}))
+    variant_dir.joinpath("variant.json").write_text(json.dumps({"color_name": "Black", "color_hex": "#000000"}))
+    variant_dir.joinpath("sizes.json").write_text(json.dumps(sizes))
+
+
+def _diff(tmp_path: Path, old_sizes: list[dict], new_sizes: list[dict], new_stores: list[dict]) -> list[dict]:
+    _write_checkout(tmp_path.joinpath("old"), old_sizes, [STORE])
+    _write_checkout(tmp_path.joinpath("new"), new_sizes, new_stores)
+    return list(diff_trees(tree_from_folder(tmp_path.joinpath("old")), tree_from_folder(tmp_path.joinpath("new"))))
+
+
+def test_unchanged_checkout_has_no_changes(tmp_path):
+    assert _diff(tmp_path, [SIZE], [SIZE], [STORE]) == []
+
+
+def test_link_to_missing_store_does_not_change_size(tmp_path):
+    link = dict(SIZE["purchase_links"][0], store_id="missing")
+    records = _diff(tmp_path, [SIZE], [dict(SIZE, purchase_links=[link])], [STORE])
+    assert sorted((x["op"], x["kind"]) for x in records) == [("added", "purchase_link"), ("removed", "purchase_link")]
+
+
+def test_one_sided_load_failure_compares_raw_documents(tmp_path):
+    # The new checkout lost the link's store, so only the old side of the link loads through the model
+    link = dict(SIZE["purchase_links"][0], url="https://store1.example/black-v2")
+    records = [x for x in _diff(tmp_path, [SIZE], [dict(SIZE, purchase_links=[link])], []) if x["kind"] != "store"]
+    assert records == [{
+        "op": "modified",
+        "kind": "purchase_link",
+        "path": "brand:Brand/material:PLA/filament:Basic/variant:Black/size:1000g@1.75mm/purchase_link:store1",
+        "changes": {"url": {"old": "https://store1.example/black", "new": "https://store1.example/black-v2"}},
+    }]
+
+
+def test_edit_of_duplicate_size_does_not_re_pair_its_siblings(tmp_path):
+    second = dict(SIZE, ean="5903175652195", purchase_links=[])
+    old_sizes = [dict(SIZE, purchase_links=[]), second]
+    records = _diff(tmp_path, old_sizes, [dict(SIZE, filament_weight=750, purchase_links=[]), second], [STORE])
+    assert sorted((x["op"], x["path"].rsplit("/", 1)[1]) for x in records) == [
+        ("added", "size:750g@1.75mm"), ("removed", "size:1000g@1.75mm")]
+
+
+def test_duplicate_sizes_are_keyed_by_their_codes(tmp_path):
+    second = dict(SIZE, ean="5903175652195", purchase_links=[])
+    third = {"filament_weight": 1000, "diameter": 1.75, "article_number": "80443"}
+    link = dict(SIZE["purchase_links"][0], url="https://store1.example/black-v2")
+    old_sizes = [SIZE, second, third]
+    records = _diff(tmp_path, old_sizes, [SIZE, dict(second, purchase_links=[link]), third], [STORE])
+    assert [(x["op"], x["path"].rsplit("/", 2)[1]) for x in records] == [
+        ("added", "size:1000g@1.75mm#gtin:5903175652195")]
+
+
+def test_reordered_sizes_are_unchanged(tmp_path):
+    second = dict(SIZE, ean="5903175652195", purchase_links=[])
+    assert _diff(tmp_path, [SIZE, second], [second, SIZE], [STORE]) == []
+
+
+def test_building_a_tree_leaves_the_loaded_stores(tmp_path):
+    import db_serializer
+
+    loaded_stores = db_serializer.stores
+    _write_checkout(tmp_path, [SIZE], [STORE])
+    size = tree_from_folder(tmp_path).children["brand:Brand"].children["material:PLA"].children["filament:Basic"] \
+        .children["variant:Black"].children["size:1000g@1.75mm"]
+    # The link is loaded with the checkout's stores, not the stores loaded from the repo
+    assert size.children["purchase_link:store1"].normalized
+    assert db_serializer.stores is loaded_stores
+    assert "store1" not in db_serializer.stores
@@ -0,0 +1,49 @@
+import json
+from pathlib import Path
+
+from db_rebrands import find_rebrands
+from db_serializer import load_brands
+
+RED, GREEN, BLUE, WHITE = "#FF0000", "#00FF00", "#0000FF", "#FFFFFF"
+
+
+def _write_filament(root: Path, brand: str, filament: str, density: float, colors: list[str]):
+    brand_dir = root.joinpath(brand)
+    brand_dir.mkdir(exist_ok=True)
+    brand_dir.joinpath("brand.json").write_text(json.dumps({
+        "brand": brand, "website": f"https://{brand.lower()}.example/", "logo": "logo.png", "origin": "Unknown"
+    }))
+    material_dir = brand_dir.joinpath("PLA")
+    material_dir.mkdir(exist_ok=True)
+    material_dir.joinpath("material.json").write_text(json.dumps({"material": "PLA"}))
+    filament_dir = material_dir.joinpath(filament)
+    filament_dir.mkdir()
+    filament_dir.joinpath("filament.json").write_text(json.dumps({"name": filament, "density": density,
+                                                                  "diameter_tolerance": 0.02}))
+    for color in colors:
+        variant_dir = filament_dir.joinpath(color.lstrip("#"))
+        variant_dir.mkdir()
+        variant_dir.joinpath("variant.json").write_text(json.dumps({"color_name": color.lstrip("#"),
+                                                                    "color_hex": color}))
+        variant_dir.joinpath("sizes.json").write_text(json.dumps([{"filament_weight": 1000, "diameter": 1.75}]))
+
+
+def _clusters(root: Path) -> list[tuple[float, list[str]]]:
+    return [(x.score, [f"{y.brand} {y.filament}" for y in x.members]) for x in find_rebrands(load_brands(root))]
+
+
+def test_clusters_hold_one_filament_per_brand(tmp_path):
+    # Both filaments of A match B and C equally well, only one of them can be their rebrand
+    _write_filament(tmp_path, "A", "Basic", 1.24, [RED, GREEN, BLUE])
+    _write_filament(tmp_path, "A", "Silk", 1.24, [RED, GREEN, BLUE])
+    _write_filament(tmp_path, "B", "PLA", 1.24, [RED, GREEN, BLUE])
+    _write_filament(tmp_path, "C", "PLA", 1.25, [RED, GREEN, BLUE])
+    assert _clusters(tmp_path) == [(0.7167, ["A Basic", "B PLA", "C PLA"])]
+
+
+def test_clusters_do_not_chain_through_one_neighbour(tmp_path):
+    # B is close to both A and C, but A and C are too far apart to be the same product
+    _write_filament(tmp_path, "A", "PLA", 1.22, [RED, GREEN, BLUE])
+    _write_filament(tmp_path, "B", "PLA", 1.24, [RED, GREEN, BLUE])
+    _write_filament(tmp_path, "C", "PLA", 1.265, [RED, GREEN, BLUE])
+    assert _clusters(tmp_path) == [(0.65, ["A PLA", "B PLA"])]
@@ -0,0 +1,105 @@
+import json
+from pathlib import Path
+
+import pytest
+
+import db_serializer
+from db_serializer import Brand, load_brands
+
+BRAND = {"brand": "Brand", "website": "https://brand.example/", "logo": "brand.png", "origin": "Unknown"}
+SIZES = [{"filament_weight": 1000, "diameter": 1.75, "ean": "7340002118178", "article_number": "1"},
+         {"filament_weight": 250, "diameter": 1.75, "article_number": "2"}]
+
+
+def _write_brand(data_dir: Path):
+    variant_dir = data_dir.joinpath("Brand", "PLA", "Basic", "Black")
+    variant_dir.mkdir(parents=True)
+    variant_dir.parents[2].joinpath("brand.json").write_text(json.dumps(BRAND, indent=4))
+    variant_dir.parents[1].joinpath("material.json").write_text(json.dumps({"material": "PLA"}, indent=4))
+    variant_dir.parent.joinpath("filament.json").write_text(json.dumps({"name": "Basic", "density": 1.24,
+                                                                        "diameter_tolerance": 0.02}, indent=4))
+    variant_dir.joinpath("variant.json").write_text(json.dumps({"color_name": "Black", "color_hex": "#000000"},
+                                                               indent=4))
+    variant_dir.joinpath("sizes.json").write_text(json.dumps(SIZES, indent=4))
+
+
+def _files(data_dir: Path) -> dict[str, bytes]:
+    return {str(x.relative_to(data_dir)): x.read_bytes() for x in sorted(data_dir.rglob("*.json"))}
+
+
+@pytest.fixture
+def data_dir(tmp_path) -> Path:
+    data_dir = tmp_path.joinpath("data")
+    _write_brand(data_dir)
+    return data_dir
+
+
+@pytest.fixture
+def brand(data_dir) -> Brand:
+    brands = load_brands(data_dir)
+    assert len(brands) == 1
+    return brands[0]
+
+
+def _variant(brand: Brand):
+    return brand.materials[0].filaments[0].variants[0]
+
+
+def test_saving_a_loaded_brand_writes_nothing(data_dir, brand):
+    before = _files(data_dir)
+    assert not brand.is_dirty()
+    assert brand.to_folder(data_dir) == 0
+    assert _files(data_dir) == before
+
+
+def test_editing_a_size_only_rewrites_sizes_json(data_dir, brand):
+    before = _files(data_dir)
+    _variant(brand).sizes[1].article_number = "3"
+    assert brand.to_folder(data_dir) == 1
+
+    after = _files(data_dir)
+    sizes_file = str(Path("Brand", "PLA", "Basic", "Black", "sizes.json"))
+    assert {k for k in before if before[k] != after[k]} == {sizes_file}
+    assert [x.get("article_number") for x in json.loads(after[sizes_file])] == ["1", "3"]
+    assert brand.to_folder(data_dir) == 0
+
+
+def test_failed_write_leaves_the_object_dirty(data_dir, brand, monkeypatch):
+    variant = _variant(brand)
+    variant.sizes[0].article_number = "3"
+
+    def fail(path, data):
+        raise OSError("Disk full")
+
+    with monkeypatch.context() as m:
+        m.setattr(db_serializer, "write_file_if_changed", fail)
+        with pytest.raises(OSError):
+            brand.to_folder(data_dir)
+    assert variant.is_dirty()
+    assert brand.to_folder(data_dir) == 1
+    assert not variant.is_dirty()
+
+
+def test_catalog_links_resolve_to_its_own_stores(tmp_path, data_dir):
+    from fs_watch import FileChange, MODIFIED
+    from db_serializer import Catalog
+
+    store = {"id": "catalogstore", "name": "Catalog Store", "storefront_url": "https://store.example/",
+             "logo": "store.png", "ships_from": ["SE"], "ships_to": []}
+    store_dir = tmp_path.joinpath("stores", "catalogstore")
+    store_dir.mkdir(parents=True)
+    store_dir.joinpath("store.json").write_text(json.dumps(store, indent=4))
+    sizes_file = data_dir.joinpath("Brand", "PLA", "Basic", "Black", "sizes.json")
+    link = {"store_id": "catalogstore", "url": "https://store.example/black", "affiliate": False}
+    sizes_file.write_text(json.dumps([dict(SIZES[0], purchase_links=[link]), SIZES[1]], indent=4))
+
+    loaded_stores = db_serializer.stores
+    catalog = Catalog(data_dir, tmp_path.joinpath("stores"))
+    assert _variant(catalog.brands[0]).sizes[0].purchase_links[0].store is catalog.stores["catalogstore"]
+
+    sizes_file.write_text(json.dumps([SIZES[0], dict(SIZES[1], purchase_links=[link])], indent=4))
+    catalog.apply_changes([FileChange(str(sizes_file), MODIFIED)])
+    assert _variant(catalog.brands[0]).sizes[1].purchase_links[0].store is catalog.stores["catalogstore"]
+    # Neither loading nor refreshing a catalog replaces the stores other code loaded
+    assert db_serializer.stores is loaded_stores
+    assert "catalogstore" not in db_serializer.stores
@@ -0,0 +1,120 @@
+import os
+import time
+
+import pytest
+
+import fs_watch
+from fs_watch import (CREATED, DELETED, MODIFIED, RESCAN, FileChange, InotifyWatcher, PollingWatcher, _coalesce,
+                      create_watcher, inotify_available)
+
+
+@pytest.mark.parametrize("changes, expected", [
+    # Deleting and re-creating a file, e.g. an atomic save, is a modification
+    ([FileChange("a", DELETED), FileChange("a", CREATED)], [FileChange("a", MODIFIED)]),
+    # A folder isn't the same folder once it is re-created
+    ([FileChange("a", DELETED, True), FileChange("a", CREATED, True)], [FileChange("a", CREATED, True)]),
+    ([FileChange("a", CREATED), FileChange("a", DELETED)], [FileChange("a", DELETED)]),
+    ([FileChange("a", MODIFIED), FileChange("a", MODIFIED)], [FileChange("a", MODIFIED)]),
+    ([FileChange("a", MODIFIED), FileChange("a", DELETED), FileChange("a", CREATED)], [FileChange("a", MODIFIED)]),
+    # A file and a folder of the same path are kept apart
+    ([FileChange("a", DELETED, True), FileChange("a", CREATED)],
+     [FileChange("a", DELETED, True), FileChange("a", CREATED)]),
+])
+def test_coalesce(changes, expected):
+    assert _coalesce(changes) == expected
+
+
+def test_coalesce_keeps_the_order_the_paths_were_first_seen():
+    changes = [FileChange("a", MODIFIED), FileChange("b", CREATED), FileChange("a", DELETED), FileChange("c", RESCAN)]
+    assert _coalesce(changes) == [FileChange("b", CREATED), FileChange("a", DELETED), FileChange("c", RESCAN)]
+
+
+def _touch(path, data: str):
+    with open(path, "w") as f:
+        f.write(data)
+    # Make sure the modification time changes, even on file systems with coarse timestamps
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+
+def test_polling_watcher(tmp_path):
+    root = tmp_path.joinpath("root")
+    root.joinpath("folder").mkdir(parents=True)
+    _touch(root.joinpath("folder", "a.json"), "{}")
+    watcher = PollingWatcher([root])
+    assert watcher.poll() == []
+
+    _touch(root.joinpath("folder", "a.json"), "[]")
+    _touch(root.joinpath("b.json"), "{}")
+    root.joinpath("new").mkdir()
+    # Hidden files, like the temp files of atomic writes, are ignored
+    _touch(root.joinpath(".b.json.tmp"), "{}")
+    assert sorted(watcher.poll(), key=lambda x: x.path) == [
+        FileChange(str(root.joinpath("b.json")), CREATED),
+        FileChange(str(root.joinpath("folder", "a.json")), MODIFIED),
+        FileChange(str(root.joinpath("new")), CREATED, True),
+    ]
+
+    os.rename(root.joinpath("folder"), root.joinpath("moved"))
+    assert sorted(watcher.poll(), key=lambda x: (x.change, x.path)) == [
+        FileChange(str(root.joinpath("moved")), CREATED, True),
+        FileChange(str(root.joinpath("moved", "a.json")), CREATED),
+        FileChange(str(root.joinpath("folder")), DELETED, True),
+        FileChange(str(root.joinpath("folder", "a.json")), DELETED),
+    ]
+    assert watcher.poll() == []
+
+
+def test_polling_watcher_wait(tmp_path):
+    watcher = PollingWatcher([tmp_path], interval=0.01, settle=0.01)
+    start = time.monotonic()
+    assert watcher.wait(0.05) == []
+    assert time.monotonic() - start >= 0.05
+
+    # A file deleted and re-created within one batch of polls is a modification
+    _touch(tmp_path.joinpath("a.json"), "{}")
+    assert watcher.wait(1) == [FileChange(str(tmp_path.joinpath("a.json")), CREATED)]
+    tmp_path.joinpath("a.json").unlink()
+    changes = watcher.poll()
+    _touch(tmp_path.joinpath("a.json"), "[]")
+    changes += watcher.poll()
+    assert _coalesce(changes) == [FileChange(str(tmp_path.joinpath("a.json")), MODIFIED)]
+
+
+def test_polling_watcher_of_a_missing_root(tmp_path):
+    root = tmp_path.joinpath("root")
+    watcher = PollingWatcher([root])
+    assert watcher.poll() == []
+    root.mkdir()
+    _touch(root.joinpath("a.json"), "{}")
+    assert watcher.poll() == [FileChange(str(root.joinpath("a.json")), CREATED)]
+
+
+def test_create_watcher_without_inotify(tmp_path, monkeypatch):
+    monkeypatch.setattr(fs_watch, "_load_libc", lambda: None)
+    with create_watcher([tmp_path]) as watcher:
+        assert isinstance(watcher, PollingWatcher)
+    with pytest.raises(OSError):
+        create_watcher([tmp_path], use_inotify=True)
+
+
+@pytest.mark.skipif(not inotify_available(), reason="inotify is not available")
+def test_inotify_watcher(tmp_path):
+    root = tmp_path.joinpath("root")
+    root.mkdir()
+    outside = tmp_path.joinpath("outside")
+    outside.joinpath("folder").mkdir(parents=True)
+    _touch(outside.joinpath("folder", "a.json"), "{}")
+
+    with InotifyWatcher([root], settle=0.01) as watcher:
+        assert watcher.wait(0.01) == []
+        # The contents of a folder that is moved in are reported, the folder gets a watch
+        os.rename(outside, root.joinpath("moved"))
+        assert watcher.wait(1) == [FileChange(str(root.joinpath("moved")), CREATED, True),
+                                   FileChange(str(root.joinpath("moved", "folder")), CREATED, True),
+                                   FileChange(str(root.joinpath("moved", "folder", "a.json")), CREATED)]
+        _touch(root.joinpath("moved", "folder", "a.json"), "[]")
+        assert watcher.wait(1) == [FileChange(str(root.joinpath("moved", "folder", "a.json")), MODIFIED)]
+        # A folder that is moved away is reported without its contents
+        os.rename(root.joinpath("moved"), tmp_path.joinpath("away"))
+        assert watcher.wait(1) == [FileChange(str(root.joinpath("moved")), DELETED, True)]
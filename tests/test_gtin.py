@@ -0,0 +1,94 @@
+import json
+
+import pytest
+
+import gtin
+from gtin import CHECK_DIGIT, DUPLICATE, FORMAT, MISMATCH, check_digit, check_digits_valid, validate_identifiers
+
+EAN_13 = "4006381333931"
+UPC_A = "036000291452"
+
+
+@pytest.mark.parametrize("code, valid", [
+    (UPC_A, True),
+    ("036000291453", False),
+    (EAN_13, True),
+    ("4006381333932", False),
+    ("00012345678905", True),
+    ("00012345678904", False),
+    # EAN-8 codes aren't accepted by the schema, even with a valid check digit
+    ("96385074", False),
+    ("40063813339A1", False),
+    (" 4006381333931", False),
+    ("", False),
+    (None, False),
+])
+def test_check_digits_valid(code, valid):
+    assert check_digits_valid([code]) == [valid]
+
+
+def test_check_digits_valid_batch_matches_single_codes():
+    codes = [UPC_A, "96385074", EAN_13, "4006381333932", "00012345678905", None, "0" + EAN_13]
+    assert check_digits_valid(codes) == [check_digits_valid([x])[0] for x in codes]
+
+
+@pytest.mark.parametrize("code, expected", [(UPC_A, "2"), (EAN_13, "1"), ("00012345678905", "5")])
+def test_check_digit(code, expected):
+    assert check_digit(code) == expected
+
+
+def _issues(entries) -> list[tuple[int, str, str]]:
+    return [(x.index, x.field, x.kind) for x in validate_identifiers(entries)]
+
+
+@pytest.mark.parametrize("size_gtin, size_ean, expected", [
+    (EAN_13, EAN_13, []),
+    (UPC_A, None, []),
+    (None, EAN_13, []),
+    (UPC_A, EAN_13, []),
+    ("4006381333932", None, [(0, "gtin", CHECK_DIGIT)]),
+    (None, "4006381333932", [(0, "ean", CHECK_DIGIT)]),
+    ("4006381333932", "4006381333932", [(0, "gtin", CHECK_DIGIT)]),
+    ("00012345678905", None, [(0, "gtin", FORMAT)]),
+    ("96385074", None, [(0, "gtin", FORMAT)]),
+    (None, UPC_A, [(0, "ean", FORMAT)]),
+    ("40063813339A1", None, [(0, "gtin", FORMAT)]),
+    (None, "", [(0, "ean", FORMAT)]),
+    (EAN_13, "5901234123457", [(0, "gtin/ean", MISMATCH)]),
+])
+def test_identifier_issues(size_gtin, size_ean, expected):
+    assert _issues([(size_gtin, size_ean, "variant")]) == expected
+
+
+def test_duplicates_across_variants():
+    entries = [(EAN_13, None, "a"), (None, EAN_13, "b"), ("0" + UPC_A, None, "c"), (UPC_A, None, "d")]
+    issues = validate_identifiers(entries)
+    assert [(x.index, x.kind, x.others) for x in issues] == [
+        (0, DUPLICATE, ("b",)), (1, DUPLICATE, ("a",)), (2, DUPLICATE, ("d",)), (3, DUPLICATE, ("c",))]
+
+
+def test_duplicates_within_a_variant_are_allowed():
+    assert _issues([(EAN_13, None, "a"), (EAN_13, EAN_13, "a")]) == []
+
+
+def test_issue_levels(tmp_path):
+    from data_validator import GTINValidator, scan_tree
+
+    variants = {
+        "Black": [{"gtin": EAN_13}, {"gtin": "4006381333932"}],
+        "White": [{"gtin": EAN_13}, {"gtin": "96385074"}, {"gtin": "5901234123457", "ean": EAN_13}],
+    }
+    for name, sizes in variants.items():
+        variant_dir = tmp_path.joinpath("data", "Brand", "PLA", "Basic", name)
+        variant_dir.mkdir(parents=True)
+        variant_dir.joinpath("sizes.json").write_text(json.dumps(sizes))
+    tmp_path.joinpath("stores").mkdir()
+
+    result = GTINValidator().validate_gtin_ean(scan_tree(tmp_path.joinpath("data"), tmp_path.joinpath("stores")))
+    assert sorted((x.path.parent.name, x.level.value, x.message.split(" at ")[0]) for x in result.errors) == [
+        ("Black", "WARNING", "Duplicate"),
+        ("Black", "WARNING", "Invalid check digit"),
+        ("White", "ERROR", "Invalid gtin"),
+        ("White", "ERROR", "Mismatch"),
+        ("White", "WARNING", "Duplicate"),
+    ]
@@ -0,0 +1,121 @@
+import io
+
+import pytest
+from PIL import Image
+
+import image_size
+from image_size import read_image_size, read_svg_size
+
+WIDTH, HEIGHT = 30, 20
+
+
+def _image(image_format: str, mode: str = "RGB", **params) -> bytes:
+    f = io.BytesIO()
+    Image.new(mode, (WIDTH, HEIGHT)).save(f, image_format, **params)
+    return f.getvalue()
+
+
+def _exif() -> Image.Exif:
+    exif = Image.Exif()
+    exif[0x010F] = "Camera"  # Make
+    return exif
+
+
+IMAGES = {
+    "png": lambda: _image("PNG"),
+    "jpeg": lambda: _image("JPEG", exif=_exif()),
+    "progressive jpeg": lambda: _image("JPEG", exif=_exif(), progressive=True),
+    "webp VP8": lambda: _image("WEBP"),
+    "webp VP8L": lambda: _image("WEBP", lossless=True),
+    "webp VP8X": lambda: _image("WEBP", "RGBA"),
+}
+
+
+@pytest.mark.parametrize("name", IMAGES)
+def test_image_size(name):
+    assert read_image_size(io.BytesIO(IMAGES[name]())) == (WIDTH, HEIGHT)
+
+
+@pytest.mark.parametrize("name", IMAGES)
+def test_image_size_matches_pillow(name):
+    data = IMAGES[name]()
+    with Image.open(io.BytesIO(data)) as img:
+        assert read_image_size(io.BytesIO(data)) == img.size
+
+
+@pytest.mark.parametrize("name", IMAGES)
+def test_logo_size_pillow_fallback_matches_header(name, tmp_path, monkeypatch):
+    from data_validator import DocumentCache, LogoValidator
+
+    logo = tmp_path.joinpath("logo")
+    logo.write_bytes(IMAGES[name]())
+    header_size = LogoValidator(documents=DocumentCache()).logo_size(logo, False)
+
+    def unsupported(f):
+        raise ValueError("Not a PNG, JPEG or WebP image")
+
+    monkeypatch.setattr(image_size, "read_image_size", unsupported)
+    # Forget the sizes kept by content hash, so the logo is read again
+    monkeypatch.setattr("data_validator._logo_sizes", {})
+    assert LogoValidator(documents=DocumentCache()).logo_size(logo, False) == header_size
+
+
+def test_fixtures_have_the_tested_layout():
+    jpeg = IMAGES["jpeg"]()
+    assert -1 < jpeg.find(b"Exif") < jpeg.find(b"\xff\xc0")
+    progressive = IMAGES["progressive jpeg"]()
+    assert -1 < progressive.find(b"Exif") < progressive.find(b"\xff\xc2")
+    for name in ("VP8 ", "VP8L", "VP8X"):
+        assert IMAGES[f"webp {name.strip()}"]()[12:16] == name.encode("ascii")
+
+
+@pytest.mark.parametrize("name, length", [("png", 20), ("jpeg", 30), ("webp VP8", 20), ("webp VP8L", 20),
+                                          ("webp VP8X", 20)])
+def test_truncated_image(name, length):
+    with pytest.raises(ValueError):
+        read_image_size(io.BytesIO(IMAGES[name]()[:length]))
+
+
+@pytest.mark.parametrize("data", [b"", b"GIF89a" + bytes(20), b"\xff\xd8\xff\xda" + bytes(20)])
+def test_unsupported_image(data):
+    with pytest.raises(ValueError):
+        read_image_size(io.BytesIO(data))
+
+
+def _svg(attributes: str, root: str = "svg") -> io.BytesIO:
+    return io.BytesIO(f'<?xml version="1.0"?><{root} xmlns="http://www.w3.org/2000/svg" {attributes}>'
+                      f'<rect width="1" height="1"/></{root}>'.encode("utf8"))
+
+
+@pytest.mark.parametrize("attributes, size", [
+    ('width="120" height="80"', (120, 80)),
+    ('width="120px" height="80px" viewBox="0 0 10 10"', (120, 80)),
+    ('width="1in" height="72pt"', (96, 96)),
+    ('viewBox="0 0 300 150"', (300, 150)),
+    ('viewBox="0,0,300,150"', (300, 150)),
+    ('width="100" viewBox="0 0 300 150"', (100, 50)),
+    ('height="100" viewBox="0 0 300 150"', (200, 100)),
+    ('width="100%" height="100%" viewBox="0 0 300 150"', (300, 150)),
+    ('width="10em" height="80" viewBox="0 0 300 150"', (160, 80)),
+])
+def test_svg_size(attributes, size):
+    assert read_svg_size(_svg(attributes)) == pytest.approx(size)
+
+
+def test_svg_square_view_box_gives_equal_lengths():
+    width, height = read_svg_size(_svg('width="33.3mm" viewBox="0 0 7 7"'))
+    assert width == height
+
+
+@pytest.mark.parametrize("svg", [
+    _svg('width="120" height="80"', root="html"),
+    _svg('width="100%" height="100%"'),
+    _svg('width="120"'),
+    _svg('viewBox="0 0 300"'),
+    _svg('viewBox="0 0 0 150"'),
+    io.BytesIO(b"<svg"),
+    io.BytesIO(b""),
+])
+def test_invalid_svg(svg):
+    with pytest.raises(ValueError):
+        read_svg_size(svg)
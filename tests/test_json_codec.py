@@ -0,0 +1,61 @@
+import json
+
+import pytest
+
+import json_codec
+
+pytest.importorskip("orjson")
+
+DOCUMENTS = {
+    "catalog": {"brand": "Spectrum", "website": "https://spectrumfilaments.com/", "density": 1.30,
+                "diameter_tolerance": 0.02, "temperatures": [200, 215.5], "discontinued": False, "logo": None},
+    "non-ascii": {"name": "Żółty – Gelb", "origin": "日本", "emoji": "🧵", "escaped": "quote \" tab \t \u0001"},
+    "floats": [1.30, 1e-7, 1e-5, 1.5e300, 0.1, -0.0, 123456789.123],
+    "empty": {"list": [], "dict": {}, "nested": [[], {}, [{}], {"a": []}], "string": ""},
+    "sizes": [{"filament_weight": 1000, "diameter": 1.75, "purchase_links": []}, {}],
+    "integers": [0, -1, 2 ** 63 - 1, -2 ** 63, 2 ** 64],
+}
+FORMATS = [
+    {"indent": 2, "ensure_ascii": True},
+    {"indent": 2, "ensure_ascii": False},
+    {"indent": 4, "ensure_ascii": True},
+    {"indent": 4, "ensure_ascii": False},
+    {"indent": 4, "ensure_ascii": False, "sort_keys": True},
+    {"separators": (",", ":")},
+    {"separators": (",", ":"), "ensure_ascii": False},
+    {},
+]
+
+
+@pytest.fixture
+def backend():
+    previous = json_codec.get_backend()
+    yield json_codec.set_backend
+    json_codec.set_backend(previous)
+
+
+@pytest.mark.parametrize("name", DOCUMENTS)
+@pytest.mark.parametrize("options", FORMATS)
+def test_backends_write_identical_output(name, options, backend):
+    data = DOCUMENTS[name]
+    expected = json.dumps(data, **options)
+    outputs = {}
+    for backend_name in ("orjson", "stdlib"):
+        backend(backend_name)
+        outputs[backend_name] = (json_codec.dumps(data, **options), json_codec.dumps_bytes(data, **options))
+    assert outputs["orjson"] == outputs["stdlib"] == (expected, expected.encode("utf8"))
+
+
+@pytest.mark.parametrize("indent", [2, 4])
+def test_orjson_writes_indented_documents(indent):
+    # The comparison above is only meaningful if orjson's output is used, not replaced by the json module's
+    data = DOCUMENTS["catalog"]
+    assert json_codec._orjson_dumps(data, indent, True, False, None) == json.dumps(data, indent=indent).encode()
+
+
+@pytest.mark.parametrize("name", DOCUMENTS)
+def test_backends_read_identical_documents(name, backend):
+    data = json.dumps(DOCUMENTS[name], ensure_ascii=False).encode("utf8")
+    for backend_name in ("orjson", "stdlib"):
+        backend(backend_name)
+        assert json_codec.loads(data) == DOCUMENTS[name]
@@ -0,0 +1,116 @@
+import json
+import sys
+from pathlib import Path
+
+import pytest
+from PIL import Image
+
+import data_validator
+from data_validator import (DocumentCache, SchemaCache, ValidationCache, ValidationError, ValidationLevel,
+                            ValidationOrchestrator, ValidationResult, ValidationTask)
+
+RESULT = ValidationResult([ValidationError(ValidationLevel.WARNING, "Logo", "Logo must be square", Path("a.png"))])
+
+
+def _cache(tmp_path: Path, schema_cache: SchemaCache = None) -> ValidationCache:
+    return ValidationCache(tmp_path.joinpath("cache"), DocumentCache(), schema_cache or SchemaCache())
+
+
+def _task(path: Path, **extra_data) -> ValidationTask:
+    return ValidationTask(task_type="logo", name="Logo", path=path, extra_data=extra_data, inputs=[path])
+
+
+def _errors(result: ValidationResult) -> list:
+    return [(x.level, x.category, x.message, x.path) for x in result.errors]
+
+
+@pytest.fixture
+def logo(tmp_path: Path) -> Path:
+    path = tmp_path.joinpath("logo.png")
+    path.write_bytes(b"logo")
+    return path
+
+
+def test_result_is_reused_until_an_input_changes(tmp_path, logo):
+    cache = _cache(tmp_path)
+    assert cache.get_result(_task(logo)) is None
+    cache.put_result(_task(logo), RESULT)
+    cache.save()
+
+    cache = _cache(tmp_path)
+    assert _errors(cache.get_result(_task(logo))) == _errors(RESULT)
+    assert cache.hits == 1
+
+    logo.write_bytes(b"other logo")
+    assert _cache(tmp_path).get_result(_task(logo)) is None
+
+
+def test_result_of_other_options_is_not_reused(tmp_path, logo):
+    cache = _cache(tmp_path)
+    cache.put_result(_task(logo, logo_name="logo.png"), RESULT)
+    assert cache.get_result(_task(logo, logo_name="logo.png")) is not None
+    assert cache.get_result(_task(logo, logo_name="other.png")) is None
+
+
+def test_result_of_other_schema_is_not_reused(tmp_path):
+    document = tmp_path.joinpath("brand.json")
+    document.write_text("{}")
+    schema = tmp_path.joinpath("schema.json")
+    schema.write_text(json.dumps({"type": "object"}))
+    task = ValidationTask(task_type="json", name="Brand", path=document, extra_data={"schema_name": "brand"},
+                          inputs=[document])
+
+    schema_cache = SchemaCache()
+    schema_cache._schema_paths["brand"] = str(schema)
+    cache = _cache(tmp_path, schema_cache)
+    cache.put_result(task, ValidationResult())
+    assert cache.get_result(task) is not None
+
+    schema.write_text(json.dumps({"type": "array"}))
+    schema_cache.invalidate("brand")
+    assert cache.get_result(task) is None
+
+
+def test_results_of_other_validator_code_are_dropped(tmp_path, logo, monkeypatch):
+    cache = _cache(tmp_path)
+    cache.put_result(_task(logo), RESULT)
+    cache.save()
+
+    monkeypatch.setattr(data_validator, "_validator_hash", "other")
+    assert _cache(tmp_path).get_result(_task(logo)) is None
+
+
+def test_system_errors_are_not_cached(tmp_path, logo):
+    cache = _cache(tmp_path)
+    result = ValidationResult([ValidationError(ValidationLevel.ERROR, "System", "Failed to read image", logo)])
+    cache.get_result(_task(logo))
+    cache.put_result(_task(logo), result)
+    cache.save()
+    assert _cache(tmp_path).get_result(_task(logo)) is None
+
+
+def test_nothing_is_cached_without_a_path(logo):
+    cache = ValidationCache(None, DocumentCache(), SchemaCache())
+    cache.put_result(_task(logo), RESULT)
+    assert cache.get_result(_task(logo)) is None
+
+
+def test_logo_read_without_pillow_is_not_replayed(tmp_path, monkeypatch):
+    brand_dir = tmp_path.joinpath("data", "Brand")
+    brand_dir.mkdir(parents=True)
+    brand_dir.joinpath("brand.json").write_text(json.dumps({"brand": "Brand", "logo": "brand.gif"}))
+    # GIF has no header reader, its size is read with Pillow
+    Image.new("RGB", (120, 120)).save(brand_dir.joinpath("brand.gif"))
+    tmp_path.joinpath("stores").mkdir()
+
+    def validate() -> ValidationResult:
+        orchestrator = ValidationOrchestrator(tmp_path.joinpath("data"), tmp_path.joinpath("stores"),
+                                              executor="inline", cache_path=tmp_path.joinpath("cache"))
+        result = orchestrator.validate_logo_files()
+        orchestrator.cache.save()
+        return result
+
+    with monkeypatch.context() as m:
+        m.setitem(sys.modules, "PIL", None)
+        assert [(x.category, x.level) for x in validate().errors] == [("System", ValidationLevel.ERROR)]
+    assert validate().errors == []
@@ -0,0 +1,138 @@
+import http.client
+import json
+import threading
+from pathlib import Path
+
+import pytest
+
+import validator_daemon
+from conftest import VARIANTS, sizes, write_json
+from data_validator import ValidationOrchestrator
+from validator_daemon import ValidationDaemon, create_server
+
+BLACK = Path("data", "Brand", "PLA", "Basic", "Black")
+BLACK_MATTE = Path("data", "Brand", "PLA", "Basic", "Black Matte")
+
+
+@pytest.fixture
+def server(validation_tree):
+    # Errors in two variants whose folder names share a prefix
+    write_json(BLACK.joinpath("variant.json"), {"color_name": "Black", "color_hex": "black"})
+    write_json(BLACK_MATTE.joinpath("variant.json"), {"color_name": "Black Matte", "color_hex": "matte"})
+    daemon = ValidationDaemon(ValidationOrchestrator(Path("data"), Path("stores"), executor="inline"))
+    daemon.start(use_inotify=False, poll_interval=0.05)
+    validation_server = create_server(daemon, port=0)
+    thread = threading.Thread(target=validation_server.serve_forever, daemon=True)
+    thread.start()
+    yield validation_server
+    validation_server.shutdown()
+    validation_server.server_close()
+    daemon.stop()
+
+
+def _request(server, method: str, path: str, body: bytes = b"", headers: dict = None) -> tuple[int, dict]:
+    connection = http.client.HTTPConnection(*server.server_address[:2], timeout=10)
+    try:
+        connection.request(method, path, body, headers or {})
+        response = connection.getresponse()
+        return response.status, json.loads(response.read())
+    finally:
+        connection.close()
+
+
+def _validate(server, request) -> tuple[int, dict]:
+    return _request(server, "POST", "/validate", json.dumps(request).encode("utf8"))
+
+
+def _paths(response: dict) -> set[str]:
+    return {str(Path(x["path"]).parent) for x in response["errors"]}
+
+
+def test_status(server):
+    status, response = _request(server, "GET", "/status")
+    assert status == 200
+    assert (response["status"], response["error_count"], response["warning_count"]) == ("ok", 2, 0)
+
+
+def test_validate_everything(server):
+    for body in (b"", b"{}"):
+        status, response = _request(server, "POST", "/validate", body)
+        assert status == 200
+        assert not response["valid"]
+        assert _paths(response) == {str(BLACK), str(BLACK_MATTE)}
+
+
+def test_validate_path_is_a_folder_prefix(server):
+    # data/Brand/PLA/Basic/Black doesn't include the errors of its sibling Black Matte
+    assert _paths(_validate(server, {"path": str(BLACK)})[1]) == {str(BLACK)}
+    assert _paths(_validate(server, {"path": str(BLACK_MATTE)})[1]) == {str(BLACK_MATTE)}
+    assert _paths(_validate(server, {"path": str(BLACK.joinpath("variant.json"))})[1]) == {str(BLACK)}
+    assert _paths(_validate(server, {"path": "data/Brand/PLA"})[1]) == {str(BLACK), str(BLACK_MATTE)}
+    status, response = _validate(server, {"path": "stores"})
+    assert (status, response["valid"], response["errors"]) == (200, True, [])
+
+
+def test_validate_document_overlays_the_saved_file(server):
+    # The unsaved sizes reuse the code of Black Matte and link a store that doesn't exist
+    document = sizes("Black", VARIANTS["Black Matte"], store_id="missing")
+    status, response = _validate(server, {"path": str(BLACK.joinpath("sizes.json")), "document": document})
+    assert status == 200
+    assert sorted((x["category"], x["level"], x["path"]) for x in response["errors"]) == [
+        ("GTIN/EAN", "WARNING", str(BLACK.joinpath("sizes.json"))),
+        ("StoreID", "ERROR", str(BLACK.joinpath("sizes.json"))),
+    ]
+
+    # The file on disk and the kept result are unchanged
+    assert _request(server, "GET", "/status")[1]["error_count"] == 2
+    status, response = _validate(server, {"path": str(BLACK.joinpath("sizes.json"))})
+    assert (status, response["errors"]) == (200, [])
+
+
+def test_validate_document_of_a_valid_document(server):
+    document = {"color_name": "Black", "color_hex": "#000000"}
+    status, response = _validate(server, {"path": str(BLACK.joinpath("variant.json")), "document": document})
+    assert (status, response["valid"], response["errors"]) == (200, True, [])
+
+
+@pytest.mark.parametrize("body", [b"{", b"[]", b'{"path": 1}', b'{"document": {}}', b"\xff",
+                                  b'{"path": "README.md", "document": {}}'])
+def test_bad_request(server, body):
+    status, response = _request(server, "POST", "/validate", body)
+    assert status == 400
+    assert response["error"]
+
+
+def test_unknown_path_and_endpoint(server):
+    assert _validate(server, {"path": "data/Other"})[0] == 404
+    assert _request(server, "GET", "/other")[0] == 404
+    assert _request(server, "POST", "/other", b"{}")[0] == 404
+
+
+@pytest.mark.parametrize("length", ["abc", "-1"])
+def test_invalid_content_length(server, length):
+    status, response = _request(server, "POST", "/validate", b"{}", {"Content-Length": length})
+    assert status == 400
+    assert length in response["error"]
+
+
+def test_request_too_large(server, monkeypatch):
+    monkeypatch.setattr(validator_daemon, "MAX_REQUEST_BYTES", 10)
+    status, response = _request(server, "POST", "/validate", json.dumps({"path": str(BLACK)}).encode("utf8"))
+    assert status == 413
+    assert "10 bytes" in response["error"]
+    # Up to the limit is fine
+    assert _request(server, "POST", "/validate", b"{}")[0] == 200
+
+
+def test_unix_socket_replaces_a_stale_socket(validation_tree):
+    socket_path = str(validation_tree.joinpath("validator.sock"))
+    daemon = ValidationDaemon(ValidationOrchestrator(Path("data"), Path("stores"), executor="inline"))
+    for _ in range(2):
+        # The first server isn't cleaned up, like a daemon that was killed
+        server = create_server(daemon, socket_path)
+        server.socket.close()
+    other_file = validation_tree.joinpath("other.sock")
+    other_file.write_text("")
+    with pytest.raises(OSError):
+        create_server(daemon, str(other_file))
+    assert other_file.read_text() == ""
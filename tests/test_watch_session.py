@@ -0,0 +1,111 @@
+import os
+import shutil
+from pathlib import Path
+
+import pytest
+
+from conftest import VARIANTS, sizes, write_json
+from data_validator import ValidationOrchestrator, WatchSession
+from fs_watch import DELETED, RESCAN, FileChange, PollingWatcher, _coalesce
+
+VARIANT_DIR = Path("data", "Brand", "PLA", "Basic")
+
+
+def _session() -> WatchSession:
+    session = WatchSession(ValidationOrchestrator(Path("data"), Path("stores"), executor="inline"))
+    session.validate()
+    return session
+
+
+@pytest.fixture
+def watched(validation_tree) -> tuple[WatchSession, PollingWatcher]:
+    return _session(), PollingWatcher(["data", "stores"])
+
+
+def _errors(session: WatchSession) -> list[str]:
+    return sorted(str(x) for x in session.result.errors)
+
+
+def _index(session: WatchSession) -> tuple[dict, dict]:
+    return ({k: v for k, v in session._files_by_key.items() if v},
+            {k: v for k, v in session._file_keys.items() if v})
+
+
+def _apply(watched: tuple[WatchSession, PollingWatcher], inotify_moves=False) -> list[str]:
+    """
+    Apply the changes the watcher sees, the result must match validating everything again
+    :param inotify_moves: Report the deletion of a folder without its files, like inotify does for a moved away folder
+    """
+    session, watcher = watched
+    changes = _coalesce(watcher.poll())
+    assert changes
+    if inotify_moves:
+        deleted = [x.path for x in changes if x.change == DELETED and x.is_dir]
+        changes = [x for x in changes if not any(x.path.startswith(folder + os.sep) for folder in deleted)]
+    session.apply(changes)
+    full = _session()
+    assert _errors(session) == _errors(full)
+    assert _index(session) == _index(full)
+    return _errors(session)
+
+
+def test_modify(watched):
+    assert watched[0].result.errors == []
+    write_json(VARIANT_DIR.joinpath("Black", "sizes.json"), sizes("Black", VARIANTS["Black Matte"]))
+    errors = _apply(watched)
+    assert len(errors) == 2 and all("Duplicate" in x for x in errors)
+
+    write_json(VARIANT_DIR.joinpath("Black", "sizes.json"), sizes("Black", VARIANTS["Black"], store_id="missing"))
+    errors = _apply(watched)
+    assert len(errors) == 1 and "Invalid store_id 'missing'" in errors[0]
+
+    write_json(VARIANT_DIR.joinpath("Black", "variant.json"), {"color_name": "Black", "color_hex": "black"})
+    write_json(VARIANT_DIR.joinpath("Black", "sizes.json"), sizes("Black", VARIANTS["Black"]))
+    assert len(_apply(watched)) == 1
+
+
+def test_delete(watched):
+    write_json(VARIANT_DIR.joinpath("Black", "sizes.json"), sizes("Black", VARIANTS["Black Matte"]))
+    _apply(watched)
+    # The duplicate of Black Matte goes away with the file
+    VARIANT_DIR.joinpath("Black", "sizes.json").unlink()
+    errors = _apply(watched)
+    assert errors and not any("Duplicate" in x for x in errors)
+
+    # Every file linking the store is affected
+    Path("stores", "store1", "store.json").unlink()
+    assert sum("Invalid store_id" in x for x in _apply(watched)) == 1
+
+    shutil.rmtree(VARIANT_DIR.joinpath("Black Matte"))
+    _apply(watched)
+    assert not any(x.path.parent.name == "Black Matte" for x in watched[0]._file_keys)
+
+
+def test_directory_move(watched):
+    write_json(VARIANT_DIR.joinpath("Black", "sizes.json"), sizes("Black", VARIANTS["Black Matte"]))
+    _apply(watched)
+
+    # The folder name doesn't match the color name anymore, the duplicate is reported at the new path
+    os.rename(VARIANT_DIR.joinpath("Black Matte"), VARIANT_DIR.joinpath("Blue"))
+    errors = _apply(watched)
+    assert any("Folder name 'Blue'" in x for x in errors)
+    assert any("(data/Brand/PLA/Basic/Blue)" in x for x in errors)
+    assert not any("Black Matte" in str(x.path) for x in watched[0].result.errors)
+
+    # inotify only reports the moved folder, not the files within it
+    os.rename(Path("data", "Brand"), Path("data", "Other"))
+    _apply(watched, inotify_moves=True)
+    assert all(x.parts[1] == "Other" for x in watched[0]._file_keys)
+
+
+def test_rescan(watched):
+    write_json(VARIANT_DIR.joinpath("Black", "sizes.json"), sizes("Black", VARIANTS["Black Matte"]))
+    Path("stores", "store1", "store.json").unlink()
+    # The batch only says that changes were missed
+    session, full = watched[0], _session()
+    session.apply([FileChange(os.path.abspath("data"), RESCAN, True)])
+    errors = _errors(session)
+    assert errors == _errors(full)
+    assert _index(session) == _index(full)
+    assert any("Duplicate" in x for x in errors)
+    assert any("Invalid store_id" in x for x in errors)
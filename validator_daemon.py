@@ -0,0 +1,230 @@
+import os
+import signal
+import socketserver
+import stat
+import threading
+import time
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Optional, Union
+from urllib.parse import urlsplit
+
+import json_codec
+from data_validator import VALIDATION_CACHE_FILE, ValidationOrchestrator, ValidationResult, WatchSession
+
+# Validation daemon
+# Keeps a WatchSession (the manifest, parsed documents, compiled schemas and the result of every check) in memory
+# and serves validation requests over localhost HTTP or a Unix socket. Callers like the WebUI or a pre-commit hook
+# don't pay for starting Python, importing Pillow/jsonschema and scanning the tree on every run. Changes on disk are
+# applied by a watcher thread, see WatchSession.apply().
+#
+# Requests and responses are JSON:
+#   GET  /status       {"status": "ok", "error_count": 232, "warning_count": 26, "uptime": 12.3}
+#   POST /validate     {}                               The errors of the whole tree
+#                      {"path": "data/Brand"}           The errors within a folder, or of one file
+#                      {"path": "data/Brand/brand.json", "document": {...}}
+#                                                       The errors of a document that isn't saved, as if it was
+# /validate returns {"valid": bool, "error_count": int, "warning_count": int, "milliseconds": float,
+#                    "errors": [{"level": str, "category": str, "message": str, "path": str or null}, ...]}
+# Paths are relative to the working directory of the daemon, e.g.
+#   curl -s --unix-socket validator.sock http://localhost/validate -d '{"path": "data/Bambu Lab"}'
+#
+# Every request is handled on its own thread. The session isn't thread safe, so the requests and the watcher take
+# turns holding `lock`. A request only holds it for milliseconds, everything it needs is in memory.
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+# Larger request bodies are refused, the largest AIO material files are well below
+MAX_REQUEST_BYTES = 16 * 1024 * 1024
+
+
+class ValidationDaemon:
+    def __init__(self, orchestrator: ValidationOrchestrator):
+        self.session = WatchSession(orchestrator)
+        self.lock = threading.Lock()
+        self.started = time.monotonic()
+        self._stop = threading.Event()
+
+    def start(self, use_inotify: Optional[bool] = None, poll_interval: float = 1.0):
+        """
+        Validate everything, then apply changes made on disk on a background thread until stop() is called
+        :param use_inotify: True to require inotify, False to poll, None to use inotify if available
+        :param poll_interval: Seconds between polls, also the longest time it takes to notice stop()
+        """
+        # The watcher is set up first, so changes made during the first validation aren't missed
+        watcher = self.session.create_watcher(use_inotify, poll_interval)
+        with self.lock:
+            self.session.validate()
+            self.session.orchestrator.verbose = False
+        threading.Thread(target=self._watch_loop, args=(watcher, poll_interval),
+                         name="validator-watcher", daemon=True).start()
+
+    def _watch_loop(self, watcher, poll_interval: float):
+        with watcher:
+            while not self._stop.is_set():
+                changes = watcher.wait(poll_interval)
+                if changes:
+                    with self.lock:
+                        self.session.apply(changes)
+
+    def stop(self):
+        """Stop applying changes and write the validation cache"""
+        self._stop.set()
+        with self.lock:
+            self.session.orchestrator.cache.save()
+
+    def status(self) -> dict[str, Any]:
+        with self.lock:
+            result = self.session.result
+            return {"status": "ok", "error_count": result.error_count, "warning_count": result.warning_count,
+                    "uptime": round(time.monotonic() - self.started, 1)}
+
+    def validate(self, request: Any) -> dict[str, Any]:
+        """
+        Handle a /validate request, see the top of this module
+        :raises ValueError: If the request is malformed or its path isn't a file the validator checks
+        :raises LookupError: If the path of a request without a document doesn't exist
+        """
+        start = time.perf_counter()
+        if not isinstance(request, dict):
+            raise ValueError("The request must be a JSON object")
+        path = request.get("path")
+        if path is not None and not isinstance(path, str):
+            raise ValueError("path must be a string")
+
+        if "document" in request:
+            if path is None:
+                raise ValueError("A document needs the path it would be saved at")
+            with self.lock:
+                result = self.session.validate_document(Path(os.path.relpath(path)), request["document"])
+        elif path is not None:
+            if not os.path.exists(path):
+                raise LookupError(f"{path} doesn't exist")
+            prefix = os.path.abspath(path)
+            with self.lock:
+                errors = self.session.result.errors
+            result = ValidationResult([x for x in errors if x.path is not None and
+                                       (os.path.abspath(x.path) + os.sep).startswith(prefix + os.sep)])
+        else:
+            with self.lock:
+                result = ValidationResult(list(self.session.result.errors))
+
+        return {
+            "valid": result.is_valid,
+            "error_count": result.error_count,
+            "warning_count": result.warning_count,
+            "milliseconds": round((time.perf_counter() - start) * 1000, 2),
+            "errors": [{"level": x.level.value, "category": x.category, "message": x.message,
+                        "path": str(x.path) if x.path else None} for x in result.errors]
+        }
+
+
+# ---------------------------------
+# Server
+# ---------------------------------
+
+class RequestHandler(BaseHTTPRequestHandler):
+    server_version = "FilamentValidator/1"
+
+    def address_string(self) -> str:
+        # Clients of a Unix socket have no address
+        return self.client_address[0] if isinstance(self.client_address, tuple) else "unix socket"
+
+    def _send(self, status: HTTPStatus, body: dict[str, Any]):
+        data = json_codec.dumps_bytes(body, ensure_ascii=False, separators=(",", ":"))
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if urlsplit(self.path).path == "/status":
+            self._send(HTTPStatus.OK, self.server.validator.status())
+        else:
+            self._send(HTTPStatus.NOT_FOUND, {"error": f"Unknown endpoint {self.path}"})
+
+    def do_POST(self):
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+        except ValueError:
+            length = -1
+        if length < 0:
+            # The body can't be found without its length, neither can the next request on this connection
+            self.close_connection = True
+            self._send(HTTPStatus.BAD_REQUEST,
+                       {"error": f"Invalid Content-Length '{self.headers.get('Content-Length')}'"})
+            return
+        if length > MAX_REQUEST_BYTES:
+            self.close_connection = True
+            self._send(HTTPStatus.REQUEST_ENTITY_TOO_LARGE,
+                       {"error": f"Requests are limited to {MAX_REQUEST_BYTES} bytes"})
+            return
+        body = self.rfile.read(length)
+        if urlsplit(self.path).path != "/validate":
+            self._send(HTTPStatus.NOT_FOUND, {"error": f"Unknown endpoint {self.path}"})
+            return
+        try:
+            request = json_codec.loads(body) if body else {}
+            response = self.server.validator.validate(request)
+        except ValueError as e:
+            # Includes JSON and UTF-8 decoding errors
+            self._send(HTTPStatus.BAD_REQUEST, {"error": str(e)})
+        except LookupError as e:
+            self._send(HTTPStatus.NOT_FOUND, {"error": str(e)})
+        else:
+            self._send(HTTPStatus.OK, response)
+
+
+class UnixHTTPServer(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+
+def create_server(validator: ValidationDaemon, socket_path: Optional[str] = None, host: str = DEFAULT_HOST,
+                  port: int = DEFAULT_PORT) -> Union[ThreadingHTTPServer, UnixHTTPServer]:
+    """Returns a server of the daemon's requests on the Unix socket at socket_path, or on host:port"""
+    if socket_path is not None:
+        # A socket left behind by a daemon that didn't shut down cleanly is replaced, any other file is kept
+        if os.path.exists(socket_path) and stat.S_ISSOCK(os.stat(socket_path).st_mode):
+            os.unlink(socket_path)
+        server = UnixHTTPServer(socket_path, RequestHandler)
+    else:
+        server = ThreadingHTTPServer((host, port), RequestHandler)
+    server.validator = validator
+    return server
+
+
+# If running from the command line, provide argument parsing
+if __name__ == "__main__":
+    from argparse import ArgumentParser
+
+    parser = ArgumentParser(description="Serve validation requests from state kept in memory")
+    parser.add_argument("--socket", help="Listen on this Unix socket instead of localhost HTTP")
+    parser.add_argument("--host", default=DEFAULT_HOST, help=f"The address to listen on (default: {DEFAULT_HOST})")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT,
+                        help=f"The port to listen on (default: {DEFAULT_PORT})")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(),
+                        help="Number of worker processes of the first validation (default: number of CPUs)")
+    parser.add_argument("--cache-file", default=VALIDATION_CACHE_FILE,
+                        help=f"Reuse the results of unchanged files from this file (default: {VALIDATION_CACHE_FILE})")
+    parser.add_argument("--no-cache", action="store_true", help="Validate everything and don't write the cache")
+    parser.add_argument("--poll", action="store_true", help="Poll for changes instead of using inotify")
+    args = parser.parse_args()
+
+    daemon = ValidationDaemon(ValidationOrchestrator(max_workers=args.workers,
+                                                     cache_path=None if args.no_cache else Path(args.cache_file)))
+    daemon.start(use_inotify=False if args.poll else None)
+    validation_server = create_server(daemon, args.socket, args.host, args.port)
+    # Stop cleanly when terminated, the same as on Ctrl+C
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    print(f"Serving validation requests on {args.socket or f'http://{args.host}:{args.port}'}")
+    try:
+        validation_server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        validation_server.server_close()
+        daemon.stop()
+        if args.socket:
+            os.unlink(args.socket)